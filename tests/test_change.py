@@ -0,0 +1,59 @@
+import os
+
+import cv2
+import numpy as np
+
+from watcher.change import TileChangeDetector
+from watcher.config import load_config
+from watcher.matcher import MatcherBank
+
+ASSETS = os.path.join(os.path.dirname(__file__), os.pardir, "assets")
+TEMPLATE = os.path.abspath(os.path.join(ASSETS, "template.png"))
+
+
+def test_gradual_drift_is_detected():
+    detector = TileChangeDetector(tile_size=32, tolerance=1.0)
+    frame = np.zeros((128, 128, 3), np.uint8)
+    detector.update(frame)
+    changed = False
+    # 0.5 levels per tick: every single step stays under the tolerance.
+    for step in range(1, 41):
+        frame[:] = step // 2
+        changed = changed or not detector.update(frame).static
+    assert changed
+
+
+def test_fading_template_is_matched(tmp_path):
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(
+        f"roi: {{left: 0, top: 0, width: 400, height: 240}}\n"
+        f"template_paths: [{TEMPLATE}]\n"
+        f"matching: {{cache_dir: {tmp_path / 'cache'}}}\n"
+        "change_detection: {enabled: true}\n",
+        encoding="utf-8",
+    )
+    config = load_config(str(config_path))
+    template = cv2.imread(TEMPLATE, cv2.IMREAD_COLOR)
+    height, width = template.shape[:2]
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (240, 400, 3)).astype(np.float32)
+    detector = TileChangeDetector(
+        config.change_detection.tile_size, config.change_detection.tolerance
+    )
+    bank = MatcherBank.from_paths(config.template_paths, config.matching, (400, 240))
+    frame = background.astype(np.uint8)
+    # Fade the template in over 400 ticks, each step below the tolerance.
+    for step in range(401):
+        alpha = step / 400
+        blended = background.copy()
+        blended[100 : 100 + height, 150 : 150 + width] = (
+            (1 - alpha) * background[100 : 100 + height, 150 : 150 + width]
+            + alpha * template
+        )
+        frame = np.round(blended).astype(np.uint8)
+        results = bank.match(frame, detector.update(frame))
+    fresh = MatcherBank.from_paths(
+        config.template_paths, config.matching, (400, 240)
+    ).match(frame)
+    assert abs(results[0][0] - fresh[0][0]) < 1e-3
+    assert results[0][0] > 0.99
@@ -0,0 +1,109 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from watcher.config import Prefilter
+from watcher.matcher import MatcherBank, TemplateMatcher
+from watcher.verify import NEAR_THRESHOLD_BAND
+
+ASSETS = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, "assets")
+)
+TEMPLATES = [
+    os.path.join(ASSETS, name)
+    for name in ("template.png", "zhanchang.png", "zhanchang_1.png")
+]
+THRESHOLD = 0.8
+# Default of `verify --tolerance`.
+TOLERANCE = 1e-3
+
+
+def _frames(seed: int, count: int, width: int = 480, height: int = 270):
+    # Blurred noise with one of the templates blended in at a random place,
+    # opacity and noise level in two of every three frames, so scores spread
+    # from clear misses through the threshold to clean hits.
+    rng = np.random.default_rng(seed)
+    templates = [cv2.imread(path, cv2.IMREAD_COLOR) for path in TEMPLATES]
+    for index in range(count):
+        frame = rng.integers(0, 256, (height, width, 3)).astype(np.float32)
+        frame = cv2.GaussianBlur(frame, (0, 0), 3)
+        if index % 3:
+            template = templates[rng.integers(len(templates))].astype(np.float32)
+            th, tw = template.shape[:2]
+            x = rng.integers(0, width - tw + 1)
+            y = rng.integers(0, height - th + 1)
+            alpha = rng.uniform(0.2, 1.0)
+            window = frame[y : y + th, x : x + tw]
+            frame[y : y + th, x : x + tw] = alpha * template + (1 - alpha) * window
+        frame += rng.normal(0, rng.uniform(0, 10), frame.shape)
+        yield np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def _disagreements(expected, actual, hits):
+    # The checks `verify` fails on: a hit/miss flip, or a score difference
+    # beyond the tolerance anywhere near the threshold.
+    problems = []
+    for name, ref_score, score in zip(TEMPLATES, expected, actual):
+        hits.append(ref_score >= THRESHOLD)
+        flipped = (ref_score >= THRESHOLD) != (score >= THRESHOLD)
+        near = max(ref_score, score) >= THRESHOLD - NEAR_THRESHOLD_BAND
+        if flipped or (near and abs(ref_score - score) > TOLERANCE):
+            problems.append((os.path.basename(name), ref_score, score))
+    return problems
+
+
+@pytest.mark.parametrize("levels", [1, 2])
+@pytest.mark.parametrize(
+    "grayscale, text_only", [(False, False), (True, False), (False, True)]
+)
+def test_pyramid_matches_exhaustive(grayscale, text_only, levels):
+    method = "TM_CCOEFF_NORMED"
+    reference = [
+        TemplateMatcher(path, grayscale, method, text_only) for path in TEMPLATES
+    ]
+    pyramid = [
+        TemplateMatcher(path, grayscale, method, text_only, levels)
+        for path in TEMPLATES
+    ]
+    assert any(matcher.pyramid_levels for matcher in pyramid)
+    hits = []
+    problems = []
+    for frame in _frames(seed=0, count=60):
+        expected = [matcher.match(frame)[0] for matcher in reference]
+        actual = [matcher.match(frame)[0] for matcher in pyramid]
+        problems += _disagreements(expected, actual, hits)
+    assert any(hits)
+    assert problems == []
+
+
+@pytest.mark.parametrize("levels", [1, 2])
+@pytest.mark.parametrize(
+    "grayscale, text_only", [(False, False), (True, False), (False, True)]
+)
+def test_prefilter_never_rejects_a_hit(grayscale, text_only, levels):
+    def bank():
+        return MatcherBank(
+            [
+                TemplateMatcher(path, grayscale, "TM_CCOEFF_NORMED", text_only)
+                for path in TEMPLATES
+            ]
+        )
+
+    reference = bank()
+    cascade = bank()
+    # Default reject_score.
+    cascade.configure_prefilter(Prefilter(True, levels, 0.4), THRESHOLD)
+    hits = []
+    flips = []
+    for frame in _frames(seed=0, count=60):
+        expected = reference.match(frame)
+        actual = cascade.match(frame)
+        for name, (ref_score, _), (score, _) in zip(TEMPLATES, expected, actual):
+            hits.append(ref_score >= THRESHOLD)
+            if (ref_score >= THRESHOLD) != (score >= THRESHOLD):
+                flips.append((os.path.basename(name), ref_score, score))
+    assert any(hits)
+    assert cascade.prefilter_rejected > 0
+    assert flips == []
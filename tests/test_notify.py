@@ -0,0 +1,164 @@
+import asyncio
+import http.server
+import threading
+import time
+import urllib.parse
+
+import pytest
+
+from watcher.config import Notify
+from watcher.notify import AsyncNotificationDispatcher
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        body = urllib.parse.parse_qs(self.rfile.read(length).decode("utf-8"))
+        server = self.server
+        status = server.statuses.pop(0) if server.statuses else 200
+        server.requests.append((time.monotonic(), self.client_address, body))
+        data = b'{"status": 1}'
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.statuses = []
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _notify(server, token: str, **overrides) -> Notify:
+    values = dict(
+        use_toast=False,
+        beep_fallback=False,
+        title="Watcher",
+        provider="pushover",
+        fallback_to_local=False,
+        # The rate-limit bucket is shared per app token, so each test uses its own.
+        pushover_app_token=token,
+        pushover_user_key="user",
+        telegram_bot_token="",
+        telegram_chat_id="",
+        pushover_url=f"http://127.0.0.1:{server.server_port}/1/messages.json",
+        telegram_api_url="",
+        queue_size=16,
+        timeout_sec=2.0,
+        retry_deadline_sec=5.0,
+        retry_backoff_sec=0.2,
+        coalesce_sec=0.0,
+        rate_per_min=0.0,
+        rate_burst=1,
+    )
+    values.update(overrides)
+    return Notify(**values)
+
+
+async def _settle(dispatcher: AsyncNotificationDispatcher, sends: int) -> None:
+    deadline = time.monotonic() + 5.0
+    while dispatcher.sent + dispatcher.failed < sends:
+        assert time.monotonic() < deadline, dispatcher.stats_line()
+        await asyncio.sleep(0.01)
+
+
+def test_server_error_is_retried_with_backoff(server):
+    server.statuses = [503, 502]
+
+    async def run():
+        dispatcher = AsyncNotificationDispatcher(_notify(server, "retry"))
+        dispatcher.submit("Watcher", "closed")
+        await _settle(dispatcher, 1)
+        await dispatcher.aclose()
+        return dispatcher
+
+    dispatcher = asyncio.run(run())
+    assert (dispatcher.sent, dispatcher.failed) == (1, 0)
+    stamps = [stamp for stamp, _address, _body in server.requests]
+    assert len(stamps) == 3
+    # Backoff doubles: 0.2s, then 0.4s.
+    assert stamps[1] - stamps[0] >= 0.18
+    assert stamps[2] - stamps[1] >= 0.38
+
+
+def test_client_error_is_not_retried(server):
+    server.statuses = [400]
+
+    async def run():
+        dispatcher = AsyncNotificationDispatcher(_notify(server, "reject"))
+        dispatcher.submit("Watcher", "closed")
+        await _settle(dispatcher, 1)
+        await asyncio.sleep(0.3)
+        await dispatcher.aclose()
+        return dispatcher
+
+    dispatcher = asyncio.run(run())
+    assert (dispatcher.sent, dispatcher.failed) == (0, 1)
+    assert len(server.requests) == 1
+
+
+def test_connection_is_reused_across_sends(server):
+    async def run():
+        dispatcher = AsyncNotificationDispatcher(_notify(server, "reuse"))
+        for sends in range(1, 4):
+            dispatcher.submit("Watcher", f"closed {sends}")
+            await _settle(dispatcher, sends)
+        await dispatcher.aclose()
+        return dispatcher
+
+    dispatcher = asyncio.run(run())
+    assert dispatcher.sent == 3
+    addresses = {address for _stamp, address, _body in server.requests}
+    assert len(server.requests) == 3
+    assert len(addresses) == 1
+
+
+def test_burst_is_coalesced(server):
+    async def run():
+        notify = _notify(server, "coalesce", coalesce_sec=0.2)
+        dispatcher = AsyncNotificationDispatcher(notify)
+        for score in (0.91, 0.95, 0.93):
+            dispatcher.submit("Watcher", "closed", source="battle", score=score)
+        await _settle(dispatcher, 1)
+        await asyncio.sleep(0.3)
+        await dispatcher.aclose()
+        return dispatcher
+
+    dispatcher = asyncio.run(run())
+    assert (dispatcher.sent, dispatcher.merged) == (1, 2)
+    assert len(server.requests) == 1
+    message = server.requests[0][2]["message"][0]
+    assert message.startswith("3 events in ")
+    assert "battle x3 (best 0.950)" in message
+
+
+def test_rate_limit_defers_and_merges(server):
+    async def run():
+        # One token every 0.2s, no burst beyond the first send.
+        notify = _notify(server, "rate", rate_per_min=300.0, rate_burst=1)
+        dispatcher = AsyncNotificationDispatcher(notify)
+        for index in range(3):
+            dispatcher.submit("Watcher", f"closed {index}", source="battle")
+        await _settle(dispatcher, 2)
+        await asyncio.sleep(0.3)
+        await dispatcher.aclose()
+        return dispatcher
+
+    dispatcher = asyncio.run(run())
+    assert (dispatcher.sent, dispatcher.merged) == (2, 1)
+    assert dispatcher.deferred >= 1
+    first, second = (stamp for stamp, _address, _body in server.requests)
+    assert second - first >= 0.15
+    assert server.requests[1][2]["message"][0].startswith("2 events in ")
@@ -1,4 +1,5 @@
 import argparse
+import sys
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -19,14 +20,173 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument("--interval", type=float, help="Override loop interval seconds")
     parser.add_argument("--debounce", type=int, help="Override debounce count")
     parser.add_argument("--cooldown", type=float, help="Override cooldown seconds")
+    parser.add_argument(
+        "--source",
+        default="screen",
+        help="Frame source: screen, video:PATH, images:DIR or synthetic[:COUNT]; "
+        "recorded sources run at full speed and report throughput",
+    )
+    parser.add_argument(
+        "--origin",
+        metavar="LEFT,TOP",
+        help="Screen point of a recorded frame's top-left corner "
+        "(default: the regions' bounding box)",
+    )
 
     subparsers = parser.add_subparsers(dest="command")
     roi_parser = subparsers.add_parser("roi", parents=[parent], help="Pick ROI")
+    roi_parser.add_argument(
+        "--frames",
+        help="Overlay the ROI suggested from matches in these saved frames; "
+        "press S to save it",
+    )
+    roi_parser.add_argument(
+        "--margin", type=int, default=16, help="Pixels kept around the matches"
+    )
     roi_parser.set_defaults(command="roi")
     panel_parser = subparsers.add_parser(
         "panel", parents=[parent], help="Floating control panel"
     )
     panel_parser.set_defaults(command="panel")
+    supervise_parser = subparsers.add_parser(
+        "supervise",
+        parents=[parent],
+        help="Run several profiles at once, one worker process each",
+    )
+    supervise_parser.add_argument(
+        "--profile",
+        action="append",
+        required=True,
+        metavar="NAME=CONFIG",
+        help="Profile name and its config YAML; repeat for each profile",
+    )
+    supervise_parser.add_argument(
+        "--shared-capture",
+        action="store_true",
+        help="Grab the screen once per tick and share frames with every profile",
+    )
+    supervise_parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run every profile on one event loop in this process instead of "
+        "one worker process each",
+    )
+    supervise_parser.add_argument(
+        "--workers",
+        type=int,
+        help="Threads capturing and matching for --in-process (default: "
+        "CPU count + 4, at most 32)",
+    )
+    supervise_parser.set_defaults(command="supervise")
+    verify_parser = subparsers.add_parser(
+        "verify",
+        parents=[parent],
+        help="Compare configured matching against exhaustive matching on saved frames",
+    )
+    verify_parser.add_argument(
+        "--frames", help="Directory of recorded frames (default: debug.save_dir)"
+    )
+    verify_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1e-3,
+        help="Allowed absolute score difference",
+    )
+    verify_parser.set_defaults(command="verify")
+    replay_parser = subparsers.add_parser(
+        "replay",
+        parents=[parent],
+        help="Run saved frames through matching and debounce/cooldown offline",
+    )
+    replay_parser.add_argument(
+        "--frames", help="Directory of recorded frames (default: debug.save_dir)"
+    )
+    replay_parser.add_argument(
+        "--workers", type=int, default=4, help="Threads decoding frames ahead"
+    )
+    replay_parser.add_argument(
+        "--quiet", action="store_true", help="Only print notifications and totals"
+    )
+    replay_parser.add_argument("--csv", help="Write per-frame scores to this CSV file")
+    replay_parser.set_defaults(command="replay")
+    calibrate_parser = subparsers.add_parser(
+        "calibrate",
+        parents=[parent],
+        help="Find the best method and threshold from labeled frames",
+    )
+    calibrate_parser.add_argument(
+        "--frames",
+        help="Directory of saved frames labeled by name: match_* positive, "
+        "frame_* negative (default: debug.save_dir)",
+    )
+    calibrate_parser.add_argument(
+        "--manifest", help="CSV of path,label rows to use instead of file names"
+    )
+    calibrate_parser.add_argument(
+        "--pyramid-levels",
+        default="0,1,2",
+        help="Comma-separated matching.pyramid_levels values to try",
+    )
+    calibrate_parser.add_argument(
+        "--workers", type=int, default=4, help="Processes evaluating configs"
+    )
+    calibrate_parser.add_argument("--roc", help="Write ROC points to this CSV file")
+    calibrate_parser.set_defaults(command="calibrate")
+    tighten_parser = subparsers.add_parser(
+        "tighten",
+        parents=[parent],
+        help="Suggest a smaller ROI from where the templates actually matched",
+    )
+    tighten_source = tighten_parser.add_mutually_exclusive_group()
+    tighten_source.add_argument(
+        "--frames", help="Directory of saved frames (default: debug.save_dir)"
+    )
+    tighten_source.add_argument(
+        "--log", help="Match-location CSV written by `replay --csv`"
+    )
+    tighten_parser.add_argument(
+        "--margin", type=int, default=16, help="Pixels kept around the matches"
+    )
+    tighten_parser.add_argument(
+        "--write", action="store_true", help="Save the suggested ROI(s) to the config"
+    )
+    tighten_parser.set_defaults(command="tighten")
+    history_parser = subparsers.add_parser(
+        "history",
+        parents=[parent],
+        help="Summarize the recorded score history (history.enabled)",
+    )
+    history_parser.add_argument(
+        "--since", help="Start: a duration ago (30m, 2h, 7d) or a date/time"
+    )
+    history_parser.add_argument("--until", help="End, in the same forms as --since")
+    history_parser.add_argument("--region", help="Only this region")
+    history_parser.add_argument(
+        "--bucket", help="Also summarize per time bucket of this length, e.g. 1h"
+    )
+    history_parser.add_argument(
+        "--tail", type=int, default=0, help="Print the last N records"
+    )
+    history_parser.add_argument("--csv", help="Write the records in range to a CSV")
+    history_parser.set_defaults(command="history")
+    bench_parser = subparsers.add_parser(
+        "bench", parents=[parent], help="Micro-benchmarks"
+    )
+    bench_parser.add_argument(
+        "target", choices=["capture", "startup"], help="What to measure"
+    )
+    bench_parser.add_argument(
+        "--ticks", type=int, default=200, help="Iterations to time"
+    )
+    bench_parser.add_argument(
+        "--runs", type=int, default=5, help="Process launches per startup timing"
+    )
+    bench_parser.add_argument(
+        "--synthetic",
+        action="store_true",
+        help="Use an in-memory frame instead of grabbing the screen",
+    )
+    bench_parser.set_defaults(command="bench")
 
     return parser
 
@@ -38,7 +198,7 @@ def main() -> None:
     if args.command == "roi":
         from .roi_picker import run_roi_picker
 
-        run_roi_picker(args.config)
+        run_roi_picker(args.config, args.frames, args.margin)
         return
     if args.command == "panel":
         from .panel import run_panel
@@ -46,18 +206,141 @@ def main() -> None:
         run_panel(args.config)
         return
 
-    from .config import load_config
+    import functools
+
+    from .config import ConfigReloader, load_config
+
+    def loader(path: str):
+        # Picklable, so supervised workers can reload with the same overrides.
+        return functools.partial(
+            load_config,
+            path,
+            debug_override=args.debug,
+            threshold_override=args.threshold,
+            interval_override=args.interval,
+            debounce_override=args.debounce,
+            cooldown_override=args.cooldown,
+        )
+
+    def load(path: str):
+        return loader(path)()
+
+    if args.command == "supervise":
+        from .supervisor import run_in_process, run_supervisor
+
+        profiles = {}
+        reloaders = {}
+        for item in args.profile:
+            name, sep, path = item.partition("=")
+            if not sep or not name or not path:
+                parser.error(f"--profile expects NAME=CONFIG, got {item!r}")
+            if name in profiles:
+                parser.error(f"Duplicate profile name: {name}")
+            profiles[name] = load(path)
+            reloaders[name] = ConfigReloader(path, loader(path), profiles[name])
+        if args.in_process:
+            if args.shared_capture:
+                parser.error("--shared-capture needs worker processes")
+            run_in_process(profiles, reloaders, args.workers)
+            return
+        run_supervisor(profiles, args.shared_capture, reloaders=reloaders)
+        return
+
+    config = load(args.config)
+    if args.command == "verify":
+        from .verify import run_verify
+
+        failures = run_verify(
+            config, args.frames or config.debug.save_dir, args.tolerance
+        )
+        sys.exit(1 if failures else 0)
+    if args.command == "replay":
+        from .replay import run_replay
+
+        run_replay(
+            config,
+            args.frames or config.debug.save_dir,
+            args.workers,
+            args.quiet,
+            args.csv,
+        )
+        return
+    if args.command == "calibrate":
+        from .calibrate import run_calibrate
+
+        try:
+            levels = [int(value) for value in args.pyramid_levels.split(",")]
+        except ValueError:
+            parser.error("--pyramid-levels must be comma-separated integers")
+        sys.exit(
+            run_calibrate(
+                config,
+                args.frames or config.debug.save_dir,
+                args.manifest,
+                levels,
+                args.workers,
+                args.roc,
+            )
+        )
+    if args.command == "tighten":
+        from .tighten import run_tighten
+
+        sys.exit(
+            run_tighten(
+                config, args.config, args.frames, args.log, args.margin, args.write
+            )
+        )
+    if args.command == "history":
+        from .history import run_history
+
+        try:
+            code = run_history(
+                config,
+                args.since,
+                args.until,
+                args.region,
+                args.bucket,
+                args.tail,
+                args.csv,
+            )
+        except ValueError as exc:
+            parser.error(str(exc))
+        sys.exit(code)
+    if args.command == "bench":
+        if args.target == "startup":
+            from .bench import run_startup_bench
+
+            run_startup_bench(args.config, args.runs, args.synthetic)
+            return
+        from .bench import run_capture_bench
+
+        run_capture_bench(config, args.ticks, args.synthetic)
+        return
+
     from .app import run_watcher
 
-    config = load_config(
-        args.config,
-        debug_override=args.debug,
-        threshold_override=args.threshold,
-        interval_override=args.interval,
-        debounce_override=args.debounce,
-        cooldown_override=args.cooldown,
-    )
-    run_watcher(config)
+    reloader = ConfigReloader(args.config, loader(args.config), config)
+    if args.source == "screen":
+        run_watcher(config, reloader=reloader)
+        return
+
+    from .sources import open_source
+
+    origin = None
+    if args.origin:
+        try:
+            left, top = (int(value) for value in args.origin.split(","))
+        except ValueError:
+            parser.error("--origin expects LEFT,TOP")
+        origin = (left, top)
+    try:
+        source = open_source(args.source, config, origin)
+    except ValueError as exc:
+        parser.error(str(exc))
+    try:
+        run_watcher(config, capture=source, reloader=reloader)
+    finally:
+        source.close()
 
 
 if __name__ == "__main__":
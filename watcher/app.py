@@ -1,139 +1,665 @@
-import os
+import asyncio
+import contextvars
+import functools
 import time
-from threading import Event
-from typing import Optional
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import replace
+from typing import Any, Callable, List, Optional, Tuple
 
 import cv2
+import numpy as np
 
-from .capture import ScreenCapture
-from .config import Config
-from .matcher import TemplateMatcher
-from .notify import send_notification
+from .cache import TemplateCache
+from .capture import EndOfFrames, ScreenCapture
+from .change import TileChangeDetector
+from .config import (
+    ROI,
+    Config,
+    ConfigReloader,
+    Region,
+    Runtime,
+    file_mtime,
+    union_roi,
+)
+from .history import FLAG_HIT, FLAG_NOTIFIED, RegionRow, ScoreHistory
+from .matcher import MatcherBank, Observer
+from .metrics import WatcherMetrics
+from .notify import AsyncNotificationDispatcher
+from .storage import AsyncDebugFrameWriter
+from .tracking import tracking_stats_line
 
+# How often run_watcher checks its stop_event while the loop runs.
+STOP_POLL_SEC = 0.1
 
-def run_watcher(config: Config, stop_event: Optional[Event] = None) -> None:
-    capture = ScreenCapture()
-    matchers = [
-        TemplateMatcher(
-            template_path,
-            config.matching.grayscale,
-            config.matching.method,
-            config.matching.text_only,
+
+class RegionWatch:
+    # Matching plus debounce/cooldown/burst state for one named region. The
+    # region is read as a numpy view into the shared capture frame.
+    def __init__(
+        self,
+        region: Region,
+        config: Config,
+        origin: ROI,
+        labelled: bool,
+        metrics: Optional[WatcherMetrics] = None,
+    ) -> None:
+        self.name = region.name
+        self.hit_streak = 0
+        self.cooldown_until = 0.0
+        self.burst_until = 0.0
+        self.best_score = -1.0
+        self.best_loc = (0, 0)
+        self._observe: Optional[Observer] = None
+        if metrics is not None and metrics.config.enabled:
+            self._observe = functools.partial(metrics.observe, region=region.name)
+        self.bank: Optional[MatcherBank] = None
+        self.reconfigure(
+            region, config, origin, labelled, self.build_bank(region, config)
+        )
+
+    def build_bank(
+        self, region: Region, config: Config
+    ) -> Optional[Tuple[MatcherBank, List[float]]]:
+        # New matchers and template stamps when the templates, ROI or
+        # matching settings changed, else None. Leaves this watch untouched,
+        # so a bad template in any region can reject a reload as a whole.
+        stamps = [file_mtime(path) for path in region.template_paths]
+        rebuild = (
+            self.bank is None
+            or region.template_paths != self.region.template_paths
+            or stamps != self._template_stamps
+            or region.roi != self.region.roi
+            # These live in Matching but do not change the matchers.
+            or replace(config.matching, threshold=0.0, early_exit_margin=0.0)
+            != replace(self.matching, threshold=0.0, early_exit_margin=0.0)
+        )
+        if not rebuild:
+            return None
+        bank = MatcherBank.from_paths(
+            region.template_paths,
+            config.matching,
+            (region.roi.width, region.roi.height),
+        )
+        return bank, stamps
+
+    def reconfigure(
+        self,
+        region: Region,
+        config: Config,
+        origin: ROI,
+        labelled: bool,
+        built: Optional[Tuple[MatcherBank, List[float]]] = None,
+    ) -> bool:
+        # Applies a (re)loaded config to this region, with the matchers from
+        # build_bank() when they had to be rebuilt. Thresholds and timings
+        # are simply swapped in. Debounce, cooldown and burst state carry
+        # over either way. Returns True if rebuilt.
+        rebuild = built is not None
+        if rebuild:
+            self.bank, stamps = built
+            self.best_matcher = self.bank.matchers[0]
+            self.best_loc = (0, 0)
+            self._template_stamps = stamps
+            self.matching = config.matching
+        if rebuild or config.change_detection != self.change_detection:
+            self.detector = None
+            if config.change_detection.enabled:
+                self.detector = TileChangeDetector(
+                    config.change_detection.tile_size,
+                    config.change_detection.tolerance,
+                )
+            self.change_detection = config.change_detection
+        self.bank.configure_prefilter(config.prefilter, region.threshold)
+        if rebuild or config.tracking != self.tracking:
+            self.bank.configure_tracking(config.tracking)
+            self.tracking = config.tracking
+        # The debug window and saved match names want the true best score
+        # on every hit; periodic prints and saves ask for it per tick.
+        self.exit_margin = 0.0
+        debug = config.debug
+        if not debug.enabled and not (debug.save_enabled and debug.save_on_match):
+            self.exit_margin = config.matching.early_exit_margin
+        self.region = region
+        self.prefix = f"{region.name}: " if labelled else ""
+        self.x = region.roi.left - origin.left
+        self.y = region.roi.top - origin.top
+        return rebuild
+
+    def history_row(self, notified: bool) -> RegionRow:
+        flags = FLAG_HIT if self.best_score >= self.region.threshold else 0
+        if notified:
+            flags |= FLAG_NOTIFIED
+        template = self.bank.matchers.index(self.best_matcher)
+        x, y = self.best_loc
+        return self.best_score, int(x), int(y), min(template, 255), flags
+
+    def view(self, frame: np.ndarray) -> np.ndarray:
+        roi = self.region.roi
+        return frame[self.y : self.y + roi.height, self.x : self.x + roi.width]
+
+    def match(self, frame: np.ndarray, exact: bool = False) -> float:
+        view = self.view(frame)
+        change = None
+        if self.detector is not None:
+            start = time.perf_counter()
+            change = self.detector.update(view)
+            if self._observe is not None:
+                self._observe("change", time.perf_counter() - start)
+        # A local search is trusted once it reaches tracking.min_score, or
+        # the region's threshold when that is 0.
+        accept_score = self.tracking.min_score or self.region.threshold
+        exit_score = None
+        if self.exit_margin > 0 and not exact:
+            exit_score = self.region.threshold + self.exit_margin
+        self.best_score, self.best_loc, self.best_matcher = self.bank.best(
+            view, change, self._observe, accept_score, exit_score
+        )
+        return self.best_score
+
+    def update(self, now: float, runtime: Runtime) -> bool:
+        # Returns True when this tick should fire a notification.
+        region = self.region
+        if self.best_score >= region.threshold:
+            self.hit_streak += 1
+            if (
+                self.hit_streak == 1
+                and runtime.burst_interval_sec > 0
+                and region.debounce_count > 1
+                and now >= self.cooldown_until
+            ):
+                self.burst_until = now + runtime.burst_timeout_sec
+                print(f"[watcher] {self.prefix}Burst confirm started.")
+        else:
+            if self.burst_until > 0:
+                print(f"[watcher] {self.prefix}Burst confirm ended (miss).")
+            self.hit_streak = 0
+            self.burst_until = 0.0
+
+        if self.hit_streak < region.debounce_count or now < self.cooldown_until:
+            return False
+        self.cooldown_until = now + region.cooldown_sec
+        self.hit_streak = 0
+        self.burst_until = 0.0
+        if region.cooldown_sec > 0:
+            print(f"[watcher] {self.prefix}Cooldown for {region.cooldown_sec:.1f}s")
+        return True
+
+    def bursting(self, now: float) -> bool:
+        # While a burst is active the loop polls at burst_interval_sec to
+        # collect the debounce hits quickly instead of waiting interval_sec.
+        if self.burst_until <= 0:
+            return False
+        if now < self.burst_until:
+            return True
+        print(f"[watcher] {self.prefix}Burst confirm timed out.")
+        self.burst_until = 0.0
+        return False
+
+
+async def run_watcher_async(
+    config: Config,
+    capture: Optional[Any] = None,
+    reloader: Optional[ConfigReloader] = None,
+    executor: Optional[Executor] = None,
+) -> None:
+    # The watcher loop as a coroutine, so many watchers can share one event
+    # loop. Capture, matching and config rebuilds run in `executor` (the
+    # loop's default one when None); notifications and debug frames are
+    # handled by tasks. Cancel the task to stop it.
+    # `capture` replaces the screen grabber, e.g. a FrameBusCapture reading
+    # frames another process already captured or a recorded source from
+    # sources.py, which runs unpaced until it raises EndOfFrames. Zero-copy
+    # capture emits grayscale directly when every matcher would convert to
+    # it anyway.
+    # With a `reloader`, edits to the config file are applied between ticks.
+    loop = asyncio.get_running_loop()
+
+    def offload(func: Callable[..., Any], *args: Any) -> "asyncio.Future[Any]":
+        # Context variables (e.g. an output prefix) follow into the executor.
+        context = contextvars.copy_context()
+        return loop.run_in_executor(executor, context.run, func, *args)
+
+    owns_capture = capture is None
+    # mss keeps per-thread handles (GDI device contexts on Windows, the X11
+    # display), so a screen grabber is created and used on one thread of its
+    # own rather than on whichever executor thread is free.
+    capture_executor: Optional[ThreadPoolExecutor] = None
+
+    def on_capture_thread(
+        func: Callable[..., Any], *args: Any
+    ) -> "asyncio.Future[Any]":
+        context = contextvars.copy_context()
+        return loop.run_in_executor(capture_executor, context.run, func, *args)
+
+    if capture is None:
+        capture_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="watcher-capture"
+        )
+        capture = await on_capture_thread(
+            functools.partial(
+                ScreenCapture,
+                zero_copy=config.capture.zero_copy,
+                gray=config.matching.grayscale or config.matching.text_only,
+            )
         )
-        for template_path in config.template_paths
-    ]
+    # Recorded sources are not paced, do not send notifications and do not
+    # add to the score history.
+    live = capture.live
+    # One grab of the regions' bounding box per tick; each region slices it.
+    capture_roi = union_roi([region.roi for region in config.regions])
+    labelled = len(config.regions) > 1
+    metrics = WatcherMetrics(config.metrics)
+    watches = await offload(
+        lambda: [
+            RegionWatch(region, config, capture_roi, labelled, metrics)
+            for region in config.regions
+        ]
+    )
+
+    # Counts cover every watcher in this process that shares the directory.
+    cache = TemplateCache.for_dir(config.matching.cache_dir)
+    if cache is not None:
+        print(f"[cache] {cache.stats_line()} ({cache.cache_dir})")
+        metrics.counter_source("template_cache_hits", lambda: cache.hits)
+        metrics.counter_source("template_cache_misses", lambda: cache.misses)
 
-    hit_streak = 0
-    cooldown_until = 0.0
+    observe = metrics.observe if config.metrics.enabled else None
+    dispatcher = AsyncNotificationDispatcher(config.notify, observe)
+    metrics.counter_source("notifications_sent", lambda: dispatcher.sent)
+    metrics.counter_source("notifications_failed", lambda: dispatcher.failed)
+    metrics.counter_source("notifications_dropped", lambda: dispatcher.dropped)
+    metrics.counter_source("notifications_merged", lambda: dispatcher.merged)
+    metrics.counter_source("notifications_deferred", lambda: dispatcher.deferred)
     frame_index = 0
 
     print("[watcher] Starting watcher loop...")
-    if config.debug.save_enabled:
-        os.makedirs(config.debug.save_dir, exist_ok=True)
+    if labelled:
+        names = ", ".join(watch.name for watch in watches)
+        print(f"[watcher] Watching regions: {names}")
+    writer: Optional[AsyncDebugFrameWriter] = None
+    history: Optional[ScoreHistory] = None
+
+    def start_writer() -> None:
+        nonlocal writer
+        writer = AsyncDebugFrameWriter(config.debug, observe)
         print(f"[watcher] Saving frames to: {config.debug.save_dir}")
+        metrics.counter_source("debug_writes", lambda: writer.written)
+        metrics.counter_source("debug_writes_dropped", lambda: writer.dropped)
+        metrics.counter_source("debug_writes_failed", lambda: writer.failed)
+        if writer.chunks is not None:
+            metrics.counter_source(
+                "debug_writes_duplicate", lambda: writer.chunks.duplicates
+            )
+
+    async def stop_writer() -> None:
+        nonlocal writer
+        await writer.aclose()
+        if writer.dropped:
+            print(f"[watcher] Dropped {writer.dropped} debug frame(s) under load.")
+        counts = [
+            ("debug_writes", writer.written),
+            ("debug_writes_dropped", writer.dropped),
+            ("debug_writes_failed", writer.failed),
+        ]
+        if writer.chunks is not None:
+            print(f"[watcher] Saved video frames: {writer.chunks.stats_line()}")
+            counts.append(("debug_writes_duplicate", writer.chunks.duplicates))
+        # Keep the final counts visible after the writer goes away.
+        for name, value in counts:
+            metrics.counter_source(name, lambda value=value: value)
+        writer = None
+
+    async def open_history() -> None:
+        nonlocal history
+        if history is not None:
+            await offload(history.close)
+            history = None
+        if not (config.history.enabled and live):
+            return
+        history = await offload(
+            ScoreHistory.create,
+            config.history.path,
+            config.history.capacity,
+            [watch.name for watch in watches],
+        )
+        print(f"[watcher] Recording score history to: {config.history.path}")
+
+    def rebuild_watches(new_config: Config) -> Optional[tuple]:
+        # Runs in the executor: builds (or reconfigures) the region watches
+        # for new_config without touching the running ones' identity. None
+        # means the reload must be rejected.
+        new_roi = union_roi([region.roi for region in new_config.regions])
+        new_gray = new_config.matching.grayscale or new_config.matching.text_only
+        old_gray = config.matching.grayscale or config.matching.text_only
+        if not owns_capture and (new_roi != capture_roi or new_gray != old_gray):
+            print(
+                "[config] Reload rejected: the region ROIs or color mode changed "
+                "but the frame source is fixed; restart to apply."
+            )
+            return None
+        if new_config.metrics != config.metrics:
+            print("[config] metrics.* changes take effect on restart.")
+            new_config = replace(new_config, metrics=config.metrics)
+        new_labelled = len(new_config.regions) > 1
+        current = {watch.name: watch for watch in watches}
+        # Build every new region and bank before touching a running watch, so
+        # a failure in any region leaves all of them on the old config.
+        planned = []
+        for region in new_config.regions:
+            watch = current.pop(region.name, None)
+            if watch is None:
+                watch = RegionWatch(region, new_config, new_roi, new_labelled, metrics)
+                planned.append((region, watch, None, True))
+            else:
+                built = watch.build_bank(region, new_config)
+                planned.append((region, watch, built, False))
+        new_watches = []
+        changes = []
+        for region, watch, built, added in planned:
+            if added:
+                changes.append(f"added {region.name}")
+            elif watch.reconfigure(region, new_config, new_roi, new_labelled, built):
+                changes.append(f"rebuilt {region.name}")
+            new_watches.append(watch)
+        changes.extend(f"removed {name}" for name in current)
+        return new_config, new_roi, new_labelled, new_watches, changes
+
+    async def apply_config(
+        new_config: Config,
+        new_roi: ROI,
+        new_labelled: bool,
+        new_watches: list,
+        changes: list,
+    ) -> None:
+        nonlocal config, capture, capture_roi, labelled, watches, dispatcher
+        old = config
+        old_names = [watch.name for watch in watches]
+        config = new_config
+        capture_roi = new_roi
+        labelled = new_labelled
+        watches = new_watches
+
+        new_gray = config.matching.grayscale or config.matching.text_only
+        old_gray = old.matching.grayscale or old.matching.text_only
+        if owns_capture and (
+            config.capture != old.capture or new_gray != old_gray
+        ):
+            capture = await on_capture_thread(
+                functools.partial(
+                    ScreenCapture, zero_copy=config.capture.zero_copy, gray=new_gray
+                )
+            )
+            changes.append("capture")
+
+        if config.notify != old.notify:
+            await dispatcher.aclose()
+            dispatcher = AsyncNotificationDispatcher(config.notify, observe)
+            changes.append("notify")
+        names = [watch.name for watch in watches]
+        if config.history != old.history or names != old_names:
+            await open_history()
+            changes.append("history")
+        if config.debug != old.debug:
+            if writer is not None:
+                await stop_writer()
+            if config.debug.save_enabled:
+                start_writer()
+            changes.append("debug")
+            if old.debug.enabled and old.debug.show_window:
+                cv2.destroyAllWindows()
+        summary = ", ".join(changes) if changes else "thresholds/timings only"
+        print(f"[config] Reloaded ({summary}).")
+
+    def grab() -> Tuple[np.ndarray, float]:
+        # Returns the frame and the capture seconds.
+        start = time.perf_counter()
+        frame = capture.grab_roi(capture_roi)
+        capture_sec = time.perf_counter() - start
+        metrics.observe("capture", capture_sec)
+        return frame, capture_sec
+
+    def exact_scores(index: int) -> bool:
+        # Ticks whose score is printed or put in a saved file name skip early
+        # exit, so the score is the true best.
+        debug = config.debug
+        if debug.print_score_every_n > 0 and index % debug.print_score_every_n == 0:
+            return True
+        return (
+            writer is not None
+            and debug.save_every_n > 0
+            and index % debug.save_every_n == 0
+        )
+
+    def match_frame(frame: np.ndarray, exact: bool) -> float:
+        # Returns the matching seconds.
+        start = time.perf_counter()
+        for watch in watches:
+            watch.match(frame, exact)
+            if watch.best_score >= watch.region.threshold:
+                metrics.inc("hits")
+        return time.perf_counter() - start
+
+    def grab_and_match(exact: bool) -> Tuple[np.ndarray, float, float]:
+        frame, capture_sec = grab()
+        return frame, capture_sec, match_frame(frame, exact)
 
+    if config.debug.save_enabled:
+        start_writer()
+    await open_history()
+    metrics.start()
+
+    started = time.perf_counter()
     try:
         while True:
-            if stop_event is not None and stop_event.is_set():
-                print("[watcher] Stop requested.")
+            if reloader is not None:
+                new_config = await offload(reloader.poll, config)
+                if new_config is not None:
+                    try:
+                        rebuilt = await offload(rebuild_watches, new_config)
+                        if rebuilt is not None:
+                            await apply_config(*rebuilt)
+                    except Exception as exc:
+                        print(f"[config] Reload failed: {exc}")
+            tick_start = time.perf_counter()
+            exact = exact_scores(frame_index + 1)
+            try:
+                if capture_executor is None:
+                    frame, capture_sec, match_sec = await offload(
+                        grab_and_match, exact
+                    )
+                else:
+                    frame, capture_sec = await on_capture_thread(grab)
+                    match_sec = await offload(match_frame, frame, exact)
+            except EndOfFrames:
+                print("[watcher] Frame source exhausted.")
                 break
-            frame = capture.grab_roi(config.roi)
-            best_score = -1.0
-            best_loc = (0, 0)
-            best_matcher = matchers[0]
-            for matcher in matchers:
-                score, loc = matcher.match(frame)
-                if score > best_score:
-                    best_score = score
-                    best_loc = loc
-                    best_matcher = matcher
+            best_score = max(watch.best_score for watch in watches)
             frame_index += 1
+            metrics.inc("frames")
+            if config.change_detection.enabled and config.change_detection.log_every_n > 0:
+                if frame_index % config.change_detection.log_every_n == 0:
+                    for watch in watches:
+                        print(
+                            f"[watcher] {watch.prefix}change detection: "
+                            f"{watch.detector.stats_line()}"
+                        )
+            if config.tracking.enabled and config.tracking.log_every_n > 0:
+                if frame_index % config.tracking.log_every_n == 0:
+                    for watch in watches:
+                        print(
+                            f"[watcher] {watch.prefix}tracking: "
+                            f"{tracking_stats_line(watch.bank.trackers)}"
+                        )
             saved_frame = False
 
-            if config.debug.save_enabled and config.debug.save_every_n > 0:
+            if writer is not None and config.debug.save_every_n > 0:
                 if frame_index % config.debug.save_every_n == 0:
                     ts = time.strftime("%Y%m%d-%H%M%S")
-                    filename = (
-                        f"frame_{ts}_{frame_index:06d}_{best_score:.3f}.png"
+                    path = writer.submit(
+                        f"frame_{ts}_{frame_index:06d}_{best_score:.3f}", frame
                     )
-                    path = os.path.join(config.debug.save_dir, filename)
-                    cv2.imwrite(path, frame)
                     saved_frame = True
-                    print(f"[watcher] saved {path}")
+                    print(f"[watcher] queued {path}")
 
-            if best_score >= config.matching.threshold:
-                hit_streak += 1
-            else:
-                hit_streak = 0
-
-            now = time.time()
-            if hit_streak >= config.runtime.debounce_count and now >= cooldown_until:
-                message = f"Match score {best_score:.3f}"
-                send_notification(
-                    title=config.notify.title,
-                    message=message,
-                    use_toast=config.notify.use_toast,
-                    beep_fallback=config.notify.beep_fallback,
-                    provider=config.notify.provider,
-                    fallback_to_local=config.notify.fallback_to_local,
-                    pushover_app_token=config.notify.pushover_app_token,
-                    pushover_user_key=config.notify.pushover_user_key,
-                    telegram_bot_token=config.notify.telegram_bot_token,
-                    telegram_chat_id=config.notify.telegram_chat_id,
-                )
-                if config.debug.save_enabled and config.debug.save_on_match:
+            now = capture.timestamp()
+            notified = set()
+            for watch in watches:
+                if not watch.update(now, config.runtime):
+                    continue
+                notified.add(watch.name)
+                message = f"{watch.prefix}Match score {watch.best_score:.3f}"
+                metrics.inc("notifications")
+                if live:
+                    dispatcher.submit(
+                        config.notify.title,
+                        message,
+                        watch.name if labelled else "",
+                        watch.best_score,
+                    )
+                else:
+                    print(f"[watcher] NOTIFY frame {frame_index}: {message}")
+                if writer is not None and config.debug.save_on_match:
                     if not saved_frame:
                         ts = time.strftime("%Y%m%d-%H%M%S")
-                        filename = (
-                            f"match_{ts}_{frame_index:06d}_{best_score:.3f}.png"
-                        )
-                        path = os.path.join(config.debug.save_dir, filename)
-                        cv2.imwrite(path, frame)
-                        print(f"[watcher] saved match {path}")
-                cooldown_until = now + config.runtime.cooldown_sec
-                hit_streak = 0
-                if config.runtime.cooldown_sec > 0:
-                    print(
-                        f"[watcher] Cooldown for {config.runtime.cooldown_sec:.1f}s"
-                    )
+                        stem = f"match_{ts}_{frame_index:06d}_{watch.best_score:.3f}"
+                        if labelled:
+                            stem = f"{stem}_{watch.name}"
+                        path = writer.submit(stem, frame)
+                        print(f"[watcher] queued match {path}")
 
             if config.debug.print_score_every_n > 0:
                 if frame_index % config.debug.print_score_every_n == 0:
-                    print(
-                        f"[watcher] score={best_score:.4f} streak={hit_streak}"
-                    )
+                    for watch in watches:
+                        print(
+                            f"[watcher] {watch.prefix}score={watch.best_score:.4f} "
+                            f"streak={watch.hit_streak}"
+                        )
 
             if config.debug.enabled and config.debug.show_window:
-                display = frame.copy()
-                if config.debug.show_match_box:
-                    w, h = best_matcher.template_size()
-                    top_left = best_loc
-                    bottom_right = (top_left[0] + w, top_left[1] + h)
-                    cv2.rectangle(display, top_left, bottom_right, (0, 255, 0), 2)
-                cv2.putText(
-                    display,
-                    f"score: {best_score:.3f}",
-                    (10, 25),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (0, 255, 0),
-                    2,
-                )
+                if frame.ndim == 2:
+                    display = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+                else:
+                    display = frame.copy()
+                for index, watch in enumerate(watches):
+                    if labelled:
+                        roi = watch.region.roi
+                        cv2.rectangle(
+                            display,
+                            (watch.x, watch.y),
+                            (watch.x + roi.width, watch.y + roi.height),
+                            (255, 128, 0),
+                            1,
+                        )
+                    if config.debug.show_match_box:
+                        w, h = watch.best_matcher.template_size()
+                        top_left = (watch.x + watch.best_loc[0], watch.y + watch.best_loc[1])
+                        bottom_right = (top_left[0] + w, top_left[1] + h)
+                        cv2.rectangle(display, top_left, bottom_right, (0, 255, 0), 2)
+                    cv2.putText(
+                        display,
+                        f"{watch.prefix}score: {watch.best_score:.3f}",
+                        (10, 25 + 25 * index),
+                        cv2.FONT_HERSHEY_SIMPLEX,
+                        0.7,
+                        (0, 255, 0),
+                        2,
+                    )
                 cv2.imshow("Watcher ROI", display)
                 key = cv2.waitKey(1) & 0xFF
                 if key == ord("q"):
                     print("[watcher] Quit requested via 'q'.")
                     break
 
-            if stop_event is not None:
-                if stop_event.wait(config.runtime.interval_sec):
-                    print("[watcher] Stop requested.")
-                    break
-            else:
-                time.sleep(config.runtime.interval_sec)
-    except KeyboardInterrupt:
-        print("[watcher] Stopped by Ctrl+C.")
+            tick_sec = time.perf_counter() - tick_start
+            metrics.observe("tick", tick_sec)
+            if history is not None:
+                history.append(
+                    now,
+                    (capture_sec, match_sec, tick_sec),
+                    [watch.history_row(watch.name in notified) for watch in watches],
+                )
+            interval = config.runtime.interval_sec
+            now = capture.timestamp()
+            if any([watch.bursting(now) for watch in watches]):
+                interval = config.runtime.burst_interval_sec
+            if not live:
+                interval = 0.0
+            await asyncio.sleep(interval)
     finally:
+        if capture_executor is not None:
+            capture_executor.shutdown(wait=False)
+        await dispatcher.aclose()
+        if history is not None:
+            await offload(history.close)
+        if config.notify.coalesce_sec > 0 or config.notify.rate_per_min > 0:
+            print(f"[watcher] notifications: {dispatcher.stats_line()}")
+        if writer is not None:
+            await stop_writer()
+        metrics.close()
+        if config.metrics.enabled:
+            for line in metrics.summary_lines():
+                print(f"[metrics] {line}")
+        for watch in watches:
+            if watch.detector is not None:
+                print(
+                    f"[watcher] {watch.prefix}change detection: "
+                    f"{watch.detector.stats_line()}"
+                )
+            if watch.bank.trackers:
+                print(
+                    f"[watcher] {watch.prefix}tracking: "
+                    f"{tracking_stats_line(watch.bank.trackers)}"
+                )
+            if watch.bank.prefilter_levels:
+                print(
+                    f"[watcher] {watch.prefix}prefilter: "
+                    f"{watch.bank.prefilter_stats_line()}"
+                )
+            if watch.exit_margin > 0:
+                print(
+                    f"[watcher] {watch.prefix}early exit: "
+                    f"{watch.bank.early_exit_stats_line()}"
+                )
+        if not live:
+            elapsed = time.perf_counter() - started
+            print(
+                f"[watcher] Throughput: {frame_index} frame(s) in {elapsed:.2f}s "
+                f"({frame_index / max(elapsed, 1e-9):.1f} fps, "
+                f"{elapsed * 1000 / max(frame_index, 1):.2f}ms/frame)"
+            )
         if config.debug.enabled and config.debug.show_window:
             cv2.destroyAllWindows()
         print("[watcher] Exiting.")
+
+
+def run_watcher(
+    config: Config,
+    stop_event: Optional[Any] = None,
+    capture: Optional[Any] = None,
+    reloader: Optional[ConfigReloader] = None,
+) -> None:
+    # Blocking entry point: runs the asyncio core on its own event loop until
+    # it returns, Ctrl+C, or `stop_event` (a threading or multiprocessing
+    # Event) is set. Capture and matching stay on one worker thread, as they
+    # did before the loop was asynchronous.
+    async def main() -> None:
+        task = asyncio.ensure_future(
+            run_watcher_async(config, capture, reloader, executor)
+        )
+        while not task.done():
+            if stop_event is not None and stop_event.is_set():
+                print("[watcher] Stop requested.")
+                task.cancel()
+                await asyncio.wait({task})
+                break
+            await asyncio.wait({task}, timeout=STOP_POLL_SEC)
+        if not task.cancelled():
+            task.result()
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="watcher")
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("[watcher] Stopped by Ctrl+C.")
+    finally:
+        executor.shutdown(wait=True)
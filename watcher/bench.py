@@ -0,0 +1,184 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import replace
+from typing import Callable, Dict, List
+
+import mss
+import numpy as np
+from mss.screenshot import ScreenShot
+
+from .capture import BgraConverter, monitor_for
+from .config import Config, load_config, union_roi
+from .matcher import preprocess_frame
+
+
+def _ms_per_tick(step: Callable[[], None], ticks: int) -> float:
+    step()
+    start = time.perf_counter()
+    for _ in range(ticks):
+        step()
+    return (time.perf_counter() - start) / ticks * 1000
+
+
+def _kib_allocated_per_tick(step: Callable[[], None], ticks: int) -> float:
+    # Peak traced memory above the starting point, i.e. the bytes the tick
+    # needed at once, including buffers freed again before it returned.
+    tracemalloc.start()
+    total = 0
+    for _ in range(ticks):
+        before, _peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        step()
+        _current, peak = tracemalloc.get_traced_memory()
+        total += max(0, peak - before)
+    tracemalloc.stop()
+    return total / ticks / 1024
+
+
+def run_capture_bench(config: Config, ticks: int, synthetic: bool) -> None:
+    roi = union_roi([region.roi for region in config.regions])
+    gray = config.matching.grayscale or config.matching.text_only
+    converter = BgraConverter(gray)
+
+    if synthetic:
+        rng = np.random.default_rng(0)
+        raw = bytearray(
+            rng.integers(0, 256, roi.width * roi.height * 4, dtype=np.uint8).tobytes()
+        )
+
+        def grab() -> ScreenShot:
+            return ScreenShot.from_size(raw, roi.width, roi.height)
+
+    else:
+        sct = mss.mss()
+        monitor = monitor_for(roi)
+
+        def grab() -> ScreenShot:
+            return sct.grab(monitor)
+
+    # The old path: copy the screenshot into a new array, slice off alpha,
+    # then let the matcher convert that non-contiguous view again.
+    def copy_path() -> None:
+        img = np.array(grab())[:, :, :3]
+        preprocess_frame(img, gray, False)
+
+    def zero_copy_path() -> None:
+        converter.convert(grab())
+
+    source = "synthetic buffer" if synthetic else "live mss grab"
+    print(
+        f"[bench] capture {roi.width}x{roi.height} ({source}), "
+        f"{'gray' if gray else 'BGR'} output, {ticks} ticks"
+    )
+    for name, step in (("copy", copy_path), ("zero-copy", zero_copy_path)):
+        print(
+            f"[bench] {name:>9}: {_ms_per_tick(step, ticks):.3f} ms/tick, "
+            f"{_kib_allocated_per_tick(step, min(ticks, 20)):.0f} KiB allocated/tick"
+        )
+
+
+# Run in a fresh interpreter by run_startup_bench; `started` is taken before
+# any watcher module (and with it cv2/numpy/mss) is imported.
+def first_frame_probe(
+    started: float, config_path: str, cache_dir: str, synthetic: bool
+) -> None:
+    from .app import RegionWatch
+    from .capture import ScreenCapture
+
+    marks: Dict[str, float] = {}
+    last = started
+
+    def mark(name: str) -> None:
+        nonlocal last
+        now = time.perf_counter()
+        marks[name] = (now - last) * 1000
+        last = now
+
+    mark("imports")
+    config = load_config(config_path)
+    config.matching = replace(config.matching, cache_dir=cache_dir)
+    mark("config")
+    roi = union_roi([region.roi for region in config.regions])
+    labelled = len(config.regions) > 1
+    watches = [RegionWatch(region, config, roi, labelled) for region in config.regions]
+    mark("matchers")
+    gray = config.matching.grayscale or config.matching.text_only
+    if synthetic:
+        shape = (roi.height, roi.width) if gray else (roi.height, roi.width, 3)
+        frame = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    else:
+        capture = ScreenCapture(zero_copy=config.capture.zero_copy, gray=gray)
+        frame = capture.grab_roi(roi)
+    mark("capture")
+    for watch in watches:
+        watch.match(frame)
+    mark("first_match")
+    print(json.dumps(marks))
+
+
+def _run_probe(config_path: str, cache_dir: str, synthetic: bool) -> Dict[str, float]:
+    code = (
+        "import time; t = time.perf_counter(); "
+        "from watcher.bench import first_frame_probe; "
+        f"first_frame_probe(t, {config_path!r}, {cache_dir!r}, {synthetic!r})"
+    )
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    wall = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    marks = json.loads(result.stdout.strip().splitlines()[-1])
+    marks["interpreter"] = wall - sum(marks.values())
+    marks["total"] = wall
+    return marks
+
+
+def run_startup_bench(config_path: str, runs: int, synthetic: bool) -> None:
+    config_path = os.path.abspath(config_path)
+    help_ms: List[float] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "watcher", "--help"],
+            capture_output=True,
+            check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        help_ms.append((time.perf_counter() - start) * 1000)
+    print(
+        f"[bench] --help: median {statistics.median(help_ms):.0f} ms, "
+        f"min {min(help_ms):.0f} ms over {runs} run(s)"
+    )
+
+    source = "synthetic frame" if synthetic else "live mss grab"
+    phases = ("interpreter", "imports", "config", "matchers", "capture", "first_match")
+    with tempfile.TemporaryDirectory(prefix="watcher-cache-") as cache_dir:
+        # The cold run fills the throwaway cache that the warm runs read.
+        for label, directory, count in (
+            ("no cache", "", runs),
+            ("cold cache", cache_dir, 1),
+            ("warm cache", cache_dir, runs),
+        ):
+            samples = [
+                _run_probe(config_path, directory, synthetic) for _ in range(count)
+            ]
+            median = {
+                name: statistics.median(sample[name] for sample in samples)
+                for name in samples[0]
+            }
+            detail = " ".join(f"{name}={median[name]:.0f}" for name in phases)
+            print(
+                f"[bench] first frame ({label}, {source}): {median['total']:.0f} ms "
+                f"[{detail}] median of {count}"
+            )
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Bump when the preprocessing code changes so stale artifacts are ignored.
+CACHE_VERSION = 1
+
+_caches: Dict[str, "TemplateCache"] = {}
+
+
+class TemplateCache:
+    # Content-addressed store for preprocessed template artifacts. Keys start
+    # with the SHA-256 of the template file, so editing a template (or
+    # pointing at a different file with the same name) never hits a stale
+    # entry. Arrays are .npy files opened memory-mapped.
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+
+    @classmethod
+    def for_dir(cls, cache_dir: str) -> Optional["TemplateCache"]:
+        if not cache_dir:
+            return None
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = cls(cache_dir)
+            _caches[cache_dir] = cache
+        return cache
+
+    def file_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        memo_key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._hashes.get(memo_key)
+        if digest is None:
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            self._hashes[memo_key] = digest
+        return digest
+
+    def template_key(self, path: str, gray: bool, edges: bool) -> str:
+        digest = self.file_hash(path)[:32]
+        return f"{digest}-v{CACHE_VERSION}-g{int(gray)}e{int(edges)}"
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, key + extension)
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        try:
+            array = np.load(self._path(key, ".npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return array
+
+    def stats_line(self) -> str:
+        return f"hits={self.hits} misses={self.misses}"
+
+    def store(self, key: str, array: np.ndarray) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write then rename so a concurrent reader (another profile's
+            # worker) never maps a half-written file.
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp_path, self._path(key, ".npy"))
+        except OSError as exc:
+            print(f"[cache] Could not store {key}: {exc}")
+
+    def load_json(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key, ".json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store_json(self, key: str, value: dict) -> None:
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, self._path(key, ".json"))
+        except OSError as exc:
+            print(f"[cache] Could not store {key}: {exc}")
@@ -0,0 +1,286 @@
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .config import ROI, Config, Matching, Region, union_roi
+from .matcher import MatcherBank
+from .storage import list_frames, parse_saved_name, read_frame
+
+# The watcher keeps the highest score, so only methods where higher means a
+# better match can be calibrated (the TM_SQDIFF family is the opposite).
+CALIBRATE_METHODS = ("TM_CCOEFF_NORMED", "TM_CCORR_NORMED")
+# (grayscale, text_only); text_only already works on a grayscale image.
+CALIBRATE_PREPROCESS = ((False, False), (True, False), (True, True))
+POSITIVE_LABELS = ("1", "true", "yes", "pos", "positive", "match")
+NEGATIVE_LABELS = ("0", "false", "no", "neg", "negative", "frame")
+# A config only counts as separating the labels when the lowest positive score
+# beats the highest negative one by at least this much.
+CLEAN_MARGIN = 0.05
+
+Sample = Tuple[str, bool]
+
+
+@dataclass
+class CalibrationResult:
+    name: str
+    matching: Matching
+    positives: np.ndarray
+    negatives: np.ndarray
+    ms_per_frame: float
+    auc: float = 0.0
+    threshold: float = 0.0
+    tpr: float = 0.0
+    fpr: float = 0.0
+    margin: float = 0.0
+
+
+def samples_from_names(frames_dir: str) -> List[Sample]:
+    # match_* images were saved when the watcher fired, frame_* images on the
+    # periodic save, so the file name doubles as the label.
+    samples = []
+    for path in list_frames(frames_dir):
+        info = parse_saved_name(path)
+        if info is not None:
+            samples.append((path, info[0] == "match"))
+    return samples
+
+
+def samples_from_manifest(manifest_path: str) -> List[Sample]:
+    # CSV with "path,label" rows; relative paths are resolved against the
+    # manifest's directory and a header row is allowed.
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    samples = []
+    with open(manifest_path, newline="", encoding="utf-8") as f:
+        for line_no, row in enumerate(csv.reader(f), start=1):
+            if not row or row[0].startswith("#"):
+                continue
+            if len(row) < 2:
+                raise ValueError(f"{manifest_path}:{line_no}: expected path,label")
+            path, label = row[0].strip(), row[1].strip().lower()
+            if label in POSITIVE_LABELS:
+                positive = True
+            elif label in NEGATIVE_LABELS:
+                positive = False
+            elif line_no == 1:
+                continue
+            else:
+                raise ValueError(
+                    f"{manifest_path}:{line_no}: unknown label {row[1]!r}"
+                )
+            if not os.path.isabs(path):
+                path = os.path.join(base, path)
+            samples.append((path, positive))
+    return samples
+
+
+def calibration_grid(
+    matching: Matching, pyramid_levels: Sequence[int]
+) -> List[Matching]:
+    grid = []
+    for method in CALIBRATE_METHODS:
+        for grayscale, text_only in CALIBRATE_PREPROCESS:
+            for levels in pyramid_levels:
+                grid.append(
+                    replace(
+                        matching,
+                        method=method,
+                        grayscale=grayscale,
+                        text_only=text_only,
+                        pyramid_levels=levels,
+                        engine="spatial",
+                    )
+                )
+    return grid
+
+
+def describe(matching: Matching) -> str:
+    if matching.text_only:
+        mode = "text_only"
+    elif matching.grayscale:
+        mode = "gray"
+    else:
+        mode = "color"
+    return f"{matching.method} {mode} pyr={matching.pyramid_levels}"
+
+
+def _init_worker() -> None:
+    # One OpenCV thread per process keeps the configs from competing for
+    # cores, so ms/frame compares configs fairly (single-threaded cost).
+    cv2.setNumThreads(1)
+
+
+def _evaluate(
+    matching: Matching, regions: List[Region], origin: ROI, samples: List[Sample]
+) -> Tuple[List[float], List[bool], float]:
+    # Runs in a worker process. Frames are decoded here rather than pickled
+    # over from the parent; only the matching time is measured.
+    banks = []
+    for region in regions:
+        banks.append(
+            (
+                region,
+                region.roi.left - origin.left,
+                region.roi.top - origin.top,
+                MatcherBank.from_paths(region.template_paths, matching),
+            )
+        )
+    scores: List[float] = []
+    labels: List[bool] = []
+    match_sec = 0.0
+    for path, positive in samples:
+        frame = read_frame(path)
+        if frame is None:
+            continue
+        if frame.shape[0] < origin.height or frame.shape[1] < origin.width:
+            continue
+        start = time.perf_counter()
+        best = -1.0
+        for region, x, y, bank in banks:
+            view = frame[y : y + region.roi.height, x : x + region.roi.width]
+            best = max(best, bank.best(view)[0])
+        match_sec += time.perf_counter() - start
+        scores.append(best)
+        labels.append(positive)
+    ms_per_frame = match_sec / len(scores) * 1000 if scores else 0.0
+    return scores, labels, ms_per_frame
+
+
+def roc_points(
+    positives: np.ndarray, negatives: np.ndarray
+) -> List[Tuple[float, float, float]]:
+    # (threshold, true positive rate, false positive rate) for every distinct
+    # score, highest threshold first; a frame is a hit when score >= threshold.
+    points = []
+    for threshold in np.unique(np.concatenate([positives, negatives]))[::-1]:
+        tpr = float(np.mean(positives >= threshold)) if positives.size else 0.0
+        fpr = float(np.mean(negatives >= threshold)) if negatives.size else 0.0
+        points.append((float(threshold), tpr, fpr))
+    return points
+
+
+def summarize(result: CalibrationResult) -> None:
+    positives, negatives = result.positives, result.negatives
+    if positives.size == 0 or negatives.size == 0:
+        return
+    # AUC as the probability that a positive frame outscores a negative one.
+    ordered = np.sort(negatives)
+    below = np.searchsorted(ordered, positives, side="left")
+    ties = np.searchsorted(ordered, positives, side="right") - below
+    pairs = positives.size * negatives.size
+    result.auc = float((below + 0.5 * ties).sum() / pairs)
+    result.margin = float(positives.min() - negatives.max())
+    if result.margin > 0:
+        # Clean separation: put the threshold in the middle of the gap.
+        result.threshold = float(negatives.max() + result.margin / 2)
+        result.tpr, result.fpr = 1.0, 0.0
+        return
+    best = None
+    for threshold, tpr, fpr in roc_points(positives, negatives):
+        if best is None or tpr - fpr > best[1] - best[2]:
+            best = (threshold, tpr, fpr)
+    result.threshold, result.tpr, result.fpr = best
+
+
+def run_calibrate(
+    config: Config,
+    frames_dir: str,
+    manifest: Optional[str],
+    pyramid_levels: Sequence[int],
+    workers: int,
+    roc_path: Optional[str] = None,
+) -> int:
+    if manifest:
+        samples = samples_from_manifest(manifest)
+    else:
+        samples = samples_from_names(frames_dir)
+    positives = sum(1 for _path, positive in samples if positive)
+    negatives = len(samples) - positives
+    if positives == 0 or negatives == 0:
+        source = manifest or frames_dir
+        print(
+            f"[calibrate] Need both positive and negative frames in {source} "
+            f"(found {positives} positive, {negatives} negative)."
+        )
+        return 1
+
+    origin = union_roi([region.roi for region in config.regions])
+    grid = calibration_grid(config.matching, pyramid_levels)
+    print(
+        f"[calibrate] {positives} positive / {negatives} negative frame(s), "
+        f"{len(grid)} config(s), {workers} process(es)"
+    )
+    results: List[CalibrationResult] = []
+    with ProcessPoolExecutor(
+        max_workers=max(1, workers), initializer=_init_worker
+    ) as pool:
+        futures = [
+            (
+                matching,
+                pool.submit(_evaluate, matching, config.regions, origin, samples),
+            )
+            for matching in grid
+        ]
+        for matching, future in futures:
+            scores, labels, ms_per_frame = future.result()
+            scores_arr = np.asarray(scores, dtype=np.float64)
+            labels_arr = np.asarray(labels, dtype=bool)
+            result = CalibrationResult(
+                describe(matching),
+                matching,
+                scores_arr[labels_arr],
+                scores_arr[~labels_arr],
+                ms_per_frame,
+            )
+            summarize(result)
+            results.append(result)
+
+    print(
+        f"[calibrate] {'config':<38} {'auc':>6} {'threshold':>9} "
+        f"{'tpr':>6} {'fpr':>6} {'margin':>7} {'ms/frame':>8}"
+    )
+    for result in results:
+        print(
+            f"[calibrate] {result.name:<38} {result.auc:>6.3f} "
+            f"{result.threshold:>9.4f} {result.tpr:>6.3f} {result.fpr:>6.3f} "
+            f"{result.margin:>7.4f} {result.ms_per_frame:>8.2f}"
+        )
+
+    if roc_path:
+        with open(roc_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["config", "threshold", "tpr", "fpr"])
+            for result in results:
+                for threshold, tpr, fpr in roc_points(
+                    result.positives, result.negatives
+                ):
+                    writer.writerow([result.name, f"{threshold:.4f}", tpr, fpr])
+        print(f"[calibrate] ROC points written to {roc_path}")
+
+    # Cheapest config that separates the labels cleanly, otherwise the one
+    # with the best true-minus-false positive rate.
+    separated = [result for result in results if result.margin >= CLEAN_MARGIN]
+    if separated:
+        chosen = min(separated, key=lambda result: result.ms_per_frame)
+    else:
+        chosen = max(
+            results,
+            key=lambda result: (result.tpr - result.fpr, -result.ms_per_frame),
+        )
+        print("[calibrate] No config separates the labels cleanly.")
+    matching = chosen.matching
+    print(f"[calibrate] Suggested: {chosen.name}")
+    print(
+        "[calibrate]   matching: "
+        f"{{method: {matching.method}, "
+        f"grayscale: {str(matching.grayscale).lower()}, "
+        f"text_only: {str(matching.text_only).lower()}, "
+        f"pyramid_levels: {matching.pyramid_levels}, "
+        f"threshold: {chosen.threshold:.3f}}}"
+    )
+    return 0
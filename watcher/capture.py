@@ -1,21 +1,86 @@
+import abc
+import time
+from typing import Optional
+
+import cv2
 import numpy as np
 import mss
 
 from .config import ROI
 
 
-class ScreenCapture:
-    def __init__(self) -> None:
+class EndOfFrames(Exception):
+    pass
+
+
+class FrameSource(abc.ABC):
+    # Where run_watcher gets its frames. Live sources are paced by
+    # runtime.interval_sec and stamped with the wall clock; recorded ones run
+    # as fast as they decode, stamp frames with their recorded time and raise
+    # EndOfFrames when they run out.
+    live = True
+
+    @abc.abstractmethod
+    def grab_roi(self, roi: ROI) -> np.ndarray:
+        ...
+
+    def timestamp(self) -> float:
+        # Capture time of the frame grab_roi() returned last.
+        return time.time()
+
+    def close(self) -> None:
+        pass
+
+
+def monitor_for(roi: ROI) -> dict:
+    return {
+        "left": int(roi.left),
+        "top": int(roi.top),
+        "width": int(roi.width),
+        "height": int(roi.height),
+    }
+
+
+class BgraConverter:
+    def __init__(self, gray: bool) -> None:
+        self.gray = gray
+        self._buffer: Optional[np.ndarray] = None
+
+    def convert(
+        self, shot: "mss.screenshot.ScreenShot", out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        # Wrap the BGRA bytes mss already allocated and convert them straight
+        # into a buffer that is reused every tick (or into `out`, e.g. a frame
+        # bus slot). The returned array is overwritten by the next grab, so
+        # callers that keep a frame must copy.
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(
+            shot.height, shot.width, 4
+        )
+        if self.gray:
+            shape: tuple = (shot.height, shot.width)
+            code = cv2.COLOR_BGRA2GRAY
+        else:
+            shape = (shot.height, shot.width, 3)
+            code = cv2.COLOR_BGRA2BGR
+        if out is not None:
+            cv2.cvtColor(bgra, code, dst=out)
+            return out
+        if self._buffer is None or self._buffer.shape != shape:
+            self._buffer = np.empty(shape, dtype=np.uint8)
+        cv2.cvtColor(bgra, code, dst=self._buffer)
+        return self._buffer
+
+
+class ScreenCapture(FrameSource):
+    def __init__(self, zero_copy: bool = False, gray: bool = False) -> None:
         self._sct = mss.mss()
+        self._converter = BgraConverter(gray) if zero_copy else None
 
     def grab_roi(self, roi: ROI) -> np.ndarray:
-        monitor = {
-            "left": int(roi.left),
-            "top": int(roi.top),
-            "width": int(roi.width),
-            "height": int(roi.height),
-        }
-        img = np.array(self._sct.grab(monitor))
+        shot = self._sct.grab(monitor_for(roi))
+        if self._converter is not None:
+            return self._converter.convert(shot)
+        img = np.array(shot)
         if img.shape[-1] == 4:
             img = img[:, :, :3]
         return img
@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Each tile is summarized by a CELLS x CELLS grid of mean intensities.
+SIGNATURE_CELLS = 4
+# Above this fraction of dirty tiles a full re-match is cheaper than many
+# overlapping window re-matches.
+PARTIAL_MAX_FRACTION = 0.5
+
+Rect = Tuple[int, int, int, int]
+
+
+@dataclass
+class FrameChange:
+    full: bool
+    dirty_tiles: int
+    total_tiles: int
+    # x0, y0, x1, y1 (exclusive) bounding box of the dirty tiles.
+    rect: Optional[Rect]
+
+    @property
+    def static(self) -> bool:
+        return not self.full and self.rect is None
+
+
+class TileChangeDetector:
+    def __init__(self, tile_size: int, tolerance: float) -> None:
+        self.tile_size = tile_size
+        self.tolerance = tolerance
+        self._signature: Optional[np.ndarray] = None
+        self._shape: Optional[Tuple[int, ...]] = None
+        self.frames = 0
+        self.static_frames = 0
+        self.partial_frames = 0
+
+    def _signatures(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        tiles_x = -(-width // self.tile_size)
+        tiles_y = -(-height // self.tile_size)
+        small = cv2.resize(
+            frame,
+            (tiles_x * SIGNATURE_CELLS, tiles_y * SIGNATURE_CELLS),
+            interpolation=cv2.INTER_AREA,
+        ).astype(np.float32)
+        if small.ndim == 2:
+            small = small[:, :, None]
+        return small.reshape(
+            tiles_y, SIGNATURE_CELLS, tiles_x, SIGNATURE_CELLS, small.shape[2]
+        )
+
+    def update(self, frame: np.ndarray) -> FrameChange:
+        # The reference signature is what the matcher last saw: it is not
+        # moved on static frames and only the re-matched tiles move on a
+        # partial change, so a drift of many small steps still adds up to a
+        # change once it exceeds the tolerance.
+        signature = self._signatures(frame)
+        previous = self._signature
+        self.frames += 1
+        tiles_y, _cells_y, tiles_x = signature.shape[:3]
+        total = tiles_x * tiles_y
+        if previous is None or frame.shape != self._shape:
+            self._signature = signature
+            self._shape = frame.shape
+            return FrameChange(full=True, dirty_tiles=total, total_tiles=total, rect=None)
+
+        delta = np.abs(signature - previous).max(axis=(1, 3, 4))
+        dirty = delta > self.tolerance
+        count = int(dirty.sum())
+        if count == 0:
+            self.static_frames += 1
+            return FrameChange(full=False, dirty_tiles=0, total_tiles=total, rect=None)
+        if count > total * PARTIAL_MAX_FRACTION:
+            self._signature = signature
+            return FrameChange(full=True, dirty_tiles=count, total_tiles=total, rect=None)
+
+        # The signature grid spreads the frame evenly over the tiles, so map
+        # tile indices back through the real per-tile pixel size.
+        rows = np.flatnonzero(dirty.any(axis=1))
+        cols = np.flatnonzero(dirty.any(axis=0))
+        box = (
+            slice(int(rows[0]), int(rows[-1]) + 1),
+            slice(None),
+            slice(int(cols[0]), int(cols[-1]) + 1),
+        )
+        previous[box] = signature[box]
+        height, width = frame.shape[:2]
+        rect = (
+            int(cols[0]) * width // tiles_x,
+            int(rows[0]) * height // tiles_y,
+            -(-(int(cols[-1]) + 1) * width // tiles_x),
+            -(-(int(rows[-1]) + 1) * height // tiles_y),
+        )
+        self.partial_frames += 1
+        return FrameChange(full=False, dirty_tiles=count, total_tiles=total, rect=rect)
+
+    def stats_line(self) -> str:
+        frames = max(1, self.frames)
+        full = self.frames - self.static_frames - self.partial_frames
+        return (
+            f"frames={self.frames} "
+            f"skipped={self.static_frames} ({self.static_frames / frames:.0%}) "
+            f"partial={self.partial_frames} ({self.partial_frames / frames:.0%}) "
+            f"full={full} ({full / frames:.0%})"
+        )
@@ -1,6 +1,7 @@
 import os
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import yaml
 
@@ -13,12 +14,26 @@ class ROI:
     height: int
 
 
+@dataclass
+class Region:
+    name: str
+    roi: ROI
+    template_paths: List[str]
+    threshold: float
+    debounce_count: int
+    cooldown_sec: float
+
+
 @dataclass
 class Matching:
     grayscale: bool
     method: str
     threshold: float
     text_only: bool
+    pyramid_levels: int
+    engine: str
+    cache_dir: str
+    early_exit_margin: float
 
 
 @dataclass
@@ -26,6 +41,56 @@ class Runtime:
     interval_sec: float
     debounce_count: int
     cooldown_sec: float
+    burst_interval_sec: float
+    burst_timeout_sec: float
+    reload_check_sec: float
+
+
+@dataclass
+class Capture:
+    zero_copy: bool
+
+
+@dataclass
+class ChangeDetection:
+    enabled: bool
+    tile_size: int
+    tolerance: float
+    log_every_n: int
+
+
+@dataclass
+class Prefilter:
+    enabled: bool
+    levels: int
+    reject_score: float
+
+
+@dataclass
+class Tracking:
+    enabled: bool
+    margin: int
+    hot_spots: int
+    min_score: float
+    full_every_n: int
+    log_every_n: int
+
+
+@dataclass
+class History:
+    enabled: bool
+    path: str
+    capacity: int
+
+
+@dataclass
+class Metrics:
+    enabled: bool
+    window: int
+    http_host: str
+    http_port: int
+    jsonl_path: str
+    jsonl_interval_sec: float
 
 
 @dataclass
@@ -39,6 +104,15 @@ class Notify:
     pushover_user_key: str
     telegram_bot_token: str
     telegram_chat_id: str
+    pushover_url: str
+    telegram_api_url: str
+    queue_size: int
+    timeout_sec: float
+    retry_deadline_sec: float
+    retry_backoff_sec: float
+    coalesce_sec: float
+    rate_per_min: float
+    rate_burst: int
 
 
 @dataclass
@@ -51,6 +125,16 @@ class Debug:
     save_dir: str
     save_every_n: int
     save_on_match: bool
+    save_format: str
+    png_compression: int
+    jpeg_quality: int
+    save_queue_size: int
+    retention_max_files: int
+    retention_max_bytes: int
+    retention_max_age_sec: float
+    video_codec: str
+    video_chunk_frames: int
+    dedup_tolerance: float
 
 
 @dataclass
@@ -58,8 +142,15 @@ class Config:
     roi: ROI
     template_path: str
     template_paths: List[str]
+    regions: List[Region]
     matching: Matching
     runtime: Runtime
+    capture: Capture
+    change_detection: ChangeDetection
+    prefilter: Prefilter
+    tracking: Tracking
+    history: History
+    metrics: Metrics
     notify: Notify
     debug: Debug
 
@@ -73,8 +164,52 @@ DEFAULT_CONFIG: Dict[str, Any] = {
         "method": "TM_CCOEFF_NORMED",
         "threshold": 0.90,
         "text_only": False,
+        "pyramid_levels": 0,
+        "engine": "spatial",
+        "cache_dir": ".template_cache",
+        "early_exit_margin": 0.0,
+    },
+    "runtime": {
+        "interval_sec": 30.0,
+        "debounce_count": 3,
+        "cooldown_sec": 20,
+        "burst_interval_sec": 0,
+        "burst_timeout_sec": 5.0,
+        "reload_check_sec": 1.0,
+    },
+    "capture": {"zero_copy": False},
+    "change_detection": {
+        "enabled": False,
+        "tile_size": 32,
+        "tolerance": 1.0,
+        "log_every_n": 20,
+    },
+    "prefilter": {
+        "enabled": False,
+        "levels": 1,
+        "reject_score": 0.4,
+    },
+    "tracking": {
+        "enabled": False,
+        "margin": 16,
+        "hot_spots": 4,
+        "min_score": 0.0,
+        "full_every_n": 20,
+        "log_every_n": 20,
+    },
+    "history": {
+        "enabled": False,
+        "path": "",
+        "capacity": 1000000,
+    },
+    "metrics": {
+        "enabled": False,
+        "window": 1000,
+        "http_host": "127.0.0.1",
+        "http_port": 0,
+        "jsonl_path": "",
+        "jsonl_interval_sec": 10.0,
     },
-    "runtime": {"interval_sec": 30.0, "debounce_count": 3, "cooldown_sec": 20},
     "notify": {
         "use_toast": True,
         "beep_fallback": True,
@@ -85,6 +220,15 @@ DEFAULT_CONFIG: Dict[str, Any] = {
         "pushover_user_key": "",
         "telegram_bot_token": "",
         "telegram_chat_id": "",
+        "pushover_url": "https://api.pushover.net/1/messages.json",
+        "telegram_api_url": "https://api.telegram.org",
+        "queue_size": 16,
+        "timeout_sec": 5.0,
+        "retry_deadline_sec": 30.0,
+        "retry_backoff_sec": 0.5,
+        "coalesce_sec": 0.0,
+        "rate_per_min": 0.0,
+        "rate_burst": 3,
     },
     "debug": {
         "enabled": False,
@@ -95,6 +239,16 @@ DEFAULT_CONFIG: Dict[str, Any] = {
         "save_dir": "debug_screens",
         "save_every_n": 0,
         "save_on_match": False,
+        "save_format": "png",
+        "png_compression": 3,
+        "jpeg_quality": 90,
+        "save_queue_size": 8,
+        "retention_max_files": 0,
+        "retention_max_bytes": 0,
+        "retention_max_age_sec": 0,
+        "video_codec": "FFV1",
+        "video_chunk_frames": 600,
+        "dedup_tolerance": 0.0,
     },
 }
 
@@ -172,6 +326,12 @@ def load_config(
     roi = raw.get("roi", {})
     matching = raw.get("matching", {})
     runtime = raw.get("runtime", {})
+    capture = raw.get("capture", {})
+    change_detection = raw.get("change_detection", {})
+    prefilter = raw.get("prefilter", {})
+    tracking = raw.get("tracking", {})
+    history = raw.get("history", {})
+    metrics = raw.get("metrics", {})
     notify = raw.get("notify", {})
     debug = raw.get("debug", {})
 
@@ -182,17 +342,72 @@ def load_config(
         height=int(roi.get("height", 0)),
     )
 
+    cache_dir = str(matching.get("cache_dir", ".template_cache") or "")
     matching_obj = Matching(
         grayscale=bool(matching.get("grayscale", True)),
         method=str(matching.get("method", "TM_CCOEFF_NORMED")),
         threshold=float(matching.get("threshold", 0.9)),
         text_only=bool(matching.get("text_only", False)),
+        pyramid_levels=int(matching.get("pyramid_levels", 0)),
+        engine=str(matching.get("engine", "spatial")).lower(),
+        cache_dir=_resolve_path(path, cache_dir) if cache_dir else "",
+        early_exit_margin=float(matching.get("early_exit_margin", 0.0)),
     )
 
     runtime_obj = Runtime(
         interval_sec=float(runtime.get("interval_sec", 0.3)),
         debounce_count=int(runtime.get("debounce_count", 3)),
         cooldown_sec=float(runtime.get("cooldown_sec", 20)),
+        burst_interval_sec=float(runtime.get("burst_interval_sec", 0)),
+        burst_timeout_sec=float(runtime.get("burst_timeout_sec", 5.0)),
+        reload_check_sec=float(runtime.get("reload_check_sec", 1.0)),
+    )
+
+    capture_obj = Capture(zero_copy=bool(capture.get("zero_copy", False)))
+
+    change_obj = ChangeDetection(
+        enabled=bool(change_detection.get("enabled", False)),
+        tile_size=int(change_detection.get("tile_size", 32)),
+        tolerance=float(change_detection.get("tolerance", 1.0)),
+        log_every_n=int(change_detection.get("log_every_n", 20)),
+    )
+
+    prefilter_obj = Prefilter(
+        enabled=bool(prefilter.get("enabled", False)),
+        levels=int(prefilter.get("levels", 1)),
+        reject_score=float(prefilter.get("reject_score", 0.4)),
+    )
+
+    tracking_obj = Tracking(
+        enabled=bool(tracking.get("enabled", False)),
+        margin=int(tracking.get("margin", 16)),
+        hot_spots=int(tracking.get("hot_spots", 4)),
+        min_score=float(tracking.get("min_score", 0.0)),
+        full_every_n=int(tracking.get("full_every_n", 20)),
+        log_every_n=int(tracking.get("log_every_n", 20)),
+    )
+
+    # Default: <config name>.history.npy next to the config, so profiles
+    # sharing a folder keep separate histories.
+    history_path = str(history.get("path", "") or "")
+    if history_path:
+        history_path = _resolve_path(path, history_path)
+    else:
+        history_path = os.path.splitext(os.path.abspath(path))[0] + ".history.npy"
+    history_obj = History(
+        enabled=bool(history.get("enabled", False)),
+        path=history_path,
+        capacity=int(history.get("capacity", 1000000)),
+    )
+
+    jsonl_path = str(metrics.get("jsonl_path", "") or "")
+    metrics_obj = Metrics(
+        enabled=bool(metrics.get("enabled", False)),
+        window=int(metrics.get("window", 1000)),
+        http_host=str(metrics.get("http_host", "127.0.0.1")),
+        http_port=int(metrics.get("http_port", 0)),
+        jsonl_path=_resolve_path(path, jsonl_path) if jsonl_path else "",
+        jsonl_interval_sec=float(metrics.get("jsonl_interval_sec", 10.0)),
     )
 
     notify_obj = Notify(
@@ -205,6 +420,19 @@ def load_config(
         pushover_user_key=str(notify.get("pushover_user_key", "")),
         telegram_bot_token=str(notify.get("telegram_bot_token", "")),
         telegram_chat_id=str(notify.get("telegram_chat_id", "")),
+        pushover_url=str(
+            notify.get("pushover_url", "https://api.pushover.net/1/messages.json")
+        ),
+        telegram_api_url=str(
+            notify.get("telegram_api_url", "https://api.telegram.org")
+        ),
+        queue_size=int(notify.get("queue_size", 16)),
+        timeout_sec=float(notify.get("timeout_sec", 5.0)),
+        retry_deadline_sec=float(notify.get("retry_deadline_sec", 30.0)),
+        retry_backoff_sec=float(notify.get("retry_backoff_sec", 0.5)),
+        coalesce_sec=float(notify.get("coalesce_sec", 0.0)),
+        rate_per_min=float(notify.get("rate_per_min", 0.0)),
+        rate_burst=int(notify.get("rate_burst", 3)),
     )
 
     debug_obj = Debug(
@@ -218,9 +446,31 @@ def load_config(
         ),
         save_every_n=int(debug.get("save_every_n", 0)),
         save_on_match=bool(debug.get("save_on_match", False)),
+        save_format=str(debug.get("save_format", "png")).lower(),
+        png_compression=int(debug.get("png_compression", 3)),
+        jpeg_quality=int(debug.get("jpeg_quality", 90)),
+        save_queue_size=int(debug.get("save_queue_size", 8)),
+        retention_max_files=int(debug.get("retention_max_files", 0)),
+        retention_max_bytes=int(debug.get("retention_max_bytes", 0)),
+        retention_max_age_sec=float(debug.get("retention_max_age_sec", 0)),
+        video_codec=str(debug.get("video_codec", "FFV1")),
+        video_chunk_frames=int(debug.get("video_chunk_frames", 600)),
+        dedup_tolerance=float(debug.get("dedup_tolerance", 0.0)),
     )
 
-    _validate_config(path, roi_obj, matching_obj, runtime_obj, notify_obj)
+    _validate_config(
+        path,
+        roi_obj,
+        matching_obj,
+        runtime_obj,
+        change_obj,
+        prefilter_obj,
+        tracking_obj,
+        history_obj,
+        metrics_obj,
+        notify_obj,
+        debug_obj,
+    )
 
     raw_template_paths = raw.get("template_paths")
     if raw_template_paths is None:
@@ -233,6 +483,42 @@ def load_config(
         template_paths = [str(path_value) for path_value in raw_template_paths]
 
     template_paths = _resolve_template_paths(path, template_paths)
+    _check_templates_exist(template_paths)
+
+    raw_regions = raw.get("regions")
+    if raw_regions is None:
+        regions = [
+            Region(
+                name="default",
+                roi=roi_obj,
+                template_paths=template_paths,
+                threshold=matching_obj.threshold,
+                debounce_count=runtime_obj.debounce_count,
+                cooldown_sec=runtime_obj.cooldown_sec,
+            )
+        ]
+    else:
+        regions = _parse_regions(path, raw_regions, matching_obj, runtime_obj)
+
+    return Config(
+        roi=roi_obj,
+        template_path=template_paths[0],
+        template_paths=template_paths,
+        regions=regions,
+        matching=matching_obj,
+        runtime=runtime_obj,
+        capture=capture_obj,
+        change_detection=change_obj,
+        prefilter=prefilter_obj,
+        tracking=tracking_obj,
+        history=history_obj,
+        metrics=metrics_obj,
+        notify=notify_obj,
+        debug=debug_obj,
+    )
+
+
+def _check_templates_exist(template_paths: List[str]) -> None:
     missing_templates = [
         template_path
         for template_path in template_paths
@@ -245,19 +531,83 @@ def load_config(
             "Update template_paths in config.yaml."
         )
 
-    return Config(
-        roi=roi_obj,
-        template_path=template_paths[0],
-        template_paths=template_paths,
-        matching=matching_obj,
-        runtime=runtime_obj,
-        notify=notify_obj,
-        debug=debug_obj,
-    )
+
+def _parse_regions(
+    config_path: str, raw_regions: Any, matching: Matching, runtime: Runtime
+) -> List[Region]:
+    if not isinstance(raw_regions, list) or not raw_regions:
+        raise ValueError("regions must be a non-empty list.")
+    regions: List[Region] = []
+    for index, item in enumerate(raw_regions):
+        if not isinstance(item, dict):
+            raise ValueError(f"regions[{index}] must be a mapping.")
+        name = str(item.get("name", f"region{index + 1}"))
+        roi = item.get("roi")
+        if not isinstance(roi, dict):
+            raise ValueError(f"Region {name}: roi must be a mapping.")
+        roi_obj = ROI(
+            left=int(roi.get("left", 0)),
+            top=int(roi.get("top", 0)),
+            width=int(roi.get("width", 0)),
+            height=int(roi.get("height", 0)),
+        )
+        if roi_obj.width <= 0 or roi_obj.height <= 0:
+            raise ValueError(f"Region {name}: ROI width/height must be positive.")
+        if roi_obj.left < 0 or roi_obj.top < 0:
+            raise ValueError(f"Region {name}: ROI left/top must be non-negative.")
+
+        raw_paths = item.get("template_paths")
+        if raw_paths is None and "template_path" in item:
+            raw_paths = [item["template_path"]]
+        if not isinstance(raw_paths, list) or not raw_paths:
+            raise ValueError(f"Region {name}: template_paths must be a non-empty list.")
+        template_paths = _resolve_template_paths(
+            config_path, [str(path_value) for path_value in raw_paths]
+        )
+        _check_templates_exist(template_paths)
+
+        region = Region(
+            name=name,
+            roi=roi_obj,
+            template_paths=template_paths,
+            threshold=float(item.get("threshold", matching.threshold)),
+            debounce_count=int(item.get("debounce_count", runtime.debounce_count)),
+            cooldown_sec=float(item.get("cooldown_sec", runtime.cooldown_sec)),
+        )
+        if not (0.0 <= region.threshold <= 1.0):
+            raise ValueError(f"Region {name}: threshold must be between 0 and 1.")
+        if region.debounce_count < 1:
+            raise ValueError(f"Region {name}: debounce_count must be >= 1.")
+        if region.cooldown_sec < 0:
+            raise ValueError(f"Region {name}: cooldown_sec must be >= 0.")
+        regions.append(region)
+
+    names = [region.name for region in regions]
+    if len(set(names)) != len(names):
+        raise ValueError("Region names must be unique.")
+    return regions
+
+
+def union_roi(rois: List[ROI]) -> ROI:
+    left = min(roi.left for roi in rois)
+    top = min(roi.top for roi in rois)
+    right = max(roi.left + roi.width for roi in rois)
+    bottom = max(roi.top + roi.height for roi in rois)
+    return ROI(left=left, top=top, width=right - left, height=bottom - top)
 
 
 def _validate_config(
-    config_path: str, roi: ROI, matching: Matching, runtime: Runtime, notify: Notify
+    config_path: str,
+    roi: ROI,
+    matching: Matching,
+    runtime: Runtime,
+    change_detection: ChangeDetection,
+    prefilter: Prefilter,
+    tracking: Tracking,
+    history: History,
+    metrics: Metrics,
+    notify: Notify,
+    debug: Debug,
 ) -> None:
     if roi.width <= 0 or roi.height <= 0:
         raise ValueError("ROI width/height must be positive.")
@@ -265,18 +615,95 @@ def _validate_config(
         raise ValueError("ROI left/top must be non-negative.")
     if not (0.0 <= matching.threshold <= 1.0):
         raise ValueError("matching.threshold must be between 0 and 1.")
+    if matching.pyramid_levels < 0:
+        raise ValueError("matching.pyramid_levels must be >= 0.")
+    if not (0.0 <= matching.early_exit_margin <= 1.0):
+        raise ValueError(
+            "matching.early_exit_margin must be between 0 and 1 (0 = off)."
+        )
+    if matching.engine not in ("spatial", "fft", "auto"):
+        raise ValueError("matching.engine must be one of: spatial, fft, auto.")
+    if matching.engine == "fft" and matching.method != "TM_CCOEFF_NORMED":
+        raise ValueError("matching.engine fft requires method TM_CCOEFF_NORMED.")
+    if matching.engine == "fft" and not (matching.grayscale or matching.text_only):
+        raise ValueError("matching.engine fft requires grayscale or text_only.")
     if runtime.interval_sec <= 0:
         raise ValueError("runtime.interval_sec must be > 0.")
     if runtime.debounce_count < 1:
         raise ValueError("runtime.debounce_count must be >= 1.")
     if runtime.cooldown_sec < 0:
         raise ValueError("runtime.cooldown_sec must be >= 0.")
+    if runtime.burst_interval_sec < 0:
+        raise ValueError("runtime.burst_interval_sec must be >= 0 (0 = off).")
+    if runtime.burst_interval_sec > 0 and runtime.burst_timeout_sec <= 0:
+        raise ValueError("runtime.burst_timeout_sec must be > 0.")
+    if runtime.reload_check_sec < 0:
+        raise ValueError("runtime.reload_check_sec must be >= 0 (0 = off).")
+    if change_detection.tile_size < 8:
+        raise ValueError("change_detection.tile_size must be >= 8.")
+    if change_detection.tolerance < 0:
+        raise ValueError("change_detection.tolerance must be >= 0.")
+    if prefilter.levels < 1:
+        raise ValueError("prefilter.levels must be >= 1.")
+    if not (0.0 <= prefilter.reject_score <= 1.0):
+        raise ValueError("prefilter.reject_score must be between 0 and 1.")
+    if tracking.margin < 1:
+        raise ValueError("tracking.margin must be >= 1.")
+    if tracking.hot_spots < 0:
+        raise ValueError("tracking.hot_spots must be >= 0.")
+    if not (0.0 <= tracking.min_score <= 1.0):
+        raise ValueError("tracking.min_score must be between 0 and 1 (0 = threshold).")
+    if tracking.full_every_n < 0:
+        raise ValueError("tracking.full_every_n must be >= 0 (0 = never forced).")
+    if history.capacity < 1:
+        raise ValueError("history.capacity must be >= 1.")
+    if metrics.window < 1:
+        raise ValueError("metrics.window must be >= 1.")
+    if not (0 <= metrics.http_port <= 65535):
+        raise ValueError("metrics.http_port must be between 0 and 65535 (0 = off).")
+    if metrics.jsonl_interval_sec <= 0:
+        raise ValueError("metrics.jsonl_interval_sec must be > 0.")
     if not os.path.exists(config_path):
         raise FileNotFoundError(f"Config file not found: {config_path}")
     if notify.provider not in ("local", "pushover", "telegram"):
         raise ValueError(
             "notify.provider must be one of: local, pushover, telegram."
         )
+    if debug.save_format not in ("png", "jpg", "video"):
+        raise ValueError("debug.save_format must be png, jpg or video.")
+    if len(debug.video_codec) != 4:
+        raise ValueError("debug.video_codec must be a four-character code.")
+    if debug.video_chunk_frames < 1:
+        raise ValueError("debug.video_chunk_frames must be >= 1.")
+    if debug.dedup_tolerance < 0:
+        raise ValueError("debug.dedup_tolerance must be >= 0.")
+    if not (0 <= debug.png_compression <= 9):
+        raise ValueError("debug.png_compression must be between 0 and 9.")
+    if not (0 <= debug.jpeg_quality <= 100):
+        raise ValueError("debug.jpeg_quality must be between 0 and 100.")
+    if debug.save_queue_size < 1:
+        raise ValueError("debug.save_queue_size must be >= 1.")
+    if (
+        debug.retention_max_files < 0
+        or debug.retention_max_bytes < 0
+        or debug.retention_max_age_sec < 0
+    ):
+        raise ValueError("debug.retention_* limits must be >= 0 (0 = unlimited).")
+    if notify.queue_size < 1:
+        raise ValueError("notify.queue_size must be >= 1.")
+    if notify.timeout_sec <= 0:
+        raise ValueError("notify.timeout_sec must be > 0.")
+    if notify.retry_deadline_sec < 0 or notify.retry_backoff_sec <= 0:
+        raise ValueError(
+            "notify.retry_deadline_sec must be >= 0 and notify.retry_backoff_sec > 0."
+        )
+    if notify.coalesce_sec < 0:
+        raise ValueError("notify.coalesce_sec must be >= 0.")
+    if notify.rate_per_min < 0 or notify.rate_burst < 1:
+        raise ValueError(
+            "notify.rate_per_min must be >= 0 (0 = unlimited) and "
+            "notify.rate_burst >= 1."
+        )
     if notify.provider == "pushover":
         if not notify.pushover_app_token or not notify.pushover_user_key:
             raise ValueError(
@@ -287,3 +714,74 @@ def _validate_config(
             raise ValueError(
                 "Telegram requires notify.telegram_bot_token and notify.telegram_chat_id."
             )
+
+
+def with_templates(config: Config, template_paths: List[str]) -> Config:
+    # Points the config and every region at the given templates.
+    config.template_path = template_paths[0]
+    config.template_paths = template_paths
+    config.regions = [
+        replace(region, template_paths=template_paths) for region in config.regions
+    ]
+    return config
+
+
+def load_config_with_templates(path: str, template_paths: List[str]) -> Config:
+    return with_templates(load_config(path), template_paths)
+
+
+def file_mtime(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+class ConfigReloader:
+    # Re-runs `loader` when the config file or one of its templates changes
+    # on disk. A change is only picked up once its mtime has held for one
+    # check, so a half-saved file is not loaded. Errors are logged and the
+    # running config is kept. `loader` must be picklable (e.g. a
+    # functools.partial of load_config) so workers can take the reloader.
+    def __init__(
+        self, path: str, loader: Callable[[], Config], config: Config
+    ) -> None:
+        self.path = path
+        self.loader = loader
+        self.reloads = 0
+        self.rejected = 0
+        self._stamp = self._stamps(config)
+        self._pending: Optional[Tuple[int, ...]] = None
+        self._next_check = 0.0
+
+    def _stamps(self, config: Config) -> Tuple[int, ...]:
+        self._paths = [self.path] + sorted(
+            {path for region in config.regions for path in region.template_paths}
+        )
+        return tuple(file_mtime(path) for path in self._paths)
+
+    def poll(self, config: Config) -> Optional[Config]:
+        # Returns the new config when it changed and loaded cleanly.
+        interval = config.runtime.reload_check_sec
+        now = time.monotonic()
+        if interval <= 0 or now < self._next_check:
+            return None
+        self._next_check = now + interval
+        stamp = tuple(file_mtime(path) for path in self._paths)
+        if stamp == self._stamp:
+            self._pending = None
+            return None
+        if stamp != self._pending:
+            self._pending = stamp
+            return None
+        self._pending = None
+        self._stamp = stamp
+        try:
+            new_config = self.loader()
+        except Exception as exc:
+            self.rejected += 1
+            print(f"[config] Reload rejected, keeping the running config: {exc}")
+            return None
+        self._stamp = self._stamps(new_config)
+        self.reloads += 1
+        return new_config
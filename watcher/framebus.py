@@ -0,0 +1,281 @@
+import collections
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+from .capture import BgraConverter, EndOfFrames, FrameSource, monitor_for
+from .config import ROI
+
+# Header layout (int64): latest_seq, latest_slot, closed, height, width,
+# channels, slots, max_consumers, then one sequence number per slot and one
+# pinned sequence number per consumer. Frames follow, 64-byte aligned.
+HEADER_FIELDS = 8
+FRAME_ALIGN = 64
+MAX_CONSUMERS = 8
+POLL_SEC = 0.005
+# A consumer that sees no new frame for this long assumes the producer died.
+FRAME_TIMEOUT_SEC = 30.0
+# A failed producer capture is recreated after this delay, doubling while it
+# keeps failing. The cap stays well under FRAME_TIMEOUT_SEC so consumers keep
+# waiting through a restart.
+PRODUCER_BACKOFF_SEC = 1.0
+MAX_PRODUCER_BACKOFF_SEC = 8.0
+
+
+def _layout(slots: int, max_consumers: int, frame_bytes: int) -> Tuple[int, int]:
+    header_bytes = (HEADER_FIELDS + slots + max_consumers) * 8
+    frame_offset = -(-header_bytes // FRAME_ALIGN) * FRAME_ALIGN
+    return frame_offset, frame_offset + slots * frame_bytes
+
+
+class FrameBus:
+    # A ring of frame slots in shared memory. One producer writes, any number
+    # of consumers (up to max_consumers) read the newest frame in place.
+    #
+    # Each slot carries the sequence number of the frame in it (0 while being
+    # written). A consumer pins the sequence it is reading; the producer
+    # never picks a pinned slot, so a frame a consumer holds is not
+    # overwritten until that consumer asks for the next one. With
+    # max_consumers + 2 slots a free slot always exists.
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self._shm = shm
+        self.owner = owner
+        fields = np.ndarray((HEADER_FIELDS,), np.int64, buffer=shm.buf)
+        height, width, channels, slots, max_consumers = (
+            int(value) for value in fields[3:8]
+        )
+        del fields
+        self.height = height
+        self.width = width
+        self.channels = channels
+        self.slots = slots
+        self.max_consumers = max_consumers
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        frame_bytes = height * width * channels
+        frame_offset, _size = _layout(slots, max_consumers, frame_bytes)
+        self._header = np.ndarray(
+            (HEADER_FIELDS + slots + max_consumers,), np.int64, buffer=shm.buf
+        )
+        self._slot_seq = self._header[HEADER_FIELDS : HEADER_FIELDS + slots]
+        self._pins = self._header[HEADER_FIELDS + slots :]
+        self._frames = np.ndarray(
+            (slots,) + shape, np.uint8, buffer=shm.buf, offset=frame_offset
+        )
+
+    @classmethod
+    def create(
+        cls,
+        height: int,
+        width: int,
+        channels: int,
+        max_consumers: int = MAX_CONSUMERS,
+    ) -> "FrameBus":
+        # Fresh shared memory is zero-filled: no frames, no pins.
+        slots = max_consumers + 2
+        _offset, size = _layout(slots, max_consumers, height * width * channels)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        header = np.ndarray((HEADER_FIELDS,), np.int64, buffer=shm.buf)
+        header[:] = (0, 0, 0, height, width, channels, slots, max_consumers)
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "FrameBus":
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._header[2])
+
+    @property
+    def latest_seq(self) -> int:
+        return int(self._header[0])
+
+    def begin_write(self) -> Tuple[int, np.ndarray]:
+        # Returns a free slot and its frame buffer to convert into directly.
+        latest_slot = int(self._header[1])
+        for step in range(1, self.slots + 1):
+            slot = (latest_slot + step) % self.slots
+            if slot == latest_slot:
+                continue
+            old = int(self._slot_seq[slot])
+            if old and old in self._pins:
+                continue
+            self._slot_seq[slot] = 0
+            # A consumer may have pinned the old frame between the check and
+            # the reset; it will notice the reset and retry, but if it pinned
+            # first the slot must be left alone.
+            if old and old in self._pins:
+                self._slot_seq[slot] = old
+                continue
+            return slot, self._frames[slot]
+        raise RuntimeError("No free frame bus slot; too many consumers.")
+
+    def commit(self, slot: int) -> int:
+        seq = int(self._header[0]) + 1
+        self._slot_seq[slot] = seq
+        self._header[1] = slot
+        self._header[0] = seq
+        return seq
+
+    def read_latest(
+        self, consumer_id: int, after_seq: int
+    ) -> Optional[Tuple[int, np.ndarray]]:
+        # Newest frame newer than after_seq, pinned for consumer_id, or None.
+        # Older unread frames are skipped rather than queued.
+        while True:
+            seq = int(self._header[0])
+            slot = int(self._header[1])
+            if seq <= after_seq:
+                return None
+            self._pins[consumer_id] = seq
+            if int(self._slot_seq[slot]) == seq:
+                return seq, self._frames[slot]
+            self._pins[consumer_id] = 0
+
+    def release(self, consumer_id: int) -> None:
+        self._pins[consumer_id] = 0
+
+    def close(self) -> None:
+        if self.owner:
+            self._header[2] = 1
+        self._slot_seq = self._pins = self._header = self._frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A consumer still holds a frame view; the mapping goes away with
+            # the process.
+            return
+        if self.owner:
+            self._shm.unlink()
+
+
+class FrameBusCapture(FrameSource):
+    # Stands in for ScreenCapture in a consumer process. grab_roi() waits for
+    # a frame newer than the last one and returns a read-only view of the
+    # requested ROI inside the shared frame, valid until the next grab.
+    def __init__(
+        self,
+        bus_name: str,
+        consumer_id: int,
+        bus_roi: ROI,
+        stop_event: Optional[Any] = None,
+    ) -> None:
+        self.bus = FrameBus.attach(bus_name)
+        self.consumer_id = consumer_id
+        self.bus_roi = bus_roi
+        self._stop_event = stop_event
+        self._last_seq = 0
+        self._frame: Optional[np.ndarray] = None
+        self.frames = 0
+        self.skipped = 0
+
+    def grab_roi(self, roi: ROI) -> np.ndarray:
+        x = roi.left - self.bus_roi.left
+        y = roi.top - self.bus_roi.top
+        if (
+            x < 0
+            or y < 0
+            or x + roi.width > self.bus_roi.width
+            or y + roi.height > self.bus_roi.height
+        ):
+            raise ValueError("ROI lies outside the shared capture area.")
+        self.bus.release(self.consumer_id)
+        deadline = time.monotonic() + FRAME_TIMEOUT_SEC
+        while True:
+            result = self.bus.read_latest(self.consumer_id, self._last_seq)
+            if result is not None:
+                break
+            if self.bus.closed:
+                raise RuntimeError("Frame bus producer stopped.")
+            if self._stop_event is not None and self._stop_event.is_set():
+                if self._frame is not None:
+                    return self._frame
+                # Stopping before the first frame: nothing to return.
+                raise EndOfFrames()
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    f"No frame from the capture producer in "
+                    f"{FRAME_TIMEOUT_SEC:.0f}s."
+                )
+            time.sleep(POLL_SEC)
+        seq, frame = result
+        if self._last_seq:
+            self.skipped += seq - self._last_seq - 1
+        self._last_seq = seq
+        self.frames += 1
+        view = frame[y : y + roi.height, x : x + roi.width]
+        view.flags.writeable = False
+        self._frame = view
+        return view
+
+    def close(self) -> None:
+        self.bus.release(self.consumer_id)
+        self._frame = None
+        self.bus.close()
+
+
+class FrameBusProducer:
+    # Grabs the shared ROI once per interval on a background thread and
+    # converts the BGRA screenshot straight into a free bus slot. When the
+    # capture fails it is recreated with backoff, and the error is queued on
+    # `errors` for the supervisor to report.
+    def __init__(self, roi: ROI, gray: bool, interval_sec: float) -> None:
+        self.roi = roi
+        self.gray = gray
+        self.interval_sec = interval_sec
+        self.bus = FrameBus.create(roi.height, roi.width, 1 if gray else 3)
+        self.frames = 0
+        self.failures = 0
+        self.errors: "collections.deque[str]" = collections.deque(maxlen=16)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="watcher-framebus", daemon=True
+        )
+        self._thread.start()
+        print(
+            f"[framebus] Sharing {roi.width}x{roi.height} "
+            f"{'gray' if gray else 'BGR'} frames every {interval_sec:.2f}s"
+        )
+
+    def _capture(self) -> None:
+        import mss
+
+        with mss.mss() as sct:
+            converter = BgraConverter(self.gray)
+            monitor = monitor_for(self.roi)
+            while True:
+                slot, buffer = self.bus.begin_write()
+                converter.convert(sct.grab(monitor), out=buffer)
+                self.bus.commit(slot)
+                self.frames += 1
+                if self._stop.wait(self.interval_sec):
+                    return
+
+    def _run(self) -> None:
+        backoff = PRODUCER_BACKOFF_SEC
+        while True:
+            frames = self.frames
+            try:
+                self._capture()
+                return
+            except Exception as exc:
+                if self.frames > frames:
+                    backoff = PRODUCER_BACKOFF_SEC
+                self.failures += 1
+                self.errors.append(f"{exc}, restarting in {backoff:.0f}s")
+            if self._stop.wait(backoff):
+                return
+            backoff = min(backoff * 2, MAX_PRODUCER_BACKOFF_SEC)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5.0)
+        self.bus.close()
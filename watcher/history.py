@@ -0,0 +1,281 @@
+import csv
+import os
+import re
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import Config
+
+# Stage timings kept with every tick, in milliseconds.
+STAGES = ("capture", "match", "tick")
+# Dirty pages are flushed to disk at most this often while appending.
+FLUSH_SEC = 30.0
+FLAG_HIT = 1
+FLAG_NOTIFIED = 2
+# One region's part of a record: score, x, y, template index, flags.
+RegionRow = Tuple[float, int, int, int, int]
+RELATIVE_TIME = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+TIME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+
+def record_dtype(regions: Sequence[str]) -> np.dtype:
+    # One fixed-size record per tick: 18 bytes plus 8 per region. seq orders
+    # the ring (0 = never written); half floats are plenty for scores and
+    # millisecond timings.
+    fields = [("seq", "<u4"), ("time", "<f8")]
+    fields += [(f"{stage}_ms", "<f2") for stage in STAGES]
+    for name in regions:
+        fields += [
+            (f"{name}.score", "<f2"),
+            (f"{name}.x", "<u2"),
+            (f"{name}.y", "<u2"),
+            (f"{name}.template", "u1"),
+            (f"{name}.flags", "u1"),
+        ]
+    return np.dtype(fields)
+
+
+def _region_names(dtype: np.dtype) -> List[str]:
+    return [name[: -len(".score")] for name in dtype.names if name.endswith(".score")]
+
+
+class ScoreHistory:
+    # A ring of fixed-size tick records in a memory-mapped .npy file. The
+    # file is sized once for `capacity` records and never grows; when it is
+    # full the oldest record is overwritten. Appending is one row write into
+    # the page cache. Use create() to append and open() to read, which also
+    # works while a watcher is appending.
+    def __init__(self, path: str, data: np.memmap) -> None:
+        self.path = path
+        self._data = data
+        self.regions = _region_names(data.dtype)
+        self.capacity = len(data)
+        last = self._last()
+        self._seq = int(data["seq"][last])
+        self._cursor = (last + 1) % self.capacity if self._seq else 0
+        self._next_flush = time.monotonic() + FLUSH_SEC
+
+    @classmethod
+    def create(
+        cls, path: str, capacity: int, regions: Sequence[str]
+    ) -> "ScoreHistory":
+        # Appends to an existing history with the same layout. One with other
+        # regions or another capacity is moved aside, not overwritten.
+        dtype = record_dtype(regions)
+        if os.path.exists(path):
+            try:
+                data = np.load(path, mmap_mode="r+")
+            except (OSError, ValueError) as exc:
+                print(f"[history] Cannot read {path}: {exc}")
+                data = None
+            if data is not None and data.dtype == dtype and len(data) == capacity:
+                return cls(path, data)
+            del data
+            stem, ext = os.path.splitext(path)
+            moved = f"{stem}.{time.strftime('%Y%m%d-%H%M%S')}{ext}"
+            os.replace(path, moved)
+            print(
+                f"[history] Regions or capacity changed; moved the old file to "
+                f"{moved}"
+            )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        data = np.lib.format.open_memmap(
+            path, mode="w+", dtype=dtype, shape=(capacity,)
+        )
+        return cls(path, data)
+
+    @classmethod
+    def open(cls, path: str) -> "ScoreHistory":
+        return cls(path, np.load(path, mmap_mode="r"))
+
+    def _last(self) -> int:
+        return int(np.argmax(self._data["seq"]))
+
+    def append(
+        self, stamp: float, stages: Sequence[float], regions: Sequence[RegionRow]
+    ) -> None:
+        # stages: seconds per STAGES entry; regions: rows in self.regions order.
+        self._seq += 1
+        row: list = [self._seq, stamp]
+        row.extend(seconds * 1000 for seconds in stages)
+        for region in regions:
+            row.extend(region)
+        self._data[self._cursor] = tuple(row)
+        self._cursor = (self._cursor + 1) % self.capacity
+        if time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def flush(self) -> None:
+        self._data.flush()
+        self._next_flush = time.monotonic() + FLUSH_SEC
+
+    def close(self) -> None:
+        if self._data.mode != "r":
+            self.flush()
+        self._data = None
+
+    def records(
+        self, start: Optional[float] = None, end: Optional[float] = None
+    ) -> np.ndarray:
+        # Written records, oldest first, with start <= time < end.
+        data = np.roll(np.asarray(self._data), -(self._last() + 1))
+        data = data[data["seq"] > 0]
+        if start is not None:
+            data = data[data["time"] >= start]
+        if end is not None:
+            data = data[data["time"] < end]
+        return data
+
+
+def region_summary(records: np.ndarray, region: str) -> Dict[str, float]:
+    scores = records[f"{region}.score"].astype(np.float32)
+    flags = records[f"{region}.flags"]
+    if len(scores) == 0:
+        return {"ticks": 0}
+    return {
+        "ticks": len(scores),
+        "hits": int(np.count_nonzero(flags & FLAG_HIT)),
+        "notified": int(np.count_nonzero(flags & FLAG_NOTIFIED)),
+        "min": float(scores.min()),
+        "mean": float(scores.mean()),
+        "p50": float(np.percentile(scores, 50)),
+        "p95": float(np.percentile(scores, 95)),
+        "max": float(scores.max()),
+    }
+
+
+def stage_summary(records: np.ndarray) -> Dict[str, Tuple[float, float]]:
+    # p50 and p95 milliseconds per stage.
+    summary = {}
+    for stage in STAGES:
+        values = records[f"{stage}_ms"].astype(np.float32)
+        if len(values):
+            summary[stage] = (
+                float(np.percentile(values, 50)),
+                float(np.percentile(values, 95)),
+            )
+    return summary
+
+
+def parse_duration(text: str) -> Optional[float]:
+    # Seconds in "90s", "30m", "2h" or "7d"; None for anything else.
+    match = RELATIVE_TIME.match(text.strip())
+    if not match:
+        return None
+    return float(match.group(1)) * TIME_UNITS[match.group(2)]
+
+
+def parse_when(text: str) -> float:
+    # A duration ago (see parse_duration) or a local date/time.
+    seconds = parse_duration(text)
+    if seconds is not None:
+        return time.time() - seconds
+    for fmt in TIME_FORMATS:
+        try:
+            return time.mktime(time.strptime(text.strip(), fmt))
+        except ValueError:
+            continue
+    raise ValueError(
+        f"Cannot read time {text!r}; use e.g. 30m, 2h, 7d or 2025-01-31 18:00."
+    )
+
+
+def _when(stamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stamp))
+
+
+def _write_csv(path: str, records: np.ndarray) -> None:
+    names = list(records.dtype.names)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["when"] + names)
+        for record in records:
+            values = [record[name].item() for name in names]
+            writer.writerow([_when(record["time"])] + values)
+
+
+def run_history(
+    config: Config,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    region: Optional[str] = None,
+    bucket: Optional[str] = None,
+    tail: int = 0,
+    csv_path: Optional[str] = None,
+) -> int:
+    path = config.history.path
+    if not os.path.exists(path):
+        print(f"[history] No history at {path}; set history.enabled: true.")
+        return 1
+    history = ScoreHistory.open(path)
+    start = parse_when(since) if since else None
+    end = parse_when(until) if until else None
+    records = history.records(start, end)
+    print(
+        f"[history] {path}: {len(records)} record(s) in range, "
+        f"capacity {history.capacity}"
+    )
+    if len(records) == 0:
+        return 0
+    print(f"[history] {_when(records['time'][0])} .. {_when(records['time'][-1])}")
+
+    regions = history.regions
+    if region is not None:
+        if region not in regions:
+            print(f"[history] Unknown region {region}; have {', '.join(regions)}")
+            return 1
+        regions = [region]
+    for name in regions:
+        summary = region_summary(records, name)
+        print(
+            f"[history] {name}: ticks={summary['ticks']} hits={summary['hits']} "
+            f"notified={summary['notified']} score min={summary['min']:.3f} "
+            f"mean={summary['mean']:.3f} p50={summary['p50']:.3f} "
+            f"p95={summary['p95']:.3f} max={summary['max']:.3f}"
+        )
+    stages = " ".join(
+        f"{stage} p50={p50:.2f}ms p95={p95:.2f}ms"
+        for stage, (p50, p95) in stage_summary(records).items()
+    )
+    print(f"[history] stages: {stages}")
+
+    if bucket:
+        width = parse_duration(bucket)
+        if not width:
+            print("[history] --bucket must be a positive duration, e.g. 1h.")
+            return 1
+        keys = np.floor(records["time"] / width)
+        for key in np.unique(keys):
+            chunk = records[keys == key]
+            parts = []
+            for name in regions:
+                scores = chunk[f"{name}.score"].astype(np.float32)
+                hits = np.count_nonzero(chunk[f"{name}.flags"] & FLAG_HIT)
+                parts.append(f"{name} max={scores.max():.3f} hits={hits}")
+            print(
+                f"[history] {_when(key * width)} ticks={len(chunk)} "
+                f"{' '.join(parts)}"
+            )
+
+    if tail > 0:
+        for record in records[-tail:]:
+            parts = []
+            for name in regions:
+                parts.append(
+                    f"{name}={float(record[f'{name}.score']):.3f}"
+                    f"@{record[f'{name}.x']},{record[f'{name}.y']}"
+                    f"#{record[f'{name}.template']}"
+                    + ("*" if record[f"{name}.flags"] & FLAG_NOTIFIED else "")
+                )
+            print(
+                f"[history] {_when(record['time'])} "
+                f"tick={float(record['tick_ms']):.1f}ms {' '.join(parts)}"
+            )
+
+    if csv_path:
+        _write_csv(csv_path, records)
+        print(f"[history] Wrote {len(records)} row(s) to {csv_path}")
+    return 0
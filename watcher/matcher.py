@@ -1,8 +1,137 @@
-from typing import Tuple
+import hashlib
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
 
+from .cache import TemplateCache
+from .change import FrameChange
+from .config import Matching, Prefilter, Tracking
+from .tracking import Location, LocationTracker
+
+PreprocessKey = Tuple[bool, bool]
+# observe(stage, seconds, **labels), e.g. WatcherMetrics.observe.
+Observer = Callable[..., None]
+
+# Coarse levels are dropped until the template keeps at least this many
+# pixels on its short side; below that the coarse scores stop being useful.
+MIN_PYRAMID_TEMPLATE_SIDE = 8
+# Number of coarse peaks that get refined at full resolution.
+PYRAMID_CANDIDATES = 3
+# The FFT engine computes the same normalized correlation as
+# TM_CCOEFF_NORMED in float32; on 874x420 frames the scores agree with
+# cv2.matchTemplate to within ~4e-4, so 1e-3 is the documented tolerance.
+FFT_SCORE_TOLERANCE = 1e-3
+# Blur + Canny let a pixel change affect edges a few pixels away, so partial
+# re-matching grows the changed rect by this much.
+CHANGE_MARGIN = 4
+# Weight of the newest frame in each template's running hit rate, which
+# orders templates when early exit is on.
+HIT_RATE_ALPHA = 0.1
+# engine: auto times each engine on this many frames (after one warm-up) and
+# takes the median. Startups keep measuring until AUTO_SAMPLES medians are
+# cached, and the decision is measured again after AUTO_RECHECK_SEC.
+AUTO_TIMING_RUNS = 15
+AUTO_SAMPLES = 3
+AUTO_RECHECK_SEC = 7 * 86400
+# FFT is only chosen when it takes at most this fraction of the spatial time;
+# closer timings are within noise and spatial is the exact reference.
+AUTO_FFT_MARGIN = 0.8
+
+
+def fft_shape(height: int, width: int) -> Tuple[int, int]:
+    # Circular correlation only wraps past the padded edge, so padding to at
+    # least the frame size keeps every valid match position exact.
+    return cv2.getOptimalDFTSize(height), cv2.getOptimalDFTSize(width)
+
+
+def preprocess_frame(frame: np.ndarray, gray: bool, edges: bool) -> np.ndarray:
+    image = frame
+    if gray and image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if edges:
+        image = TemplateMatcher._edges(image)
+    return image
+
+
+class PreparedFrame:
+    # A preprocessed frame plus lazily built derived images (pyramid levels)
+    # that can be shared by every matcher in the same preprocessing group.
+    def __init__(self, image: np.ndarray) -> None:
+        self.image = image
+        self._levels: List[np.ndarray] = [image]
+        self._spectra: Dict[Tuple[int, int], np.ndarray] = {}
+        self._window_norms: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def level(self, index: int) -> np.ndarray:
+        while len(self._levels) <= index:
+            self._levels.append(cv2.pyrDown(self._levels[-1]))
+        return self._levels[index]
+
+    def spectrum(self, shape: Tuple[int, int]) -> np.ndarray:
+        spectrum = self._spectra.get(shape)
+        if spectrum is None:
+            height, width = self.image.shape[:2]
+            padded = np.zeros(shape, np.float32)
+            padded[:height, :width] = self.image
+            spectrum = cv2.dft(padded)
+            self._spectra[shape] = spectrum
+        return spectrum
+
+    def window_norm(self, width: int, height: int) -> np.ndarray:
+        # sqrt(sum((I - mean(I))^2)) over every template-sized window.
+        norm = self._window_norms.get((width, height))
+        if norm is None:
+            image_h, image_w = self.image.shape[:2]
+            out_h, out_w = image_h - height + 1, image_w - width + 1
+            sums = cv2.boxFilter(
+                self.image,
+                cv2.CV_64F,
+                (width, height),
+                anchor=(0, 0),
+                normalize=False,
+                borderType=cv2.BORDER_CONSTANT,
+            )[:out_h, :out_w]
+            squares = cv2.sqrBoxFilter(
+                self.image,
+                cv2.CV_64F,
+                (width, height),
+                anchor=(0, 0),
+                normalize=False,
+                borderType=cv2.BORDER_CONSTANT,
+            )[:out_h, :out_w]
+            variance = cv2.subtract(
+                squares, cv2.multiply(sums, sums, scale=1.0 / (width * height))
+            )
+            norm = cv2.sqrt(np.maximum(variance, 0.0)).astype(np.float32)
+            self._window_norms[(width, height)] = norm
+        return norm
+
+
+def _peak(result: np.ndarray) -> Tuple[float, Tuple[int, int]]:
+    _min_val, max_val, _min_loc, max_loc = cv2.minMaxLoc(result)
+    return float(max_val), (int(max_loc[0]), int(max_loc[1]))
+
+
+def _top_peaks(
+    result: np.ndarray, count: int, suppress_w: int, suppress_h: int
+) -> List[Tuple[int, int]]:
+    result = result.copy()
+    peaks: List[Tuple[int, int]] = []
+    for _ in range(count):
+        _min_val, max_val, _min_loc, max_loc = cv2.minMaxLoc(result)
+        if not np.isfinite(max_val):
+            break
+        x, y = max_loc
+        peaks.append((x, y))
+        result[
+            max(0, y - suppress_h) : y + suppress_h + 1,
+            max(0, x - suppress_w) : x + suppress_w + 1,
+        ] = -np.inf
+    return peaks
+
 
 class TemplateMatcher:
     def __init__(
@@ -11,30 +140,248 @@ class TemplateMatcher:
         grayscale: bool,
         method_name: str,
         text_only: bool = False,
+        pyramid_levels: int = 0,
+        engine: str = "spatial",
+        frame_size: Optional[Tuple[int, int]] = None,
+        cache: Optional[TemplateCache] = None,
     ) -> None:
+        self.template_path = template_path
         self.grayscale = grayscale
         self.text_only = text_only
         self.method_name = method_name
         self.method = getattr(cv2, method_name, cv2.TM_CCOEFF_NORMED)
-        template = cv2.imread(template_path, cv2.IMREAD_COLOR)
+        self.cache = cache
+        self.cache_key = None
+        template = None
+        if cache is not None:
+            self.cache_key = cache.template_key(template_path, *self.preprocess_key())
+            template = cache.load(self.cache_key)
         if template is None:
-            raise ValueError(f"Failed to load template image: {template_path}")
-        if self.grayscale or self.text_only:
-            template = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-        if self.text_only:
-            template = self._edges(template)
+            template = cv2.imread(template_path, cv2.IMREAD_COLOR)
+            if template is None:
+                raise ValueError(f"Failed to load template image: {template_path}")
+            template = preprocess_frame(template, *self.preprocess_key())
+            if cache is not None:
+                cache.store(self.cache_key, template)
         self.template = template
         self.template_height, self.template_width = template.shape[:2]
+        self.pyramid = [template]
+        for level in range(1, pyramid_levels + 1):
+            smaller = self._cached(f"pyr{level}", lambda: cv2.pyrDown(self.pyramid[-1]))
+            if min(smaller.shape[:2]) < MIN_PYRAMID_TEMPLATE_SIDE:
+                break
+            self.pyramid.append(smaller)
+        self.pyramid_levels = len(self.pyramid) - 1
+
+        self.engine = engine if self.supports_fft() else "spatial"
+        self.last_score_map: Optional[np.ndarray] = None
+        self._spectra: Dict[Tuple[int, int], np.ndarray] = {}
+        self._small_templates: Dict[int, Optional[np.ndarray]] = {}
+        centered = template.astype(np.float32) - np.float32(template.mean())
+        self._centered_template = centered
+        self.template_norm = float(np.sqrt(np.square(centered, dtype=np.float64).sum()))
+        if self.engine != "spatial" and frame_size is not None:
+            width, height = frame_size
+            self.template_spectrum(fft_shape(height, width))
+
+    def _cached(self, suffix: str, build: Callable[[], np.ndarray]) -> np.ndarray:
+        if self.cache is None:
+            return build()
+        key = f"{self.cache_key}-{suffix}"
+        array = self.cache.load(key)
+        if array is None:
+            array = build()
+            self.cache.store(key, array)
+        return array
+
+    def supports_fft(self) -> bool:
+        return self.method == cv2.TM_CCOEFF_NORMED and self.template.ndim == 2
+
+    def template_spectrum(self, shape: Tuple[int, int]) -> np.ndarray:
+        spectrum = self._spectra.get(shape)
+        if spectrum is None:
+
+            def build() -> np.ndarray:
+                padded = np.zeros(shape, np.float32)
+                padded[: self.template_height, : self.template_width] = (
+                    self._centered_template
+                )
+                return cv2.dft(padded)
+
+            spectrum = self._cached(f"fft{shape[0]}x{shape[1]}", build)
+            self._spectra[shape] = spectrum
+        return spectrum
+
+    def preprocess_key(self) -> PreprocessKey:
+        return self.grayscale or self.text_only, self.text_only
+
+    def preprocess(self, frame: np.ndarray) -> PreparedFrame:
+        return PreparedFrame(preprocess_frame(frame, *self.preprocess_key()))
 
     def match(self, frame: np.ndarray) -> Tuple[float, Tuple[int, int]]:
-        image = frame
-        if self.grayscale or self.text_only:
-            image = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        if self.text_only:
-            image = self._edges(image)
-        result = cv2.matchTemplate(image, self.template, self.method)
-        _min_val, max_val, _min_loc, max_loc = cv2.minMaxLoc(result)
-        return float(max_val), (int(max_loc[0]), int(max_loc[1]))
+        return self.match_prepared(self.preprocess(frame))
+
+    def match_prepared(
+        self, prepared: PreparedFrame
+    ) -> Tuple[float, Tuple[int, int]]:
+        self.last_score_map = None
+        image_h, image_w = prepared.image.shape[:2]
+        fits = image_h >= self.template_height and image_w >= self.template_width
+        if self.pyramid_levels > 0 and fits:
+            coarse = prepared.level(self.pyramid_levels)
+            coarse_template = self.pyramid[self.pyramid_levels]
+            if (
+                coarse.shape[0] >= coarse_template.shape[0]
+                and coarse.shape[1] >= coarse_template.shape[1]
+            ):
+                return self._match_pyramid(prepared.image, coarse, coarse_template)
+        if self.engine == "fft" and prepared.image.ndim == 2 and fits:
+            result = self._fft_score_map(prepared)
+        else:
+            result = cv2.matchTemplate(prepared.image, self.template, self.method)
+        self.last_score_map = result
+        return _peak(result)
+
+    def rematch_window(
+        self, prepared: PreparedFrame, rect: Tuple[int, int, int, int]
+    ) -> Optional[Tuple[float, Tuple[int, int]]]:
+        # Recompute only the match positions whose template window overlaps
+        # the changed rect and patch them into the previous full score map.
+        score_map = self.last_score_map
+        if score_map is None:
+            return None
+        image_h, image_w = prepared.image.shape[:2]
+        out_h = image_h - self.template_height + 1
+        out_w = image_w - self.template_width + 1
+        if score_map.shape != (out_h, out_w):
+            return None
+        x0, y0, x1, y1 = rect
+        rx0 = max(0, x0 - CHANGE_MARGIN - self.template_width + 1)
+        ry0 = max(0, y0 - CHANGE_MARGIN - self.template_height + 1)
+        rx1 = min(out_w, x1 + CHANGE_MARGIN)
+        ry1 = min(out_h, y1 + CHANGE_MARGIN)
+        if rx0 < rx1 and ry0 < ry1:
+            window = prepared.image[
+                ry0 : ry1 + self.template_height - 1,
+                rx0 : rx1 + self.template_width - 1,
+            ]
+            score_map[ry0:ry1, rx0:rx1] = cv2.matchTemplate(
+                window, self.template, self.method
+            )
+        return _peak(score_map)
+
+    def match_around(
+        self, prepared: PreparedFrame, candidates: List[Location], margin: int
+    ) -> Optional[Tuple[float, Tuple[int, int]]]:
+        # Searches only template positions within `margin` of each candidate
+        # location. Always spatial: the windows are too small for the FFT.
+        self.last_score_map = None
+        image = prepared.image
+        max_x = image.shape[1] - self.template_width
+        max_y = image.shape[0] - self.template_height
+        if max_x < 0 or max_y < 0 or not candidates:
+            return None
+        best: Optional[Tuple[float, Tuple[int, int]]] = None
+        for cand_x, cand_y in candidates:
+            x0 = min(max(0, cand_x - margin), max_x)
+            y0 = min(max(0, cand_y - margin), max_y)
+            x1 = min(max_x, cand_x + margin)
+            y1 = min(max_y, cand_y + margin)
+            window = image[
+                y0 : y1 + self.template_height, x0 : x1 + self.template_width
+            ]
+            result = self._match_region(window, x0, y0)
+            if best is None or result[0] > best[0]:
+                best = result
+        return best
+
+    def _match_region(
+        self, image: np.ndarray, offset_x: int, offset_y: int
+    ) -> Tuple[float, Tuple[int, int]]:
+        score, (x, y) = _peak(cv2.matchTemplate(image, self.template, self.method))
+        return score, (x + offset_x, y + offset_y)
+
+    def _fft_score_map(self, prepared: PreparedFrame) -> np.ndarray:
+        image_h, image_w = prepared.image.shape[:2]
+        shape = fft_shape(image_h, image_w)
+        product = cv2.mulSpectrums(
+            prepared.spectrum(shape), self.template_spectrum(shape), 0, conjB=True
+        )
+        correlation = cv2.idft(product, flags=cv2.DFT_SCALE | cv2.DFT_REAL_OUTPUT)
+        correlation = correlation[
+            : image_h - self.template_height + 1, : image_w - self.template_width + 1
+        ]
+        denominator = prepared.window_norm(self.template_width, self.template_height)
+        denominator = denominator * np.float32(self.template_norm)
+        result = cv2.divide(correlation, denominator)
+        # Same rule as cv2.matchTemplate for near-flat windows: rounding noise
+        # just past the denominator clamps to +/-1, anything larger scores 0.
+        magnitude = np.abs(correlation)
+        outside = magnitude >= denominator
+        if outside.any():
+            near = magnitude[outside] < denominator[outside] * 1.125
+            result[outside] = np.where(near, np.sign(correlation[outside]), 0.0)
+        return result
+
+    def _match_pyramid(
+        self, image: np.ndarray, coarse: np.ndarray, coarse_template: np.ndarray
+    ) -> Tuple[float, Tuple[int, int]]:
+        result = cv2.matchTemplate(coarse, coarse_template, self.method)
+        coarse_h, coarse_w = coarse_template.shape[:2]
+        peaks = _top_peaks(
+            result, PYRAMID_CANDIDATES, max(1, coarse_w // 2), max(1, coarse_h // 2)
+        )
+
+        scale = 1 << self.pyramid_levels
+        # pyrDown rounds odd sizes up, so a coarse peak can be off by about one
+        # coarse pixel in either direction; search two to be safe.
+        radius = 2 * scale
+        image_h, image_w = image.shape[:2]
+        max_x = image_w - self.template_width
+        max_y = image_h - self.template_height
+        best_score = -np.inf
+        best_loc = (0, 0)
+        for peak_x, peak_y in peaks:
+            x0 = min(max(0, peak_x * scale - radius), max_x)
+            y0 = min(max(0, peak_y * scale - radius), max_y)
+            x1 = min(max_x, peak_x * scale + radius)
+            y1 = min(max_y, peak_y * scale + radius)
+            window = image[
+                y0 : y1 + self.template_height, x0 : x1 + self.template_width
+            ]
+            score, loc = self._match_region(window, x0, y0)
+            if score > best_score:
+                best_score = score
+                best_loc = loc
+        return float(best_score), best_loc
+
+    def small_template(self, level: int) -> Optional[np.ndarray]:
+        # The template after `level` pyrDowns, or None once it gets too small
+        # to score meaningfully. Shares cache entries with the pyramid.
+        if level not in self._small_templates:
+            image = self.template
+            for step in range(1, level + 1):
+                image = self._cached(
+                    f"pyr{step}", lambda image=image: cv2.pyrDown(image)
+                )
+            if min(image.shape[:2]) < MIN_PYRAMID_TEMPLATE_SIDE:
+                image = None
+            self._small_templates[level] = image
+        return self._small_templates[level]
+
+    def prefilter(
+        self, prepared: PreparedFrame, level: int
+    ) -> Optional[Tuple[float, Tuple[int, int]]]:
+        # Best score of the downscaled template on the downscaled frame, with
+        # the location scaled back up. None when the level is too coarse.
+        template = self.small_template(level)
+        if template is None:
+            return None
+        image = prepared.level(level)
+        if image.shape[0] < template.shape[0] or image.shape[1] < template.shape[1]:
+            return None
+        score, (x, y) = _peak(cv2.matchTemplate(image, template, self.method))
+        return score, (x << level, y << level)
 
     def template_size(self) -> Tuple[int, int]:
         return self.template_width, self.template_height
@@ -43,3 +390,311 @@ class TemplateMatcher:
     def _edges(image: np.ndarray) -> np.ndarray:
         blurred = cv2.GaussianBlur(image, (3, 3), 0)
         return cv2.Canny(blurred, 50, 150)
+
+
+def _sample_frame(
+    matchers: List["TemplateMatcher"], width: int, height: int
+) -> np.ndarray:
+    # A preprocessed frame tiled with the templates themselves, so timing
+    # sees the content (e.g. sparse text edges) the watcher actually matches.
+    frame = np.zeros((height, width), np.uint8)
+    index = 0
+    for y in range(0, height, max(1, min(m.template_height for m in matchers))):
+        x = 0
+        while x < width:
+            template = matchers[index % len(matchers)].template
+            index += 1
+            tile = template[: height - y, : width - x]
+            frame[y : y + tile.shape[0], x : x + tile.shape[1]] = tile
+            x += tile.shape[1]
+    return frame
+
+
+class MatcherBank:
+    # Preprocesses each frame once per (grayscale, edges) group and shares
+    # the result across every template in that group.
+    def __init__(self, matchers: List[TemplateMatcher]) -> None:
+        if not matchers:
+            raise ValueError("MatcherBank needs at least one template.")
+        self.matchers = matchers
+        self.trackers: List[LocationTracker] = []
+        self.prefilter_levels = 0
+        self.reject_score = 0.0
+        self.prefilter_checked = 0
+        self.prefilter_rejected = 0
+        # Templates in group order, so preprocessing runs once per group.
+        self._order: List[int] = []
+        self._hit_rates = [0.0] * len(matchers)
+        self._recent_scores = [-1.0] * len(matchers)
+        self.evaluated = 0
+        self.skipped = 0
+        self.early_exits = 0
+        self._last_results: Optional[List[Tuple[float, Tuple[int, int]]]] = None
+        self._groups: Dict[PreprocessKey, List[int]] = {}
+        for index, matcher in enumerate(matchers):
+            self._groups.setdefault(matcher.preprocess_key(), []).append(index)
+        for indices in self._groups.values():
+            self._order.extend(indices)
+
+    @classmethod
+    def from_paths(
+        cls,
+        template_paths: List[str],
+        matching: Matching,
+        frame_size: Optional[Tuple[int, int]] = None,
+    ) -> "MatcherBank":
+        cache = TemplateCache.for_dir(matching.cache_dir)
+        bank = cls(
+            [
+                TemplateMatcher(
+                    template_path,
+                    matching.grayscale,
+                    matching.method,
+                    matching.text_only,
+                    matching.pyramid_levels,
+                    matching.engine,
+                    frame_size,
+                    cache,
+                )
+                for template_path in template_paths
+            ]
+        )
+        bank.resolve_auto_engine(frame_size, cache)
+        return bank
+
+    def resolve_auto_engine(
+        self,
+        frame_size: Optional[Tuple[int, int]],
+        cache: Optional[TemplateCache] = None,
+    ) -> None:
+        # "auto" times both engines on a frame of the real ROI size made of
+        # the group's own preprocessed templates, and keeps spatial unless
+        # FFT is clearly faster. cv2.matchTemplate is already DFT-based, so
+        # FFT mostly wins on large ROIs or when many templates share the
+        # frame transform. Timings are cached per template set, frame size
+        # and OpenCV build (see AUTO_SAMPLES and AUTO_RECHECK_SEC).
+        for key, indices in self._groups.items():
+            matchers = [
+                self.matchers[index]
+                for index in indices
+                if self.matchers[index].engine == "auto"
+            ]
+            if not matchers:
+                continue
+            if frame_size is None or not key[0]:
+                for matcher in matchers:
+                    matcher.engine = "spatial"
+                continue
+            width, height = frame_size
+            decision_key = None
+            samples: List[List[float]] = []
+            measured_at = time.time()
+            if cache is not None:
+                parts = [cv2.__version__, f"{width}x{height}"]
+                for matcher in matchers:
+                    parts.append(
+                        f"{matcher.cache_key}:{matcher.method_name}:"
+                        f"{matcher.pyramid_levels}"
+                    )
+                digest = hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+                decision_key = f"auto2-{digest[:32]}"
+                decision = cache.load_json(decision_key) or {}
+                if time.time() - decision.get("measured_at", 0) < AUTO_RECHECK_SEC:
+                    samples = decision.get("samples", [])[-AUTO_SAMPLES:]
+                    measured_at = decision["measured_at"]
+                if len(samples) >= AUTO_SAMPLES and decision.get("engine") in (
+                    "spatial",
+                    "fft",
+                ):
+                    for matcher in matchers:
+                        matcher.engine = decision["engine"]
+                    continue
+            frame = _sample_frame(matchers, width, height)
+            timings = {}
+            for engine in ("spatial", "fft"):
+                for matcher in matchers:
+                    matcher.engine = engine
+                runs = []
+                for run in range(AUTO_TIMING_RUNS + 1):
+                    prepared = PreparedFrame(frame)
+                    start = time.perf_counter()
+                    for matcher in matchers:
+                        matcher.match_prepared(prepared)
+                    if run:
+                        runs.append(time.perf_counter() - start)
+                timings[engine] = float(np.median(runs))
+            samples = samples[-(AUTO_SAMPLES - 1) :] + [
+                [timings["spatial"], timings["fft"]]
+            ]
+            spatial_sec, fft_sec = (float(v) for v in np.median(samples, axis=0))
+            chosen = "fft" if fft_sec <= spatial_sec * AUTO_FFT_MARGIN else "spatial"
+            for matcher in matchers:
+                matcher.engine = chosen
+            if decision_key is not None:
+                cache.store_json(
+                    decision_key,
+                    {"engine": chosen, "samples": samples, "measured_at": measured_at},
+                )
+            print(
+                f"[matcher] engine auto -> {chosen} for {len(matchers)} template(s) "
+                f"(spatial={spatial_sec * 1000:.1f}ms fft={fft_sec * 1000:.1f}ms "
+                f"per frame, {len(samples)}/{AUTO_SAMPLES} sample(s))"
+            )
+
+    def configure_prefilter(self, prefilter: Prefilter, threshold: float) -> None:
+        # Never reject at or above the threshold, whatever reject_score says.
+        self.prefilter_levels = prefilter.levels if prefilter.enabled else 0
+        self.reject_score = min(prefilter.reject_score, threshold)
+
+    def prefilter_stats_line(self) -> str:
+        checked = max(1, self.prefilter_checked)
+        return (
+            f"checked={self.prefilter_checked} rejected={self.prefilter_rejected} "
+            f"({self.prefilter_rejected / checked:.0%})"
+        )
+
+    def configure_tracking(self, tracking: Tracking) -> None:
+        self.trackers = []
+        if tracking.enabled:
+            self.trackers = [LocationTracker(tracking) for _ in self.matchers]
+
+    def match(
+        self,
+        frame: np.ndarray,
+        change: Optional[FrameChange] = None,
+        observe: Optional[Observer] = None,
+        accept_score: Optional[float] = None,
+        exit_score: Optional[float] = None,
+    ) -> List[Tuple[float, Tuple[int, int]]]:
+        # With tracking configured and accept_score given, each template is
+        # first searched around its tracked locations; the full search only
+        # runs when that local score falls below accept_score. Once one
+        # template is accepted locally the rest keep their local results too,
+        # since the frame already counts as a hit.
+        #
+        # With a prefilter configured, a template whose downscaled score is
+        # below reject_score keeps that coarse result and is not matched at
+        # full resolution.
+        #
+        # With exit_score, templates are tried most-likely-first and the rest
+        # are skipped (score -1) once one reaches it, so the maximum is only
+        # exact when exit_score is None.
+        previous = self._last_results
+        if change is not None and change.static and previous is not None:
+            return list(previous)
+        partial_rect = None
+        if change is not None and not change.full and previous is not None:
+            partial_rect = change.rect
+        results: List[Tuple[float, Tuple[int, int]]] = [
+            (-1.0, (0, 0)) for _ in self.matchers
+        ]
+        prepared_groups: Dict[PreprocessKey, PreparedFrame] = {}
+        preprocess_sec = 0.0
+        order = self.match_order() if exit_score is not None else self._order
+        confirmed = False
+        for position, index in enumerate(order):
+            matcher = self.matchers[index]
+            key = matcher.preprocess_key()
+            prepared = prepared_groups.get(key)
+            if prepared is None:
+                start = time.perf_counter()
+                prepared = PreparedFrame(preprocess_frame(frame, *key))
+                prepared_groups[key] = prepared
+                preprocess_sec += time.perf_counter() - start
+            start = time.perf_counter()
+            result = None
+            tracker = None
+            local = False
+            rejected = False
+            if self.prefilter_levels:
+                coarse = matcher.prefilter(prepared, self.prefilter_levels)
+                if coarse is not None:
+                    self.prefilter_checked += 1
+                    if coarse[0] < self.reject_score:
+                        # A clear miss: report the coarse result and skip
+                        # the full-resolution match.
+                        self.prefilter_rejected += 1
+                        matcher.last_score_map = None
+                        result = coarse
+                        rejected = True
+            if not rejected and self.trackers and accept_score is not None:
+                tracker = self.trackers[index]
+                candidates = tracker.candidates()
+                if candidates:
+                    result = matcher.match_around(prepared, candidates, tracker.margin)
+                    local = result is not None and (
+                        confirmed or result[0] >= accept_score
+                    )
+                    if local:
+                        confirmed = True
+                        tracker.local += 1
+                    else:
+                        result = None
+                        tracker.fallbacks += 1
+                else:
+                    tracker.full += 1
+            if result is None and partial_rect is not None:
+                result = matcher.rematch_window(prepared, partial_rect)
+            if result is None:
+                result = matcher.match_prepared(prepared)
+            if tracker is not None:
+                tracker.record(result[1], result[0] >= accept_score, local)
+            if observe is not None:
+                observe(
+                    "match",
+                    time.perf_counter() - start,
+                    template=os.path.basename(matcher.template_path),
+                )
+            results[index] = result
+            self.evaluated += 1
+            if accept_score is not None:
+                hit = 1.0 if result[0] >= accept_score else 0.0
+                self._hit_rates[index] += HIT_RATE_ALPHA * (
+                    hit - self._hit_rates[index]
+                )
+            self._recent_scores[index] = result[0]
+            if exit_score is not None and result[0] >= exit_score:
+                for skipped in order[position + 1 :]:
+                    # Their score maps are now a frame behind; partial
+                    # re-matching must not patch them.
+                    self.matchers[skipped].last_score_map = None
+                self.skipped += len(order) - position - 1
+                self.early_exits += 1
+                break
+        if observe is not None:
+            observe("preprocess", preprocess_sec)
+        self._last_results = results
+        return results
+
+    def match_order(self) -> List[int]:
+        # Most frequent recent hitter first, then the best last score.
+        return sorted(
+            self._order,
+            key=lambda index: (-self._hit_rates[index], -self._recent_scores[index]),
+        )
+
+    def early_exit_stats_line(self) -> str:
+        total = max(1, self.evaluated + self.skipped)
+        return (
+            f"evaluated={self.evaluated} skipped={self.skipped} "
+            f"({self.skipped / total:.0%}) early_exits={self.early_exits}"
+        )
+
+    def best(
+        self,
+        frame: np.ndarray,
+        change: Optional[FrameChange] = None,
+        observe: Optional[Observer] = None,
+        accept_score: Optional[float] = None,
+        exit_score: Optional[float] = None,
+    ) -> Tuple[float, Tuple[int, int], TemplateMatcher]:
+        best_score = -1.0
+        best_loc = (0, 0)
+        best_matcher = self.matchers[0]
+        results = self.match(frame, change, observe, accept_score, exit_score)
+        for matcher, (score, loc) in zip(self.matchers, results):
+            if score > best_score:
+                best_score = score
+                best_loc = loc
+                best_matcher = matcher
+        return best_score, best_loc, best_matcher
@@ -0,0 +1,198 @@
+import collections
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import Metrics
+
+QUANTILES = (0.5, 0.95, 0.99)
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class LatencyWindow:
+    # The last `size` durations for percentiles, plus lifetime sum/count.
+    def __init__(self, size: int) -> None:
+        self.samples: Deque[float] = collections.deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def quantiles(self) -> List[float]:
+        if not self.samples:
+            return [0.0 for _ in QUANTILES]
+        values = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        return [float(value) for value in np.quantile(values, QUANTILES)]
+
+
+def _labels_text(labels: LabelSet, extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class WatcherMetrics:
+    # Stage latencies and counters for one watcher run. Safe to call from the
+    # loop and from the notify/debug-writer threads. Counters owned by other
+    # objects (e.g. the dispatcher's sent count) are read at export time.
+    def __init__(self, metrics: Metrics) -> None:
+        self.config = metrics
+        self._lock = threading.Lock()
+        self._stages: Dict[Tuple[str, LabelSet], LatencyWindow] = {}
+        self._counters: Dict[str, float] = collections.OrderedDict()
+        self._sources: Dict[str, Callable[[], float]] = collections.OrderedDict()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._jsonl_stop = threading.Event()
+        self._jsonl_thread: Optional[threading.Thread] = None
+
+    def observe(self, stage: str, seconds: float, **labels: str) -> None:
+        if not self.config.enabled:
+            return
+        key = (stage, tuple(sorted(labels.items())))
+        with self._lock:
+            window = self._stages.get(key)
+            if window is None:
+                window = LatencyWindow(self.config.window)
+                self._stages[key] = window
+            window.add(seconds)
+
+    def inc(self, name: str, amount: float = 1) -> None:
+        if not self.config.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def counter_source(self, name: str, read: Callable[[], float]) -> None:
+        self._sources[name] = read
+
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            values = dict(self._counters)
+        for name, read in self._sources.items():
+            values[name] = read()
+        return values
+
+    def stages(self) -> List[Tuple[str, LabelSet, List[float], int, float]]:
+        with self._lock:
+            items = list(self._stages.items())
+            return [
+                (stage, labels, window.quantiles(), window.count, window.total)
+                for (stage, labels), window in items
+            ]
+
+    def prometheus_text(self) -> str:
+        lines = []
+        for name, value in self.counters().items():
+            lines.append(f"# TYPE watcher_{name}_total counter")
+            lines.append(f"watcher_{name}_total {value:g}")
+        lines.append("# TYPE watcher_stage_seconds summary")
+        for stage, labels, quantiles, count, total in self.stages():
+            labels = (("stage", stage),) + labels
+            for q, value in zip(QUANTILES, quantiles):
+                text = _labels_text(labels, f'quantile="{q:g}"')
+                lines.append(f"watcher_stage_seconds{text} {value:.6f}")
+            text = _labels_text(labels)
+            lines.append(f"watcher_stage_seconds_sum{text} {total:.6f}")
+            lines.append(f"watcher_stage_seconds_count{text} {count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, object]:
+        stages = []
+        for stage, labels, quantiles, count, _total in self.stages():
+            entry: Dict[str, object] = {"stage": stage, **dict(labels)}
+            for q, value in zip(QUANTILES, quantiles):
+                entry[f"p{int(q * 100)}_ms"] = round(value * 1000, 3)
+            entry["count"] = count
+            stages.append(entry)
+        return {"ts": time.time(), "counters": self.counters(), "stages": stages}
+
+    def summary_lines(self) -> List[str]:
+        lines = []
+        for stage, labels, quantiles, count, _total in self.stages():
+            name = "/".join([stage] + [value for _key, value in labels])
+            p50, p95, p99 = (value * 1000 for value in quantiles)
+            lines.append(
+                f"{name}: p50={p50:.2f}ms p95={p95:.2f}ms p99={p99:.2f}ms n={count}"
+            )
+        counters = " ".join(
+            f"{name}={value:g}" for name, value in self.counters().items()
+        )
+        if counters:
+            lines.append(counters)
+        return lines
+
+    def start(self) -> None:
+        if not self.config.enabled:
+            return
+        if self.config.http_port > 0:
+            self._start_http()
+        if self.config.jsonl_path:
+            self._jsonl_thread = threading.Thread(
+                target=self._run_jsonl, name="watcher-metrics-log", daemon=True
+            )
+            self._jsonl_thread.start()
+            print(f"[metrics] Logging to {self.config.jsonl_path}")
+
+    def _start_http(self) -> None:
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer(
+                (self.config.http_host, self.config.http_port), Handler
+            )
+        except OSError as exc:
+            print(f"[metrics] Could not start endpoint: {exc}")
+            return
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever,
+            name="watcher-metrics-http",
+            daemon=True,
+        ).start()
+        print(
+            f"[metrics] Serving http://{self.config.http_host}:"
+            f"{self.config.http_port}/metrics"
+        )
+
+    def _run_jsonl(self) -> None:
+        while not self._jsonl_stop.wait(self.config.jsonl_interval_sec):
+            self._write_jsonl()
+
+    def _write_jsonl(self) -> None:
+        try:
+            with open(self.config.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.snapshot()) + "\n")
+        except OSError as exc:
+            print(f"[metrics] Failed to write {self.config.jsonl_path}: {exc}")
+
+    def close(self) -> None:
+        if self._jsonl_thread is not None:
+            self._jsonl_stop.set()
+            self._jsonl_thread.join(timeout=2.0)
+            self._write_jsonl()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -1,94 +1,409 @@
 from __future__ import annotations
 
+import asyncio
+import http.client
+import threading
 import time
 import urllib.parse
-import urllib.request
+from typing import Callable, NamedTuple, Optional
 
+from .config import Notify
 
-def _post_form(url: str, payload: dict[str, str], timeout: float = 10.0) -> None:
-    data = urllib.parse.urlencode(payload).encode("utf-8")
-    request = urllib.request.Request(url, data=data, method="POST")
-    with urllib.request.urlopen(request, timeout=timeout) as response:
-        response.read()
+PUSHOVER_URL = "https://api.pushover.net/1/messages.json"
+TELEGRAM_API_URL = "https://api.telegram.org"
+# Retry backoff doubles after every failed attempt up to this cap.
+MAX_BACKOFF_SEC = 8.0
 
 
-def _send_pushover(*, title: str, message: str, app_token: str, user_key: str) -> None:
-    _post_form(
-        "https://api.pushover.net/1/messages.json",
-        {"token": app_token, "user": user_key, "title": title, "message": message},
-    )
+class NotifyHTTPError(Exception):
+    def __init__(self, status: int, body: bytes) -> None:
+        super().__init__(f"HTTP {status}: {body[:200]!r}")
+        self.status = status
 
+    @property
+    def retryable(self) -> bool:
+        return self.status == 429 or self.status >= 500
 
-def _send_telegram(*, title: str, message: str, bot_token: str, chat_id: str) -> None:
-    _post_form(
-        f"https://api.telegram.org/bot{bot_token}/sendMessage",
-        {"chat_id": chat_id, "text": f"{title}: {message}"},
-    )
+
+def _pushover_request(
+    *, title: str, message: str, app_token: str, user_key: str, url: str = PUSHOVER_URL
+) -> tuple[str, dict[str, str]]:
+    return url, {"token": app_token, "user": user_key, "title": title, "message": message}
 
 
-def send_notification(
+def _telegram_request(
     *,
     title: str,
     message: str,
-    use_toast: bool = True,
-    beep_fallback: bool = True,
-    provider: str = "local",
-    fallback_to_local: bool = True,
-    pushover_app_token: str = "",
-    pushover_user_key: str = "",
-    telegram_bot_token: str = "",
-    telegram_chat_id: str = "",
-) -> None:
-    notified = False
-
-    provider = (provider or "local").lower()
-
-    if provider == "pushover":
-        try:
-            _send_pushover(
-                title=title,
-                message=message,
-                app_token=pushover_app_token,
-                user_key=pushover_user_key,
-            )
-            notified = True
-        except Exception as exc:
-            print(f"[notify] Pushover failed: {exc}")
-    elif provider == "telegram":
-        try:
-            _send_telegram(
-                title=title,
-                message=message,
-                bot_token=telegram_bot_token,
-                chat_id=telegram_chat_id,
-            )
-            notified = True
-        except Exception as exc:
-            print(f"[notify] Telegram failed: {exc}")
+    bot_token: str,
+    chat_id: str,
+    api_url: str = TELEGRAM_API_URL,
+) -> tuple[str, dict[str, str]]:
+    return (
+        f"{api_url.rstrip('/')}/bot{bot_token}/sendMessage",
+        {"chat_id": chat_id, "text": f"{title}: {message}"},
+    )
 
-    if not notified and fallback_to_local and use_toast:
+
+def _notify_local(
+    *, title: str, message: str, use_toast: bool, beep_fallback: bool
+) -> bool:
+    if use_toast:
         try:
             from winotify import Notification, audio
 
             toast = Notification(app_id="Watcher", title=title, msg=message, duration="short")
             toast.set_audio(audio.Default, loop=False)
             toast.show()
-            notified = True
+            return True
         except Exception as exc:
             print(f"[notify] Toast failed: {exc}")
 
-    if not notified and fallback_to_local and beep_fallback:
+    if beep_fallback:
         try:
             import winsound
 
             winsound.Beep(1000, 250)
             time.sleep(0.05)
             winsound.Beep(1200, 250)
-            notified = True
+            return True
         except Exception as exc:
             print(f"[notify] Beep failed: {exc}")
+    return False
 
-    if not notified:
-        print(f"[notify] {title}: {message}")
+
+class _KeepAliveClient:
+    # One persistent HTTP(S) connection per scheme/host, reused across posts.
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+        self._connections: dict[tuple[str, str], http.client.HTTPConnection] = {}
+
+    def _connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        conn = self._connections.get((scheme, netloc))
+        if conn is None:
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            self._connections[(scheme, netloc)] = conn
+        return conn
+
+    def _drop(self, scheme: str, netloc: str) -> None:
+        conn = self._connections.pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def post_form(self, url: str, payload: dict[str, str]) -> None:
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        body = urllib.parse.urlencode(payload).encode("utf-8")
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        # A kept-alive socket may have been closed by the server while idle;
+        # that only shows up on the next request, so reconnect once.
+        for attempt in range(2):
+            conn = self._connection(parts.scheme, parts.netloc)
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (
+                http.client.RemoteDisconnected,
+                http.client.CannotSendRequest,
+                ConnectionResetError,
+                BrokenPipeError,
+            ):
+                self._drop(parts.scheme, parts.netloc)
+                if attempt == 0:
+                    continue
+                raise
+            except Exception:
+                self._drop(parts.scheme, parts.netloc)
+                raise
+            if response.will_close:
+                self._drop(parts.scheme, parts.netloc)
+            if response.status >= 400:
+                raise NotifyHTTPError(response.status, data)
+            return
+
+    def close(self) -> None:
+        for conn in self._connections.values():
+            conn.close()
+        self._connections.clear()
+
+
+class TokenBucket:
+    # Allows rate_per_min requests a minute with bursts of up to `burst`.
+    # take() never refuses outright: it returns how long to wait before
+    # asking again, so callers defer sends instead of dropping them.
+    def __init__(self, rate_per_min: float, burst: int) -> None:
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._stamp) * self.rate
+            )
+            self._stamp = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+# One bucket per provider account, shared by every dispatcher in the process.
+_buckets: dict[tuple, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def provider_bucket(notify: Notify) -> Optional[TokenBucket]:
+    if notify.rate_per_min <= 0:
+        return None
+    if notify.provider == "pushover":
+        account = notify.pushover_app_token
+    elif notify.provider == "telegram":
+        account = f"{notify.telegram_bot_token}/{notify.telegram_chat_id}"
     else:
+        return None
+    key = (notify.provider, account, notify.rate_per_min, notify.rate_burst)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(notify.rate_per_min, notify.rate_burst)
+            _buckets[key] = bucket
+        return bucket
+
+
+class Event(NamedTuple):
+    title: str
+    message: str
+    queued_at: float
+    # Region (or other origin) and score, used to summarize merged events.
+    source: str = ""
+    score: Optional[float] = None
+
+
+def coalesce(events: list[Event]) -> tuple[str, str]:
+    # Title and message for one send covering `events`, in arrival order.
+    if len(events) == 1:
+        return events[0].title, events[0].message
+    groups: dict[str, list] = {}
+    for event in events:
+        group = groups.setdefault(event.source or "match", [0, None])
+        group[0] += 1
+        if event.score is not None and (group[1] is None or event.score > group[1]):
+            group[1] = event.score
+    parts = []
+    for source, (count, best) in groups.items():
+        part = f"{source} x{count}"
+        if best is not None:
+            part = f"{part} (best {best:.3f})"
+        parts.append(part)
+    span = events[-1].queued_at - events[0].queued_at
+    return events[0].title, f"{len(events)} events in {span:.1f}s: {', '.join(parts)}"
+
+
+class AsyncNotificationDispatcher:
+    # Sends notifications from one asyncio task per dispatcher so the watcher
+    # loop only enqueues. Events arriving within notify.coalesce_sec of the
+    # first one are merged, and merging continues while the provider's rate
+    # limit defers the send. Remote sends are retried with exponential
+    # backoff until retry_deadline_sec after the first event, then fall back
+    # to toast/beep. Posts and toasts run in the loop's default executor and
+    # every wait is an asyncio sleep, so no thread is parked per watcher
+    # between events. Create, submit and close it on the event loop thread.
+    def __init__(
+        self, notify: Notify, observe: Optional[Callable[..., None]] = None
+    ) -> None:
+        self.notify = notify
+        # Called with ("notify", seconds from submit to delivery) when set.
+        self._observe = observe
+        self._client = _KeepAliveClient(notify.timeout_sec)
+        self._bucket = provider_bucket(notify)
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.merged = 0
+        self.deferred = 0
+        self._pending: list[Event] = []
+        self._wake = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    def _take_token(self) -> float:
+        return 0.0 if self._bucket is None else self._bucket.take()
+
+    def _request(self, title: str, message: str) -> Optional[tuple[str, dict[str, str]]]:
+        notify = self.notify
+        if notify.provider == "pushover":
+            return _pushover_request(
+                title=title,
+                message=message,
+                app_token=notify.pushover_app_token,
+                user_key=notify.pushover_user_key,
+                url=notify.pushover_url,
+            )
+        if notify.provider == "telegram":
+            return _telegram_request(
+                title=title,
+                message=message,
+                bot_token=notify.telegram_bot_token,
+                chat_id=notify.telegram_chat_id,
+                api_url=notify.telegram_api_url,
+            )
+        return None
+
+    def _attempt(
+        self, url: str, payload: dict[str, str], attempt: int
+    ) -> Optional[bool]:
+        # True when sent, False when retrying cannot help, None to retry.
+        try:
+            self._client.post_form(url, payload)
+            return True
+        except NotifyHTTPError as exc:
+            print(f"[notify] {self.notify.provider} attempt {attempt} failed: {exc}")
+            if not exc.retryable:
+                return False
+        except Exception as exc:
+            print(f"[notify] {self.notify.provider} attempt {attempt} failed: {exc}")
+        return None
+
+    def _local(self, title: str, message: str) -> bool:
+        return _notify_local(
+            title=title,
+            message=message,
+            use_toast=self.notify.use_toast,
+            beep_fallback=self.notify.beep_fallback,
+        )
+
+    def _count(self, events: list[Event], remote: bool, delivered: bool) -> None:
+        # sent: delivered by any provider, the local toast/beep included;
+        # failed: the remote provider gave up, whatever the fallback did.
+        self.merged += len(events) - 1
+        if delivered:
+            self.sent += 1
+        if not remote and self.notify.provider != "local":
+            self.failed += 1
+
+    def _delivered(self, events: list[Event], title: str, message: str) -> None:
+        if self._observe is not None:
+            now = time.monotonic()
+            for event in events:
+                self._observe("notify", now - event.queued_at)
         print(f"[notify] {title}: {message}")
+
+    def _drop(self, title: str, message: str) -> bool:
+        self.dropped += 1
+        print(f"[notify] Queue full, dropped: {title}: {message}")
+        return False
+
+    def _defer(self, wait: float) -> None:
+        self.deferred += 1
+        print(f"[notify] {self.notify.provider} rate limit, sending in {wait:.1f}s")
+
+    def stats_line(self) -> str:
+        return (
+            f"sent={self.sent} failed={self.failed} merged={self.merged} "
+            f"deferred={self.deferred} dropped={self.dropped}"
+        )
+
+    def submit(
+        self,
+        title: str,
+        message: str,
+        source: str = "",
+        score: Optional[float] = None,
+    ) -> bool:
+        if len(self._pending) >= self.notify.queue_size:
+            return self._drop(title, message)
+        self._pending.append(Event(title, message, time.monotonic(), source, score))
+        self._wake.set()
+        return True
+
+    async def aclose(self, timeout: float = 5.0) -> None:
+        # Sends what is pending without further waits, then cancels the task
+        # if it is still running after `timeout`.
+        self._closing.set()
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._client.close()
+
+    async def _pause(self, seconds: float) -> bool:
+        # Sleeps up to `seconds`; True when cut short by aclose().
+        try:
+            await asyncio.wait_for(self._closing.wait(), seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _send_remote(self, title: str, message: str, queued_at: float) -> bool:
+        request = self._request(title, message)
+        if request is None:
+            return False
+        url, payload = request
+        deadline = queued_at + self.notify.retry_deadline_sec
+        backoff = self.notify.retry_backoff_sec
+        attempt = 1
+        while True:
+            result = await asyncio.to_thread(self._attempt, url, payload, attempt)
+            if result is not None:
+                return result
+            if time.monotonic() + backoff > deadline or self._closing.is_set():
+                return False
+            if await self._pause(backoff):
+                return False
+            while True:
+                wait = self._take_token()
+                if wait <= 0:
+                    break
+                if await self._pause(wait):
+                    return False
+            backoff = min(backoff * 2, MAX_BACKOFF_SEC)
+            attempt += 1
+
+    async def _deliver(self, events: list[Event]) -> None:
+        title, message = coalesce(events)
+        remote = await self._send_remote(title, message, events[0].queued_at)
+        delivered = remote
+        if not remote and self.notify.fallback_to_local:
+            delivered = await asyncio.to_thread(self._local, title, message)
+        self._count(events, remote, delivered)
+        self._delivered(events, title, message)
+
+    async def _run(self) -> None:
+        while True:
+            if not self._pending:
+                if self._closing.is_set():
+                    return
+                await self._wake.wait()
+                self._wake.clear()
+                continue
+            closing = self._closing.is_set()
+            merge = self.notify.coalesce_sec > 0
+            if merge and not closing:
+                delay = self._pending[0].queued_at + self.notify.coalesce_sec
+                closing = await self._pause(delay - time.monotonic())
+            while not closing and self._bucket is not None:
+                wait = self._take_token()
+                if wait <= 0:
+                    break
+                self._defer(wait)
+                merge = True
+                closing = await self._pause(wait)
+            if merge:
+                events, self._pending = self._pending, []
+            else:
+                events = [self._pending.pop(0)]
+            try:
+                await self._deliver(events)
+            except Exception as exc:
+                print(f"[notify] Dispatcher error: {exc}")
@@ -1,10 +1,10 @@
+import functools
 import os
-import threading
 import tkinter as tk
 from tkinter import ttk
 
-from .app import run_watcher
-from .config import load_config
+from .config import ConfigReloader, load_config_with_templates
+from .supervisor import Supervisor, shared_producer
 
 
 def _resolve_path(config_path: str, path_value: str) -> str:
@@ -26,64 +26,83 @@ def run_panel(config_path: str) -> None:
         "红包": [_resolve_path(config_path, os.path.join("assets", "hongbao.png"))],
     }
 
-    current = {"thread": None, "stop": None, "label": None}
-
     def set_status(msg: str) -> None:
         status_var.set(msg)
         print(f"[panel] {msg}")
 
-    def stop_current() -> None:
-        if current["stop"] is not None:
-            current["stop"].set()
-        if current["thread"] is not None:
-            current["thread"].join(timeout=5)
-        current["thread"] = None
-        current["stop"] = None
-        current["label"] = None
-
-    def start_watcher(label: str) -> None:
+    def show_statuses() -> None:
+        statuses = supervisor.statuses()
+        if not statuses:
+            status_var.set("Stopped")
+            return
+        lines = [f"{name}: {state}" for name, state in statuses.items()]
+        status_var.set("\n".join(lines))
+
+    def on_worker_status(name: str, state: str, detail: str) -> None:
+        suffix = f" ({detail})" if detail else ""
+        print(f"[panel] {name}: {state}{suffix}")
+        if state == "stopped" and name in selected:
+            selected[name].set(False)
+        show_statuses()
+
+    # Each selected label runs in its own worker process, so both can be
+    # watched at once without sharing the GIL with Tk or each other. The
+    # labels share one ROI, so a single capture feeds every worker.
+    supervisor = Supervisor(on_status=on_worker_status)
+
+    def release_capture_if_idle() -> None:
+        if supervisor.producer is not None and not supervisor.names():
+            supervisor.producer.close()
+            supervisor.producer = None
+
+    def start_watcher(label: str) -> bool:
         template_paths = templates.get(label)
         if not template_paths:
             set_status(f"Template not set for {label}")
-            return
+            return False
         missing = [path for path in template_paths if not os.path.exists(path)]
         if missing:
             set_status(f"Missing template(s): {', '.join(missing)}")
-            return
+            return False
 
-        config = load_config(config_path)
-        config.template_path = template_paths[0]
-        config.template_paths = template_paths
-
-        stop_event = threading.Event()
-        thread = threading.Thread(
-            target=run_watcher, args=(config, stop_event), daemon=True
+        config = load_config_with_templates(config_path, template_paths)
+        reloader = ConfigReloader(
+            config_path,
+            functools.partial(load_config_with_templates, config_path, template_paths),
+            config,
         )
-        current["thread"] = thread
-        current["stop"] = stop_event
-        current["label"] = label
-        thread.start()
-        set_status(f"Running: {label}")
-
-    def on_select() -> None:
-        selection = mode_var.get()
-        stop_current()
-        if selection:
-            start_watcher(selection)
+
+        if supervisor.producer is None:
+            supervisor.producer = shared_producer([config])
+        supervisor.start(label, config, reloader)
+        return True
+
+    def on_toggle(label: str) -> None:
+        if selected[label].get():
+            if not start_watcher(label):
+                selected[label].set(False)
         else:
-            set_status("Stopped")
+            supervisor.stop(label)
+            release_capture_if_idle()
 
     def on_stop() -> None:
-        mode_var.set("")
-        stop_current()
+        for var in selected.values():
+            var.set(False)
+        supervisor.stop_all()
+        release_capture_if_idle()
         set_status("Stopped")
 
+    def poll_workers() -> None:
+        supervisor.poll()
+        release_capture_if_idle()
+        root.after(500, poll_workers)
+
     root = tk.Tk()
     root.title("Watcher Panel")
     root.attributes("-topmost", True)
     # Disable maximize button; resizing isn't needed for this panel.
     root.resizable(False, False)
-    root.geometry("220x190")
+    root.geometry("220x230")
 
     main = ttk.Frame(root, padding=10)
     main.pack(fill="both", expand=True)
@@ -112,13 +131,15 @@ def run_panel(config_path: str) -> None:
 
     ttk.Label(main, text="选择监控类型").pack(anchor="w")
 
-    mode_var = tk.StringVar(value="")
-    ttk.Radiobutton(
-        main, text="战场", value="战场", variable=mode_var, command=on_select
-    ).pack(anchor="w")
-    ttk.Radiobutton(
-        main, text="红包", value="红包", variable=mode_var, command=on_select
-    ).pack(anchor="w")
+    selected = {}
+    for label in templates:
+        selected[label] = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            main,
+            text=label,
+            variable=selected[label],
+            command=lambda label=label: on_toggle(label),
+        ).pack(anchor="w")
 
     ttk.Button(main, text="停止", command=on_stop).pack(anchor="w", pady=(6, 0))
 
@@ -126,9 +147,11 @@ def run_panel(config_path: str) -> None:
     ttk.Label(main, textvariable=status_var).pack(anchor="w", pady=(6, 0))
 
     def on_close() -> None:
-        stop_current()
+        supervisor.stop_all()
+        release_capture_if_idle()
         root.destroy()
 
     root.protocol("WM_DELETE_WINDOW", on_close)
     set_status("Stopped")
+    poll_workers()
     root.mainloop()
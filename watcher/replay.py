@@ -0,0 +1,161 @@
+import collections
+import csv
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Optional, Tuple
+
+import numpy as np
+
+from .app import RegionWatch
+from .config import Config, union_roi
+from .storage import list_frames, read_frame, replay_order
+from .tracking import tracking_stats_line
+
+
+def run_replay(
+    config: Config,
+    frames_dir: str,
+    workers: int,
+    quiet: bool,
+    csv_path: Optional[str] = None,
+) -> int:
+    paths = list_frames(frames_dir)
+    if not paths:
+        print(f"[replay] No frames found in {frames_dir}")
+        return 0
+    frames = replay_order(paths, config.runtime.interval_sec)
+
+    origin = union_roi([region.roi for region in config.regions])
+    labelled = len(config.regions) > 1
+    watches = [
+        RegionWatch(region, config, origin, labelled) for region in config.regions
+    ]
+    notifications = {watch.name: 0 for watch in watches}
+
+    csv_file = None
+    writer = None
+    if csv_path:
+        csv_file = open(csv_path, "w", newline="", encoding="utf-8")
+        writer = csv.writer(csv_file)
+        # left/top/width/height: the best match box in screen coordinates.
+        writer.writerow(
+            [
+                "frame",
+                "region",
+                "score",
+                "streak",
+                "notify",
+                "left",
+                "top",
+                "width",
+                "height",
+            ]
+        )
+
+    print(f"[replay] Replaying {len(frames)} frame(s) from {frames_dir}")
+    replayed = 0
+    skipped = 0
+    match_sec = 0.0
+    start = time.perf_counter()
+    # Decoding dominates replay time; keep a bounded number of frames in
+    # flight so the pool stays busy without holding the whole directory.
+    pending: Deque[Tuple[str, float, "Future[Optional[np.ndarray]]"]] = (
+        collections.deque()
+    )
+    lookahead = max(1, workers) * 2
+    try:
+        with ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="watcher-replay"
+        ) as pool:
+            queued = iter(frames)
+            while True:
+                while len(pending) < lookahead:
+                    item = next(queued, None)
+                    if item is None:
+                        break
+                    pending.append((item[0], item[1], pool.submit(read_frame, item[0])))
+                if not pending:
+                    break
+                path, stamp, future = pending.popleft()
+                frame = future.result()
+                name = os.path.basename(path)
+                if frame is None:
+                    print(f"[replay] Skipping unreadable frame: {path}")
+                    skipped += 1
+                    continue
+                if frame.shape[0] < origin.height or frame.shape[1] < origin.width:
+                    print(
+                        f"[replay] Skipping {name}: {frame.shape[1]}x{frame.shape[0]} "
+                        f"is smaller than the ROI {origin.width}x{origin.height}"
+                    )
+                    skipped += 1
+                    continue
+
+                replayed += 1
+                match_start = time.perf_counter()
+                for watch in watches:
+                    watch.match(frame)
+                match_sec += time.perf_counter() - match_start
+                for watch in watches:
+                    fired = watch.update(stamp, config.runtime)
+                    if fired:
+                        notifications[watch.name] += 1
+                        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stamp))
+                        print(
+                            f"[replay] NOTIFY {watch.prefix}{name} ({when}) "
+                            f"score={watch.best_score:.4f}"
+                        )
+                    if not quiet:
+                        print(
+                            f"[replay] {name} {watch.prefix}score={watch.best_score:.4f} "
+                            f"streak={watch.hit_streak}"
+                        )
+                    if writer is not None:
+                        width, height = watch.best_matcher.template_size()
+                        writer.writerow(
+                            [
+                                name,
+                                watch.name,
+                                f"{watch.best_score:.4f}",
+                                watch.hit_streak,
+                                int(fired),
+                                watch.region.roi.left + watch.best_loc[0],
+                                watch.region.roi.top + watch.best_loc[1],
+                                width,
+                                height,
+                            ]
+                        )
+    finally:
+        if csv_file is not None:
+            csv_file.close()
+
+    elapsed = time.perf_counter() - start
+    if replayed == 0:
+        print("[replay] No readable frames.")
+        return 0
+    fps = replayed / elapsed if elapsed > 0 else float("inf")
+    print(
+        f"[replay] frames={replayed} skipped={skipped} time={elapsed:.2f}s "
+        f"fps={fps:.1f} match={match_sec / replayed * 1000:.2f}ms/frame"
+    )
+    for watch in watches:
+        print(f"[replay] {watch.prefix}notifications={notifications[watch.name]}")
+        if watch.bank.trackers:
+            print(
+                f"[replay] {watch.prefix}tracking: "
+                f"{tracking_stats_line(watch.bank.trackers)}"
+            )
+        if watch.bank.prefilter_levels:
+            print(
+                f"[replay] {watch.prefix}prefilter: "
+                f"{watch.bank.prefilter_stats_line()}"
+            )
+        if watch.exit_margin > 0:
+            print(
+                f"[replay] {watch.prefix}early exit: "
+                f"{watch.bank.early_exit_stats_line()}"
+            )
+    if csv_path:
+        print(f"[replay] Per-frame scores written to {csv_path}")
+    return sum(notifications.values())
@@ -1,7 +1,9 @@
+from typing import Dict, List, Optional, Tuple
+
 import cv2
 
 from .capture import ScreenCapture
-from .config import read_config_dict, write_config_dict
+from .config import ROI, read_config_dict, write_config_dict
 
 
 class _ROISelector:
@@ -12,6 +14,8 @@ class _ROISelector:
         self.start = None
         self.end = None
         self.dragging = False
+        # (roi, color, label) boxes drawn under the selection.
+        self.overlays: List[Tuple[ROI, Tuple[int, int, int], str]] = []
 
     def on_mouse(self, event, x, y, _flags, _param) -> None:
         if event == cv2.EVENT_LBUTTONDOWN:
@@ -40,6 +44,19 @@ class _ROISelector:
 
     def draw(self):
         display = self.image.copy()
+        for roi, color, label in self.overlays:
+            x = roi.left - self.offset_left
+            y = roi.top - self.offset_top
+            cv2.rectangle(display, (x, y), (x + roi.width, y + roi.height), color, 2)
+            cv2.putText(
+                display,
+                label,
+                (x + 4, max(16, y - 6)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                color,
+                1,
+            )
         if self.has_selection():
             x1, y1 = self.start
             x2, y2 = self.end
@@ -47,13 +64,41 @@ class _ROISelector:
         return display
 
 
-def run_roi_picker(config_path: str) -> None:
+def _suggestions(config_path: str, frames_dir: str, margin: int) -> Dict[str, ROI]:
+    from .config import load_config
+    from .tighten import tighten_suggestions
+
+    return tighten_suggestions(load_config(config_path), frames_dir, None, margin)
+
+
+def run_roi_picker(
+    config_path: str, frames_dir: Optional[str] = None, margin: int = 16
+) -> None:
+    # With frames_dir, the ROI that `tighten` would suggest is drawn over the
+    # screenshot (current ROI in blue, suggestion in yellow); S saves it.
+    suggestions: Dict[str, ROI] = {}
+    current: Dict[str, ROI] = {}
+    if frames_dir:
+        from .config import load_config
+
+        regions = load_config(config_path).regions
+        current = {region.name: region.roi for region in regions}
+        suggestions = _suggestions(config_path, frames_dir, margin)
+
     capture = ScreenCapture()
     screenshot = capture.grab_fullscreen()
     offset_left, offset_top = capture.fullscreen_offset()
 
     selector = _ROISelector(screenshot, offset_left, offset_top)
+    for name, roi in current.items():
+        selector.overlays.append((roi, (255, 128, 0), f"{name} (current)"))
+    for name, roi in suggestions.items():
+        selector.overlays.append((roi, (0, 255, 255), f"{name} (suggested)"))
     window_name = "Select ROI - Drag mouse, Enter=Save, Esc=Cancel"
+    if suggestions:
+        window_name = (
+            "Select ROI - Drag mouse, Enter=Save, S=Save suggestion, Esc=Cancel"
+        )
     cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
     cv2.setMouseCallback(window_name, selector.on_mouse)
 
@@ -65,6 +110,12 @@ def run_roi_picker(config_path: str) -> None:
             if key == 27:  # Esc
                 print("[roi] Cancelled.")
                 return
+            if key in (ord("s"), ord("S")) and suggestions:
+                from .tighten import apply_suggestions
+
+                apply_suggestions(config_path, suggestions)
+                print(f"[roi] Saved suggested ROI(s) to {config_path}")
+                return
             if key in (10, 13):  # Enter
                 if not selector.has_selection():
                     print("[roi] No selection made.")
@@ -0,0 +1,208 @@
+import abc
+import os
+import queue
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .capture import EndOfFrames, FrameSource
+from .config import ROI, Config, union_roi
+from .storage import list_frames, read_frame, replay_order
+
+# Frames decoded ahead of the watcher loop by each recorded source.
+PREFETCH_FRAMES = 8
+SYNTHETIC_FRAMES = 1000
+# The synthetic source pastes the first template into every Nth frame.
+SYNTHETIC_HIT_EVERY = 10
+
+Stamped = Tuple[float, np.ndarray]
+
+
+class PrefetchSource(FrameSource):
+    # Decodes frames on a background thread into a bounded queue, so the
+    # loop only waits when decoding is slower than matching. Frames cover
+    # the screen area starting at `origin`; grab_roi() slices the ROI out.
+    live = False
+
+    def __init__(
+        self, origin: Tuple[int, int], prefetch: int = PREFETCH_FRAMES
+    ) -> None:
+        self.origin = origin
+        self.frames = 0
+        self._stamp = 0.0
+        self._queue: "queue.Queue[Optional[Stamped]]" = queue.Queue(maxsize=prefetch)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="watcher-source", daemon=True
+        )
+
+    def start(self) -> "PrefetchSource":
+        self._thread.start()
+        return self
+
+    @abc.abstractmethod
+    def _frames(self) -> Iterator[Stamped]:
+        ...
+
+    def _put(self, item: Optional[Stamped]) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self) -> None:
+        try:
+            for item in self._frames():
+                if not self._put(item):
+                    return
+        except Exception as exc:
+            print(f"[source] Reading frames failed: {exc}")
+        self._put(None)
+
+    def grab_roi(self, roi: ROI) -> np.ndarray:
+        item = self._queue.get()
+        if item is None:
+            # Stay exhausted for any later call.
+            self._queue.put(None)
+            raise EndOfFrames()
+        self._stamp, frame = item
+        self.frames += 1
+        x = roi.left - self.origin[0]
+        y = roi.top - self.origin[1]
+        if (
+            x < 0
+            or y < 0
+            or x + roi.width > frame.shape[1]
+            or y + roi.height > frame.shape[0]
+        ):
+            raise ValueError(
+                f"ROI {roi.width}x{roi.height}+{roi.left}+{roi.top} lies outside "
+                f"the {frame.shape[1]}x{frame.shape[0]} recorded frame at "
+                f"{self.origin[0]},{self.origin[1]}."
+            )
+        return frame[y : y + roi.height, x : x + roi.width]
+
+    def timestamp(self) -> float:
+        return self._stamp
+
+    def close(self) -> None:
+        self._stop.set()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._thread.join(timeout=5.0)
+
+
+class VideoFileSource(PrefetchSource):
+    # Frames of a recording, stamped with their position in the video.
+    def __init__(self, path: str, origin: Tuple[int, int]) -> None:
+        super().__init__(origin)
+        self.path = path
+        self._video = cv2.VideoCapture(path)
+        if not self._video.isOpened():
+            raise ValueError(f"Cannot open video: {path}")
+
+    def _frames(self) -> Iterator[Stamped]:
+        try:
+            while True:
+                ok, frame = self._video.read()
+                if not ok:
+                    break
+                yield self._video.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, frame
+        finally:
+            self._video.release()
+
+
+class ImageDirSource(PrefetchSource):
+    # Saved frames in capture order, with the clock taken from their names
+    # the same way `replay` does.
+    def __init__(
+        self, frames_dir: str, origin: Tuple[int, int], interval_sec: float
+    ) -> None:
+        super().__init__(origin)
+        paths = list_frames(frames_dir)
+        if not paths:
+            raise ValueError(f"No frames found in {frames_dir}")
+        self.ordered = replay_order(paths, interval_sec)
+
+    def _frames(self) -> Iterator[Stamped]:
+        for path, stamp in self.ordered:
+            frame = read_frame(path)
+            if frame is None:
+                name = os.path.basename(path)
+                print(f"[source] Skipping unreadable frame: {name}")
+                continue
+            yield stamp, frame
+
+
+class SyntheticSource(PrefetchSource):
+    # Noise frames of the capture size with the first template pasted into
+    # every hit_every-th frame; no files or display needed.
+    def __init__(
+        self,
+        config: Config,
+        count: int = SYNTHETIC_FRAMES,
+        hit_every: int = SYNTHETIC_HIT_EVERY,
+    ) -> None:
+        roi = union_roi([region.roi for region in config.regions])
+        super().__init__((roi.left, roi.top))
+        self.count = count
+        self.hit_every = hit_every
+        self.interval_sec = config.runtime.interval_sec
+        rng = np.random.default_rng(0)
+        self._backgrounds: List[np.ndarray] = [
+            rng.integers(0, 256, (roi.height, roi.width, 3), dtype=np.uint8)
+            for _ in range(4)
+        ]
+        region = config.regions[0]
+        template = cv2.imread(region.template_paths[0], cv2.IMREAD_COLOR)
+        self._hit: Optional[np.ndarray] = None
+        if template is not None:
+            height = min(template.shape[0], region.roi.height)
+            width = min(template.shape[1], region.roi.width)
+            x = region.roi.left - roi.left
+            y = region.roi.top - roi.top
+            hit = self._backgrounds[0].copy()
+            hit[y : y + height, x : x + width] = template[:height, :width]
+            self._hit = hit
+
+    def _frames(self) -> Iterator[Stamped]:
+        for index in range(self.count):
+            stamp = index * self.interval_sec
+            hit = self.hit_every and index % self.hit_every == 0
+            if hit and self._hit is not None:
+                yield stamp, self._hit
+            else:
+                yield stamp, self._backgrounds[index % len(self._backgrounds)]
+
+
+def open_source(
+    spec: str, config: Config, origin: Optional[Tuple[int, int]] = None
+) -> FrameSource:
+    # spec: video:PATH, images:DIR or synthetic[:COUNT]; the screen is
+    # captured by run_watcher itself, on its own capture thread. Recorded
+    # frames are assumed to start at the regions' bounding box (as the
+    # watcher saves them) unless `origin` gives their top-left screen point.
+    kind, _sep, value = spec.partition(":")
+    kind = kind.lower()
+    if origin is None:
+        roi = union_roi([region.roi for region in config.regions])
+        origin = (roi.left, roi.top)
+    if kind == "video" and value:
+        return VideoFileSource(value, origin).start()
+    if kind == "images" and value:
+        return ImageDirSource(value, origin, config.runtime.interval_sec).start()
+    if kind == "synthetic":
+        count = int(value) if value else SYNTHETIC_FRAMES
+        return SyntheticSource(config, count).start()
+    raise ValueError(
+        f"Unknown frame source {spec!r}; use video:PATH, images:DIR "
+        "or synthetic[:COUNT]."
+    )
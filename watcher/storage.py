@@ -0,0 +1,527 @@
+import asyncio
+import collections
+import csv
+import glob
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .config import Debug
+
+SAVED_PREFIXES = ("frame_", "match_")
+SAVED_EXTENSIONS = (".png", ".jpg")
+FRAME_PATTERNS = ("*.png", "*.jpg", "*.jpeg", "*.bmp")
+# frame_20250101-120000_000042_0.812[_region].png
+SAVED_NAME = re.compile(r"^(frame|match)_(\d{8}-\d{6})_(\d+)_(-?[\d.]+)")
+# save_format: video writes chunk_000001.avi, ... plus one index.csv row per
+# saved frame.
+CHUNK_PREFIX = "chunk_"
+CHUNK_EXTENSION = ".avi"
+CHUNK_NAME = re.compile(r"^chunk_(\d+)\.avi$")
+INDEX_NAME = "index.csv"
+INDEX_FIELDS = ["name", "time", "frame", "score", "chunk", "position", "duplicate"]
+# Frames are read back by position, so the rate written into chunks only
+# matters for video players.
+CHUNK_FPS = 10.0
+# Near duplicates are judged on a grid of this many cell means (width, height).
+DEDUP_GRID = (32, 32)
+
+
+class ArchiveEntry(NamedTuple):
+    name: str
+    stamp: float
+    frame: int
+    score: float
+    chunk: str
+    position: int
+    duplicate: bool
+
+
+def list_frames(frames_dir: str) -> List[str]:
+    # Image files plus, for a video archive, the saved names from its index;
+    # read_frame() decodes either.
+    paths: List[str] = []
+    for pattern in FRAME_PATTERNS:
+        paths.extend(glob.glob(os.path.join(frames_dir, pattern)))
+    archive = open_archive(frames_dir)
+    if archive is not None:
+        paths.extend(os.path.join(frames_dir, entry.name) for entry in archive.entries)
+    return sorted(paths)
+
+
+def read_frame(path: str) -> Optional[np.ndarray]:
+    # A BGR frame, or None if it cannot be read.
+    if os.path.isfile(path):
+        return cv2.imread(path, cv2.IMREAD_COLOR)
+    archive = open_archive(os.path.dirname(path))
+    if archive is None:
+        return None
+    return archive.read_name(os.path.basename(path))
+
+
+def parse_saved_name(path: str) -> Optional[Tuple[str, float, int]]:
+    # Returns (kind, unix timestamp, frame index) for files written by the
+    # watcher, or None for anything else.
+    match = SAVED_NAME.match(os.path.basename(path))
+    if match is None:
+        return None
+    try:
+        stamp = time.mktime(time.strptime(match.group(2), "%Y%m%d-%H%M%S"))
+    except ValueError:
+        return None
+    return match.group(1), stamp, int(match.group(3))
+
+
+def replay_order(paths: List[str], interval_sec: float) -> List[Tuple[str, float]]:
+    # Saved frames are replayed in capture order with the clock taken from
+    # their names, so cooldowns span the same wall time they did live. Any
+    # unrecognised name switches to a synthetic clock of one tick per file.
+    parsed = [(path, parse_saved_name(path)) for path in paths]
+    if any(info is None for _path, info in parsed):
+        print(
+            "[replay] Some file names have no capture time; "
+            f"assuming {interval_sec:.2f}s between frames in name order."
+        )
+        return [(path, index * interval_sec) for index, path in enumerate(paths)]
+
+    ordered = sorted(parsed, key=lambda item: (item[1][1], item[1][2]))
+    frames = []
+    seen = set()
+    for path, (_kind, stamp, index) in ordered:
+        # Several regions can save match_ images of the same tick.
+        if (stamp, index) in seen:
+            continue
+        seen.add((stamp, index))
+        frames.append((path, stamp))
+    return frames
+
+
+def _read_index(frames_dir: str) -> List[ArchiveEntry]:
+    entries = []
+    path = os.path.join(frames_dir, INDEX_NAME)
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                entries.append(
+                    ArchiveEntry(
+                        row["name"],
+                        float(row["time"]),
+                        int(row["frame"]),
+                        float(row["score"]),
+                        row["chunk"],
+                        int(row["position"]),
+                        row["duplicate"] == "1",
+                    )
+                )
+            except (KeyError, TypeError, ValueError):
+                # A row cut short by a crash.
+                continue
+    return entries
+
+
+class FrameArchive:
+    # Read side of VideoChunkStore: every index row whose chunk still exists,
+    # by position in the index or by saved name. Reads are serialized and
+    # keep the chunk open, so reading in index order decodes each stored
+    # frame once. Grayscale chunks come back as BGR, like cv2.imread.
+    def __init__(self, frames_dir: str, entries: List[ArchiveEntry]) -> None:
+        self.frames_dir = frames_dir
+        chunks = {entry.chunk for entry in entries}
+        present = {
+            chunk for chunk in chunks if os.path.isfile(os.path.join(frames_dir, chunk))
+        }
+        self.entries = [entry for entry in entries if entry.chunk in present]
+        self._by_name = {entry.name: index for index, entry in enumerate(self.entries)}
+        self._lock = threading.Lock()
+        self._video: Optional[cv2.VideoCapture] = None
+        self._chunk = ""
+        self._next = 0
+        self._last: Optional[Tuple[str, int, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def read(self, index: int) -> Optional[np.ndarray]:
+        entry = self.entries[index]
+        with self._lock:
+            if self._last is not None and self._last[:2] == (
+                entry.chunk,
+                entry.position,
+            ):
+                return self._last[2].copy()
+            if self._video is None or entry.chunk != self._chunk:
+                self.close()
+                self._video = cv2.VideoCapture(
+                    os.path.join(self.frames_dir, entry.chunk)
+                )
+                self._chunk = entry.chunk
+                self._next = 0
+            if entry.position != self._next:
+                self._video.set(cv2.CAP_PROP_POS_FRAMES, entry.position)
+            ok, frame = self._video.read()
+            self._next = entry.position + 1
+            if not ok:
+                return None
+            self._last = (entry.chunk, entry.position, frame)
+            return frame.copy()
+
+    def read_name(self, name: str) -> Optional[np.ndarray]:
+        index = self._by_name.get(name)
+        return None if index is None else self.read(index)
+
+    def close(self) -> None:
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+
+_archives: Dict[str, Tuple[Tuple[float, int], FrameArchive]] = {}
+_archives_lock = threading.Lock()
+
+
+def open_archive(frames_dir: str) -> Optional[FrameArchive]:
+    # The directory's video archive, or None without an index. Shared per
+    # directory until the index changes.
+    path = os.path.join(frames_dir, INDEX_NAME)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = os.path.abspath(frames_dir)
+    version = (stat.st_mtime, stat.st_size)
+    with _archives_lock:
+        cached = _archives.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        archive = FrameArchive(frames_dir, _read_index(frames_dir))
+        if cached is not None:
+            cached[1].close()
+        _archives[key] = (version, archive)
+        return archive
+
+
+class VideoChunkStore:
+    # Appends saved frames to rolling video chunks of chunk_frames stored
+    # frames each. A frame equal to the last stored one (same hash, or every
+    # DEDUP_GRID cell mean within dedup_tolerance) is not encoded again; its
+    # index row points at the stored frame instead. Used from one thread at a
+    # time.
+    def __init__(self, debug: Debug) -> None:
+        self.save_dir = debug.save_dir
+        self.codec = debug.video_codec
+        self.chunk_frames = debug.video_chunk_frames
+        self.tolerance = debug.dedup_tolerance
+        self.stored = 0
+        self.duplicates = 0
+        self.chunks = 0
+        self._video: Optional[cv2.VideoWriter] = None
+        self._chunk = ""
+        self._shape: Tuple[int, ...] = ()
+        self._position = 0
+        self._digest = b""
+        self._grid: Optional[np.ndarray] = None
+        # chunk and position of the last stored frame
+        self._stored_at: Optional[Tuple[str, int]] = None
+
+        entries = self._compact_index()
+        numbers = [0]
+        for name in os.listdir(self.save_dir) + [entry.chunk for entry in entries]:
+            match = CHUNK_NAME.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        self._next_chunk = max(numbers) + 1
+        index_path = os.path.join(self.save_dir, INDEX_NAME)
+        self._index = open(index_path, "a", newline="", encoding="utf-8")
+        self._rows = csv.writer(self._index)
+        if self._index.tell() == 0:
+            self._rows.writerow(INDEX_FIELDS)
+
+    def _compact_index(self) -> List[ArchiveEntry]:
+        # Drops rows whose chunk retention has deleted.
+        if not os.path.exists(os.path.join(self.save_dir, INDEX_NAME)):
+            return []
+        entries = _read_index(self.save_dir)
+        kept = FrameArchive(self.save_dir, entries).entries
+        if len(kept) < len(entries):
+            path = os.path.join(self.save_dir, INDEX_NAME)
+            with open(path + ".tmp", "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(INDEX_FIELDS)
+                for entry in kept:
+                    writer.writerow(self._row(entry))
+            os.replace(path + ".tmp", path)
+        return kept
+
+    @staticmethod
+    def _row(entry: ArchiveEntry) -> List[str]:
+        return [
+            entry.name,
+            f"{entry.stamp:.3f}",
+            str(entry.frame),
+            f"{entry.score:.4f}",
+            entry.chunk,
+            str(entry.position),
+            "1" if entry.duplicate else "0",
+        ]
+
+    def _is_duplicate(self, frame: np.ndarray) -> bool:
+        digest = hashlib.blake2b(frame.data, digest_size=16).digest()
+        grid = None
+        if self.tolerance > 0:
+            grid = cv2.resize(frame, DEDUP_GRID, interpolation=cv2.INTER_AREA)
+            grid = grid.astype(np.float32)
+        same = self._stored_at is not None and frame.shape == self._shape
+        if same and digest != self._digest:
+            same = (
+                grid is not None
+                and float(np.abs(grid - self._grid).max()) <= self.tolerance
+            )
+        if not same:
+            # Near duplicates are compared with the last stored frame, so a
+            # slow drift is still stored once it adds up.
+            self._digest = digest
+            self._grid = grid
+        return same
+
+    def append(
+        self, name: str, frame: np.ndarray, stamp: float
+    ) -> Optional[str]:
+        # Returns the path of a chunk finished to make room, if any.
+        finished = None
+        duplicate = self._is_duplicate(frame)
+        if duplicate:
+            self.duplicates += 1
+        else:
+            if self._video is not None and (
+                self._position >= self.chunk_frames or frame.shape != self._shape
+            ):
+                finished = self._finish_chunk()
+            if self._video is None:
+                self._open_chunk(frame)
+            self._video.write(frame)
+            self._stored_at = (self._chunk, self._position)
+            self._position += 1
+            self.stored += 1
+        match = SAVED_NAME.match(name)
+        frame_index = int(match.group(3)) if match else 0
+        score = float(match.group(4)) if match else 0.0
+        chunk, position = self._stored_at
+        entry = ArchiveEntry(
+            name, stamp, frame_index, score, chunk, position, duplicate
+        )
+        self._rows.writerow(self._row(entry))
+        return finished
+
+    def _open_chunk(self, frame: np.ndarray) -> None:
+        self._chunk = f"{CHUNK_PREFIX}{self._next_chunk:06d}{CHUNK_EXTENSION}"
+        self._next_chunk += 1
+        path = os.path.join(self.save_dir, self._chunk)
+        height, width = frame.shape[:2]
+        video = cv2.VideoWriter(
+            path,
+            cv2.VideoWriter_fourcc(*self.codec),
+            CHUNK_FPS,
+            (width, height),
+            frame.ndim == 3,
+        )
+        if not video.isOpened():
+            raise ValueError(f"Cannot open a {self.codec} video writer for {path}")
+        self._video = video
+        self._shape = frame.shape
+        self._position = 0
+        self.chunks += 1
+
+    def _finish_chunk(self) -> str:
+        self._video.release()
+        self._video = None
+        self._index.flush()
+        return os.path.join(self.save_dir, self._chunk)
+
+    def close(self) -> Optional[str]:
+        finished = self._finish_chunk() if self._video is not None else None
+        self._index.close()
+        return finished
+
+    def stats_line(self) -> str:
+        saved = max(1, self.stored + self.duplicates)
+        return (
+            f"stored={self.stored} duplicates={self.duplicates} "
+            f"({self.duplicates / saved:.0%}) chunks={self.chunks}"
+        )
+
+
+class AsyncDebugFrameWriter:
+    # Saves debug frames without the watcher loop waiting on disk: one task
+    # per writer drains the queue, encoding and writing each frame in the
+    # loop's default executor. The queue is bounded and drops the oldest
+    # pending frame under pressure. After every write the retention limits
+    # (file count, total bytes, age) are enforced oldest-first; with
+    # save_format video they apply to finished chunks. Create, submit and
+    # close it on the event loop thread.
+    def __init__(
+        self, debug: Debug, observe: Optional[Callable[..., None]] = None
+    ) -> None:
+        self.save_dir = debug.save_dir
+        # Called with ("save", encode + write seconds) when set.
+        self._observe = observe
+        self.extension = {"jpg": ".jpg", "png": ".png"}.get(debug.save_format, "")
+        if self.extension == ".jpg":
+            self._params = [cv2.IMWRITE_JPEG_QUALITY, debug.jpeg_quality]
+        else:
+            self._params = [cv2.IMWRITE_PNG_COMPRESSION, debug.png_compression]
+        self.max_files = debug.retention_max_files
+        self.max_bytes = debug.retention_max_bytes
+        self.max_age_sec = debug.retention_max_age_sec
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.deleted = 0
+
+        os.makedirs(self.save_dir, exist_ok=True)
+        self._files: Deque[Tuple[str, int, float]] = collections.deque(
+            self._scan_existing()
+        )
+        self._total_bytes = sum(size for _path, size, _mtime in self._files)
+        self._pending: Deque[Tuple[str, np.ndarray, float]] = collections.deque(
+            maxlen=debug.save_queue_size
+        )
+        self._closing = False
+        # Serializes writes with _finish(): a write still running after a
+        # close timeout completes first, and any write after it is dropped.
+        self._write_lock = threading.Lock()
+        self._finished = False
+        self.chunks: Optional[VideoChunkStore] = None
+        if debug.save_format == "video":
+            self.chunks = VideoChunkStore(debug)
+        self._wake = asyncio.Event()
+        self._task = asyncio.ensure_future(self._drain())
+
+    def _scan_existing(self) -> List[Tuple[str, int, float]]:
+        files = []
+        for name in os.listdir(self.save_dir):
+            saved = name.startswith(SAVED_PREFIXES) and name.endswith(
+                SAVED_EXTENSIONS
+            )
+            if not saved and not CHUNK_NAME.match(name):
+                continue
+            path = os.path.join(self.save_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((path, stat.st_size, stat.st_mtime))
+        files.sort(key=lambda item: item[2])
+        return files
+
+    def submit(self, stem: str, frame: np.ndarray) -> str:
+        # Without an extension (video) the path is the name read_frame() takes.
+        path = os.path.join(self.save_dir, stem + self.extension)
+        # Copy now: the capture buffer may be reused before the write happens.
+        item = (path, frame.copy(), time.time())
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+            print(f"[debug] Queue full, dropped {self._pending[0][0]}")
+        self._pending.append(item)
+        self._wake.set()
+        return path
+
+    def _write(self, path: str, frame: np.ndarray, stamp: float) -> None:
+        with self._write_lock:
+            if self._finished:
+                self.dropped += 1
+                print(f"[debug] Writer closed, dropped {path}")
+                return
+            self._write_locked(path, frame, stamp)
+
+    def _write_locked(self, path: str, frame: np.ndarray, stamp: float) -> None:
+        start = time.perf_counter()
+        finished = None
+        try:
+            if self.chunks is not None:
+                finished = self.chunks.append(os.path.basename(path), frame, stamp)
+            else:
+                ok, encoded = cv2.imencode(self.extension, frame, self._params)
+                if not ok:
+                    raise ValueError("encoder returned no data")
+                with open(path, "wb") as f:
+                    f.write(encoded.tobytes())
+        except Exception as exc:
+            self.failed += 1
+            print(f"[debug] Failed to write {path}: {exc}")
+            return
+        if self._observe is not None:
+            self._observe("save", time.perf_counter() - start)
+        self.written += 1
+        print(f"[debug] saved {path}")
+        if self.chunks is None:
+            self._track(path, len(encoded))
+        elif finished is not None:
+            self._track(finished, os.path.getsize(finished))
+
+    def _finish(self) -> None:
+        # Closes the open chunk and the index, if any.
+        with self._write_lock:
+            if self._finished:
+                return
+            self._finished = True
+            if self.chunks is None:
+                return
+            finished = self.chunks.close()
+            if finished is not None:
+                self._track(finished, os.path.getsize(finished))
+
+    def _track(self, path: str, size: int) -> None:
+        self._files.append((path, size, time.time()))
+        self._total_bytes += size
+        self._enforce_retention()
+
+    def _enforce_retention(self) -> None:
+        now = time.time()
+        while self._files:
+            path, size, mtime = self._files[0]
+            over_count = self.max_files > 0 and len(self._files) > self.max_files
+            over_bytes = self.max_bytes > 0 and self._total_bytes > self.max_bytes
+            too_old = self.max_age_sec > 0 and now - mtime > self.max_age_sec
+            if not (over_count or over_bytes or too_old):
+                break
+            self._files.popleft()
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+                self.deleted += 1
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                print(f"[debug] Failed to delete {path}: {exc}")
+
+    async def aclose(self, timeout: float = 5.0) -> None:
+        self._closing = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            # Also after a timeout, so the last chunk stays readable; frames
+            # still queued are dropped.
+            if self._pending:
+                self.dropped += len(self._pending)
+                print(f"[debug] Close timed out, dropped {len(self._pending)} frame(s)")
+                self._pending.clear()
+            await asyncio.to_thread(self._finish)
+
+    async def _drain(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self._pending:
+                path, frame, stamp = self._pending.popleft()
+                await asyncio.to_thread(self._write, path, frame, stamp)
+            if self._closing:
+                return
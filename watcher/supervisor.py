@@ -0,0 +1,347 @@
+import asyncio
+import contextvars
+import copy
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, TextIO, Tuple
+
+from .config import ROI, Config, ConfigReloader, union_roi
+
+if TYPE_CHECKING:
+    from .framebus import FrameBusProducer
+
+# A crashed worker is restarted after this delay, doubling on every crash in
+# a row up to the cap. A worker that ran STABLE_RUN_SEC before crashing
+# starts again from the short delay.
+RESTART_BACKOFF_SEC = 1.0
+MAX_RESTART_BACKOFF_SEC = 30.0
+STABLE_RUN_SEC = 60.0
+
+StatusCallback = Callable[[str, str, str], None]
+# Name of the profile whose task is printing, under run_in_process.
+_profile: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "watcher_profile", default=""
+)
+
+
+class _PrefixedStream:
+    # Tags every line a worker prints with its profile name, since all
+    # workers share the supervisor's console. `prefix` is called at the start
+    # of every line.
+    def __init__(self, stream: TextIO, prefix: Callable[[], str]) -> None:
+        self._stream = stream
+        self._prefix = prefix
+        self._line_start = True
+
+    def write(self, text: str) -> int:
+        for part in text.splitlines(keepends=True):
+            if self._line_start:
+                self._stream.write(self._prefix())
+            self._stream.write(part)
+            self._line_start = part.endswith("\n")
+        return len(text)
+
+    def flush(self) -> None:
+        self._stream.flush()
+
+
+def _worker_main(
+    name: str,
+    config: Config,
+    stop_event: Any,
+    status_queue: Any,
+    bus: Optional[Tuple[str, int, ROI, bool]] = None,
+    reloader: Optional[ConfigReloader] = None,
+) -> None:
+    sys.stdout = _PrefixedStream(sys.stdout, lambda: f"[{name}] ")
+    status_queue.put((name, "running", str(os.getpid())))
+    capture = None
+    try:
+        from .app import run_watcher
+        from .framebus import FrameBusCapture
+
+        if bus is not None:
+            bus_name, consumer_id, bus_roi, gray = bus
+            if gray and not (config.matching.grayscale or config.matching.text_only):
+                raise ValueError("Shared capture is grayscale; profile needs color.")
+            capture = FrameBusCapture(bus_name, consumer_id, bus_roi, stop_event)
+        run_watcher(config, stop_event, capture, reloader)
+        if capture is not None:
+            print(
+                f"[framebus] Read {capture.frames} frame(s), "
+                f"skipped {capture.skipped} stale frame(s)."
+            )
+    except Exception as exc:
+        traceback.print_exc(file=sys.stdout)
+        status_queue.put((name, "error", f"{type(exc).__name__}: {exc}"))
+        sys.stdout.flush()
+        sys.exit(1)
+    finally:
+        if capture is not None:
+            capture.close()
+
+
+@dataclass
+class _Worker:
+    name: str
+    config: Config
+    reloader: Optional[ConfigReloader] = None
+    process: Any = None
+    stop_event: Any = None
+    started_at: float = 0.0
+    restarts: int = 0
+    backoff: float = RESTART_BACKOFF_SEC
+    restart_at: Optional[float] = None
+    status: str = "starting"
+
+
+class Supervisor:
+    # Runs each named profile's watcher loop in its own process so matching
+    # in one profile never waits on another (or on the Tk panel) for the GIL.
+    # Call poll() regularly: it forwards worker status and restarts workers
+    # that exited with an error. With a FrameBusProducer every worker reads
+    # the producer's shared frames instead of grabbing the screen itself.
+    def __init__(
+        self,
+        on_status: Optional[StatusCallback] = None,
+        producer: Optional["FrameBusProducer"] = None,
+    ) -> None:
+        # spawn everywhere: forking a process that runs Tk or other threads
+        # is unsafe, and it is the only start method on Windows anyway.
+        self._ctx = multiprocessing.get_context("spawn")
+        self._status_queue = self._ctx.Queue()
+        self._workers: Dict[str, _Worker] = {}
+        self._on_status = on_status
+        self.producer = producer
+        self._consumer_ids: Dict[str, int] = {}
+
+    def _report(self, name: str, status: str, detail: str = "") -> None:
+        worker = self._workers.get(name)
+        if worker is not None:
+            worker.status = status
+        if self._on_status is not None:
+            self._on_status(name, status, detail)
+        else:
+            suffix = f" ({detail})" if detail else ""
+            print(f"[supervisor] {name}: {status}{suffix}")
+
+    def _bus_for(self, name: str) -> Optional[Tuple[str, int, ROI, bool]]:
+        producer = self.producer
+        if producer is None:
+            return None
+        consumer_id = self._consumer_ids.get(name)
+        if consumer_id is None:
+            used = set(self._consumer_ids.values())
+            free = [i for i in range(producer.bus.max_consumers) if i not in used]
+            if not free:
+                raise ValueError(
+                    f"Shared capture supports {producer.bus.max_consumers} profiles."
+                )
+            consumer_id = free[0]
+            self._consumer_ids[name] = consumer_id
+        # A crashed consumer may have left its pin behind.
+        producer.bus.release(consumer_id)
+        return producer.bus.name, consumer_id, producer.roi, producer.gray
+
+    def _spawn(self, worker: _Worker) -> None:
+        worker.stop_event = self._ctx.Event()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                worker.name,
+                worker.config,
+                worker.stop_event,
+                self._status_queue,
+                self._bus_for(worker.name),
+                worker.reloader,
+            ),
+            name=f"watcher-{worker.name}",
+            daemon=True,
+        )
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+
+    def start(
+        self, name: str, config: Config, reloader: Optional[ConfigReloader] = None
+    ) -> None:
+        # A restarted worker starts from `config` again; its reloader then
+        # picks up whatever the file holds now.
+        if name in self._workers:
+            self.stop(name)
+        worker = _Worker(name=name, config=config, reloader=reloader)
+        self._workers[name] = worker
+        self._spawn(worker)
+        self._report(name, "starting")
+
+    def stop(self, name: str, timeout: float = 5.0) -> None:
+        worker = self._workers.pop(name, None)
+        if worker is None or worker.process is None:
+            return
+        worker.stop_event.set()
+        worker.process.join(timeout=timeout)
+        if worker.process.is_alive():
+            print(f"[supervisor] {name}: no exit after {timeout:.0f}s, terminating.")
+            worker.process.terminate()
+            worker.process.join(timeout=1.0)
+        consumer_id = self._consumer_ids.pop(name, None)
+        if consumer_id is not None and self.producer is not None:
+            self.producer.bus.release(consumer_id)
+        self._report(name, "stopped")
+
+    def stop_all(self, timeout: float = 5.0) -> None:
+        for worker in self._workers.values():
+            if worker.stop_event is not None:
+                worker.stop_event.set()
+        for name in list(self._workers):
+            self.stop(name, timeout)
+
+    def names(self) -> List[str]:
+        return list(self._workers)
+
+    def statuses(self) -> Dict[str, str]:
+        return {name: worker.status for name, worker in self._workers.items()}
+
+    def poll(self) -> None:
+        while True:
+            try:
+                name, status, detail = self._status_queue.get_nowait()
+            except queue.Empty:
+                break
+            if name in self._workers:
+                self._report(name, status, detail)
+        producer = self.producer
+        while producer is not None and producer.errors:
+            self._report("shared capture", "failed", producer.errors.popleft())
+
+        now = time.monotonic()
+        for worker in list(self._workers.values()):
+            process = worker.process
+            if worker.restart_at is not None:
+                if now >= worker.restart_at:
+                    worker.restarts += 1
+                    self._spawn(worker)
+                    self._report(
+                        worker.name, "restarting", f"restart #{worker.restarts}"
+                    )
+                continue
+            if process.is_alive() or worker.stop_event.is_set():
+                continue
+            if process.exitcode == 0:
+                # The loop returned on its own (e.g. 'q' in the debug window).
+                self.stop(worker.name)
+                continue
+            if now - worker.started_at >= STABLE_RUN_SEC:
+                worker.backoff = RESTART_BACKOFF_SEC
+            worker.restart_at = now + worker.backoff
+            self._report(
+                worker.name,
+                "crashed",
+                f"exit code {process.exitcode}, restarting in {worker.backoff:.0f}s",
+            )
+            worker.backoff = min(worker.backoff * 2, MAX_RESTART_BACKOFF_SEC)
+
+
+def shared_producer(configs: List[Config]) -> "FrameBusProducer":
+    from .framebus import FrameBusProducer
+
+    # One capture covering every profile's regions, grayscale only if no
+    # profile needs color, at the fastest profile's interval.
+    roi = union_roi([region.roi for config in configs for region in config.regions])
+    gray = all(
+        config.matching.grayscale or config.matching.text_only for config in configs
+    )
+    interval = min(config.runtime.interval_sec for config in configs)
+    return FrameBusProducer(roi, gray, interval)
+
+
+def run_supervisor(
+    profiles: Dict[str, Config],
+    shared_capture: bool = False,
+    poll_sec: float = 0.5,
+    reloaders: Optional[Dict[str, ConfigReloader]] = None,
+) -> None:
+    producer = shared_producer(list(profiles.values())) if shared_capture else None
+    supervisor = Supervisor(producer=producer)
+    for name, config in profiles.items():
+        supervisor.start(name, config, (reloaders or {}).get(name))
+    try:
+        while supervisor.names():
+            supervisor.poll()
+            time.sleep(poll_sec)
+    except KeyboardInterrupt:
+        print("[supervisor] Stopped by Ctrl+C.")
+    finally:
+        supervisor.stop_all()
+        if producer is not None:
+            producer.close()
+        print("[supervisor] Exiting.")
+
+
+def _profile_prefix() -> str:
+    name = _profile.get()
+    return f"[{name}] " if name else ""
+
+
+def run_in_process(
+    profiles: Dict[str, Config],
+    reloaders: Optional[Dict[str, ConfigReloader]] = None,
+    workers: Optional[int] = None,
+) -> None:
+    # Runs every profile as a task on one event loop in this process. Capture
+    # and matching share a pool of `workers` threads (OpenCV releases the GIL
+    # while it matches), so many light profiles cost a thread pool instead
+    # of a process each. A crashed profile restarts with the same backoff as
+    # a crashed worker process.
+    from .app import run_watcher_async
+
+    async def run_profile(
+        name: str, config: Config, executor: ThreadPoolExecutor
+    ) -> None:
+        _profile.set(name)
+        reloader = (reloaders or {}).get(name)
+        backoff = RESTART_BACKOFF_SEC
+        while True:
+            started = time.monotonic()
+            try:
+                # Like a respawned worker, a restart begins from the
+                # reloader's state at launch.
+                await run_watcher_async(
+                    config, reloader=copy.deepcopy(reloader), executor=executor
+                )
+                print("[supervisor] stopped")
+                return
+            except Exception as exc:
+                traceback.print_exc(file=sys.stdout)
+                if time.monotonic() - started >= STABLE_RUN_SEC:
+                    backoff = RESTART_BACKOFF_SEC
+                print(
+                    f"[supervisor] crashed ({type(exc).__name__}: {exc}), "
+                    f"restarting in {backoff:.0f}s"
+                )
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_RESTART_BACKOFF_SEC)
+
+    async def main(executor: ThreadPoolExecutor) -> None:
+        await asyncio.gather(
+            *(run_profile(name, config, executor) for name, config in profiles.items())
+        )
+
+    stdout = sys.stdout
+    sys.stdout = _PrefixedStream(stdout, _profile_prefix)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="watcher")
+    print(f"[supervisor] Running {len(profiles)} profile(s) in one process")
+    try:
+        asyncio.run(main(executor))
+    except KeyboardInterrupt:
+        print("[supervisor] Stopped by Ctrl+C.")
+    finally:
+        executor.shutdown(wait=True)
+        print("[supervisor] Exiting.")
+        sys.stdout = stdout
@@ -0,0 +1,270 @@
+import csv
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .config import ROI, Config, Region, read_config_dict, union_roi, write_config_dict
+from .matcher import MatcherBank
+from .storage import list_frames, read_frame
+
+# Matching time is the best of this many runs on a sample frame.
+TIMING_RUNS = 10
+
+
+def _frame_hits(config: Config, frames_dir: str) -> Tuple[Dict[str, List[ROI]], int]:
+    # Matches every saved frame (they hold the regions' bounding box, as the
+    # watcher saves them) and keeps the boxes that reach the region threshold.
+    origin = union_roi([region.roi for region in config.regions])
+    banks = {
+        region.name: MatcherBank.from_paths(
+            region.template_paths,
+            config.matching,
+            (region.roi.width, region.roi.height),
+        )
+        for region in config.regions
+    }
+    hits: Dict[str, List[ROI]] = {region.name: [] for region in config.regions}
+    scanned = 0
+    for path in list_frames(frames_dir):
+        frame = read_frame(path)
+        if (
+            frame is None
+            or frame.shape[0] < origin.height
+            or frame.shape[1] < origin.width
+        ):
+            name = os.path.basename(path)
+            print(f"[tighten] Skipping {name}: unreadable or smaller than the ROI")
+            continue
+        scanned += 1
+        for region in config.regions:
+            roi = region.roi
+            x = roi.left - origin.left
+            y = roi.top - origin.top
+            view = frame[y : y + roi.height, x : x + roi.width]
+            score, loc, matcher = banks[region.name].best(view)
+            if score >= region.threshold:
+                width, height = matcher.template_size()
+                hits[region.name].append(
+                    ROI(roi.left + loc[0], roi.top + loc[1], width, height)
+                )
+    return hits, scanned
+
+
+def _log_hits(config: Config, log_path: str) -> Tuple[Dict[str, List[ROI]], int]:
+    # Reads a `replay --csv` file: rows at or above the region threshold.
+    thresholds = {region.name: region.threshold for region in config.regions}
+    hits: Dict[str, List[ROI]] = {name: [] for name in thresholds}
+    rows = 0
+    with open(log_path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = {"region", "score", "left", "top", "width", "height"} - set(
+            reader.fieldnames or []
+        )
+        if missing:
+            raise ValueError(
+                f"{log_path} lacks column(s) {', '.join(sorted(missing))}; "
+                "write it with `replay --csv`."
+            )
+        for row in reader:
+            rows += 1
+            name = row["region"]
+            if name not in thresholds or float(row["score"]) < thresholds[name]:
+                continue
+            hits[name].append(
+                ROI(
+                    int(row["left"]),
+                    int(row["top"]),
+                    int(row["width"]),
+                    int(row["height"]),
+                )
+            )
+    return hits, rows
+
+
+def template_extent(region: Region) -> Tuple[int, int]:
+    # Width and height every ROI of the region must hold: the largest
+    # template in each direction.
+    width = height = 0
+    for path in region.template_paths:
+        template = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if template is not None:
+            width = max(width, template.shape[1])
+            height = max(height, template.shape[0])
+    return width, height
+
+
+def fits(roi: ROI, extent: Tuple[int, int]) -> bool:
+    return roi.width >= extent[0] and roi.height >= extent[1]
+
+
+def _grow(start: int, end: int, size: int, low: int, high: int) -> Tuple[int, int]:
+    # Widens [start, end) around its middle to at least `size`, shifted to
+    # stay within [low, high).
+    missing = size - (end - start)
+    if missing > 0:
+        start -= missing // 2
+        end += missing - missing // 2
+    if start < low:
+        end += low - start
+        start = low
+    if end > high:
+        start -= end - high
+        end = high
+    return max(start, low), end
+
+
+def suggest_roi(
+    boxes: List[ROI], margin: int, bounds: ROI, extent: Tuple[int, int] = (0, 0)
+) -> ROI:
+    # Bounding box of every match plus `margin`, grown to hold an `extent`
+    # template and never outside the old ROI.
+    matched = union_roi(boxes)
+    left, right = _grow(
+        matched.left - margin,
+        matched.left + matched.width + margin,
+        extent[0],
+        bounds.left,
+        bounds.left + bounds.width,
+    )
+    top, bottom = _grow(
+        matched.top - margin,
+        matched.top + matched.height + margin,
+        extent[1],
+        bounds.top,
+        bounds.top + bounds.height,
+    )
+    return ROI(left=left, top=top, width=right - left, height=bottom - top)
+
+
+def tighten_suggestions(
+    config: Config,
+    frames_dir: Optional[str] = None,
+    log_path: Optional[str] = None,
+    margin: int = 16,
+) -> Dict[str, ROI]:
+    if log_path:
+        hits, scanned = _log_hits(config, log_path)
+        source = f"{scanned} row(s) of {log_path}"
+    else:
+        hits, scanned = _frame_hits(config, frames_dir or config.debug.save_dir)
+        source = f"{scanned} frame(s) in {frames_dir or config.debug.save_dir}"
+    print(f"[tighten] Scanned {source}")
+    suggestions: Dict[str, ROI] = {}
+    for region in config.regions:
+        boxes = hits[region.name]
+        if not boxes:
+            print(f"[tighten] {region.name}: no matches, keeping the ROI")
+            continue
+        extent = template_extent(region)
+        roi = suggest_roi(boxes, margin, region.roi, extent)
+        if not fits(roi, extent):
+            print(
+                f"[tighten] {region.name}: the ROI cannot hold a "
+                f"{extent[0]}x{extent[1]} template, keeping it"
+            )
+            continue
+        suggestions[region.name] = roi
+        print(f"[tighten] {region.name}: {len(boxes)} match(es)")
+    return suggestions
+
+
+def _match_ms(region: Region, config: Config, view: np.ndarray) -> float:
+    bank = MatcherBank.from_paths(
+        region.template_paths, config.matching, (view.shape[1], view.shape[0])
+    )
+    bank.best(view)
+    best = float("inf")
+    for _ in range(TIMING_RUNS):
+        start = time.perf_counter()
+        bank.best(view)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _sample_frame(region: Region, rng: np.random.Generator) -> np.ndarray:
+    # Noise frame of the current ROI size; matching cost does not depend on
+    # the content.
+    roi = region.roi
+    return rng.integers(0, 256, (roi.height, roi.width, 3), dtype=np.uint8)
+
+
+def apply_suggestions(config_path: str, suggestions: Dict[str, ROI]) -> None:
+    data = read_config_dict(config_path)
+    raw_regions = data.get("regions")
+    if raw_regions is None:
+        # Single-region config: the region is the top-level roi.
+        roi = suggestions.get("default")
+        if roi is not None:
+            data["roi"] = {
+                "left": roi.left,
+                "top": roi.top,
+                "width": roi.width,
+                "height": roi.height,
+            }
+    else:
+        for index, item in enumerate(raw_regions):
+            name = str(item.get("name", f"region{index + 1}"))
+            roi = suggestions.get(name)
+            if roi is not None:
+                item["roi"] = {
+                    "left": roi.left,
+                    "top": roi.top,
+                    "width": roi.width,
+                    "height": roi.height,
+                }
+    write_config_dict(config_path, data)
+
+
+def run_tighten(
+    config: Config,
+    config_path: str,
+    frames_dir: Optional[str],
+    log_path: Optional[str],
+    margin: int,
+    write: bool,
+) -> int:
+    suggestions = tighten_suggestions(config, frames_dir, log_path, margin)
+    if not suggestions:
+        print("[tighten] Nothing to suggest; record some matches first.")
+        return 1
+
+    rng = np.random.default_rng(0)
+    old_total = new_total = 0.0
+    for region in config.regions:
+        if not fits(region.roi, template_extent(region)):
+            print(f"[tighten] {region.name}: ROI is smaller than a template, not timed")
+            continue
+        frame = _sample_frame(region, rng)
+        old_ms = _match_ms(region, config, frame)
+        old_total += old_ms
+        roi = suggestions.get(region.name)
+        if roi is None:
+            new_total += old_ms
+            continue
+        x = roi.left - region.roi.left
+        y = roi.top - region.roi.top
+        new_ms = _match_ms(
+            region, config, frame[y : y + roi.height, x : x + roi.width]
+        )
+        new_total += new_ms
+        old = region.roi
+        print(
+            f"[tighten] {region.name}: {old.width}x{old.height}+{old.left}+{old.top}"
+            f" -> {roi.width}x{roi.height}+{roi.left}+{roi.top} "
+            f"({roi.width * roi.height / (old.width * old.height):.0%} of the area), "
+            f"match {old_ms:.2f}ms -> {new_ms:.2f}ms"
+        )
+    speedup = old_total / new_total if new_total > 0 else float("inf")
+    print(
+        f"[tighten] Per tick: {old_total:.2f}ms -> {new_total:.2f}ms "
+        f"({speedup:.1f}x faster matching)"
+    )
+    if write:
+        apply_suggestions(config_path, suggestions)
+        print(f"[tighten] Wrote the suggested ROI(s) to {config_path}")
+    else:
+        print("[tighten] Run again with --write to save them.")
+    return 0
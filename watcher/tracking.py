@@ -0,0 +1,75 @@
+from typing import List, Optional, Tuple
+
+from .config import Tracking
+
+Location = Tuple[int, int]
+
+
+class LocationTracker:
+    # Remembers where one template was last found with confidence, plus the
+    # locations it keeps showing up at (hot spots), so the next frame can be
+    # searched in small windows around them before paying for the full ROI.
+    def __init__(self, tracking: Tracking) -> None:
+        self.margin = tracking.margin
+        self.max_spots = tracking.hot_spots
+        self.full_every_n = tracking.full_every_n
+        self.last: Optional[Location] = None
+        # [x, y, hits], most hit first.
+        self.spots: List[List[int]] = []
+        self._since_full = 0
+        self.local = 0
+        self.fallbacks = 0
+        self.full = 0
+
+    def candidates(self) -> List[Location]:
+        # Empty when the next search must cover the whole ROI: nothing learned
+        # yet, or full_every_n local searches in a row.
+        if self.full_every_n and self._since_full >= self.full_every_n:
+            return []
+        locations: List[Location] = []
+        if self.last is not None:
+            locations.append(self.last)
+        for x, y, _hits in self.spots:
+            if all(self._distance((x, y), loc) > self.margin for loc in locations):
+                locations.append((x, y))
+        return locations
+
+    @staticmethod
+    def _distance(a: Location, b: Location) -> int:
+        return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+
+    def record(self, loc: Location, confident: bool, local: bool) -> None:
+        if local:
+            self._since_full += 1
+        else:
+            self._since_full = 0
+        if not confident:
+            return
+        self.last = loc
+        if self.max_spots == 0:
+            return
+        for spot in self.spots:
+            if self._distance((spot[0], spot[1]), loc) <= self.margin // 2:
+                spot[0], spot[1] = loc
+                spot[2] += 1
+                break
+        else:
+            if len(self.spots) >= self.max_spots:
+                self.spots.pop()
+            self.spots.append([loc[0], loc[1], 1])
+        self.spots.sort(key=lambda spot: -spot[2])
+
+
+def tracking_stats_line(trackers: List[LocationTracker]) -> str:
+    local = sum(tracker.local for tracker in trackers)
+    fallbacks = sum(tracker.fallbacks for tracker in trackers)
+    full = sum(tracker.full for tracker in trackers)
+    searches = max(1, local + fallbacks + full)
+    spots = sum(len(tracker.spots) for tracker in trackers)
+    return (
+        f"searches={local + fallbacks + full} "
+        f"local={local} ({local / searches:.0%}) "
+        f"fallback={fallbacks} ({fallbacks / searches:.0%}) "
+        f"full={full} ({full / searches:.0%}) "
+        f"hot_spots={spots}"
+    )
@@ -0,0 +1,135 @@
+import os
+import time
+from dataclasses import replace
+
+from .config import Config, Matching, union_roi
+from .matcher import MatcherBank, PreparedFrame, preprocess_frame
+from .storage import list_frames, read_frame
+
+# Score differences well below the threshold cannot change a decision, so they
+# are counted separately instead of failing the check.
+NEAR_THRESHOLD_BAND = 0.1
+
+
+def reference_matching(matching: Matching) -> Matching:
+    return replace(matching, pyramid_levels=0, engine="spatial")
+
+
+def run_verify(config: Config, frames_dir: str, tolerance: float) -> int:
+    paths = list_frames(frames_dir)
+    if not paths:
+        print(f"[verify] No frames found in {frames_dir}")
+        return 0
+
+    # Saved frames cover the bounding box of all regions; each region is
+    # checked on its own slice with its own templates and threshold.
+    origin = union_roi([region.roi for region in config.regions])
+    checks = []
+    for region in config.regions:
+        frame_size = (region.roi.width, region.roi.height)
+        candidate = MatcherBank.from_paths(
+            region.template_paths, config.matching, frame_size
+        )
+        candidate.configure_prefilter(config.prefilter, region.threshold)
+        checks.append(
+            (
+                region,
+                region.roi.left - origin.left,
+                region.roi.top - origin.top,
+                MatcherBank.from_paths(
+                    region.template_paths, reference_matching(config.matching)
+                ),
+                candidate,
+            )
+        )
+
+    reference_sec = 0.0
+    candidate_sec = 0.0
+    max_diff = 0.0
+    mismatches = 0
+    low_score_diffs = 0
+    decision_flips = 0
+    checked = 0
+    templates = 0
+    # A prefilter reject reports a coarse score, so those templates are only
+    # checked for misses: a reject where the exhaustive score is a hit.
+    prefilter_rejects = 0
+    prefilter_misses = 0
+    lowest_hit_coarse = None
+    for path in paths:
+        frame = read_frame(path)
+        if frame is None:
+            print(f"[verify] Skipping unreadable frame: {path}")
+            continue
+        checked += 1
+        for region, x, y, reference, candidate in checks:
+            view = frame[y : y + region.roi.height, x : x + region.roi.width]
+            start = time.perf_counter()
+            expected = reference.match(view)
+            reference_sec += time.perf_counter() - start
+            start = time.perf_counter()
+            actual = candidate.match(view)
+            candidate_sec += time.perf_counter() - start
+
+            threshold = region.threshold
+            for matcher, (ref_score, _), (score, loc) in zip(
+                candidate.matchers, expected, actual
+            ):
+                templates += 1
+                if candidate.prefilter_levels:
+                    prepared = PreparedFrame(
+                        preprocess_frame(view, *matcher.preprocess_key())
+                    )
+                    coarse = matcher.prefilter(prepared, candidate.prefilter_levels)
+                    if coarse is not None and ref_score >= threshold:
+                        if lowest_hit_coarse is None or coarse[0] < lowest_hit_coarse:
+                            lowest_hit_coarse = coarse[0]
+                    if coarse is not None and coarse[0] < candidate.reject_score:
+                        prefilter_rejects += 1
+                        if ref_score >= threshold:
+                            prefilter_misses += 1
+                            name = os.path.basename(matcher.template_path)
+                            print(
+                                f"[verify] {os.path.basename(path)} {name}: "
+                                f"prefilter rejected a hit (exhaustive="
+                                f"{ref_score:.4f} coarse={coarse[0]:.4f})"
+                            )
+                        continue
+                diff = abs(ref_score - score)
+                max_diff = max(max_diff, diff)
+                if (ref_score >= threshold) != (score >= threshold):
+                    decision_flips += 1
+                if diff <= tolerance:
+                    continue
+                if max(ref_score, score) < threshold - NEAR_THRESHOLD_BAND:
+                    low_score_diffs += 1
+                else:
+                    mismatches += 1
+                    name = os.path.basename(matcher.template_path)
+                    print(
+                        f"[verify] {os.path.basename(path)} {name}: "
+                        f"exhaustive={ref_score:.4f} configured={score:.4f} at {loc}"
+                    )
+
+    if checked == 0:
+        print("[verify] No readable frames.")
+        return 0
+    speedup = reference_sec / candidate_sec if candidate_sec > 0 else float("inf")
+    print(
+        f"[verify] frames={checked} template_checks={templates} "
+        f"max_diff={max_diff:.5f} mismatches={mismatches} "
+        f"low_score_diffs={low_score_diffs} threshold_flips={decision_flips}"
+    )
+    print(
+        f"[verify] exhaustive={reference_sec / checked * 1000:.2f}ms/frame "
+        f"configured={candidate_sec / checked * 1000:.2f}ms/frame "
+        f"speedup={speedup:.1f}x"
+    )
+    if config.prefilter.enabled:
+        lowest = "n/a" if lowest_hit_coarse is None else f"{lowest_hit_coarse:.4f}"
+        print(
+            f"[verify] prefilter: rejected={prefilter_rejects}/{templates} "
+            f"missed_hits={prefilter_misses} lowest_coarse_score_on_a_hit={lowest} "
+            f"(reject_score must stay below it)"
+        )
+    return mismatches + decision_flips + prefilter_misses